@@ -1,9 +1,46 @@
+"""AWS CloudFormation custom resources for Amazon SES domain and email identities.
+
+Importing the Lambda entry point is part of every cold start, so modules here import
+boto3, botocore and heavier standard library modules (like concurrent.futures and
+http.client) inside the functions that use them, rather than at module level.
+tests/test_import_time.py checks that importing a handler stays cheap.
+"""
 from .__about__ import __version__, VERSION
-from .ses_domain_identity import handle_domain_identity_request
-from .ses_email_identity import handle_email_identity_request
 __all__ = [
+    'handle_request',
     'handle_domain_identity_request',
+    'handle_domain_identity_batch_request',
     'handle_email_identity_request',
+    'handle_email_identity_batch_request',
+    'RecordPlanner',
+    'ZoneFileWriter',
     '__version__',
     'VERSION',
 ]
+
+# The handlers (and other public APIs) are imported on first use (PEP 562), so that importing
+# this package (e.g., at Lambda cold start) stays cheap.
+_LAZY_ATTRS = {
+    'handle_request': '.dispatch',
+    'handle_domain_identity_request': '.ses_domain_identity',
+    'handle_domain_identity_batch_request': '.ses_domain_identity_batch',
+    'handle_email_identity_request': '.ses_email_identity',
+    'handle_email_identity_batch_request': '.ses_email_identity_batch',
+    'RecordPlanner': '.dns',
+    'ZoneFileWriter': '.zonefile',
+}
+
+
+def __getattr__(name):
+    try:
+        module_name = _LAZY_ATTRS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    from importlib import import_module
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value  # (skip __getattr__ next time)
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_ATTRS))
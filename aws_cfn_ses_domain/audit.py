@@ -0,0 +1,191 @@
+# Command-line audit of Amazon SES domain identities against a manifest
+#
+# Usage: python -m aws_cfn_ses_domain.audit MANIFEST.json [--region REGION ...]
+#
+# The manifest uses the same properties as a Custom::SES_DomainBatch resource
+# (a "Domains" list, plus defaults for the other Custom::SES_Domain properties).
+# Writes one JSON report line per identity, as each region's results arrive.
+# With --zone-file, also writes the DNS records every managed identity requires
+# (e.g., for a Custom::SES_DomainBatch too large to return them as attributes).
+
+import argparse
+import json
+import sys
+import threading
+from collections import Counter
+
+from .calls import get_managed_client
+from .ratelimit import ses_rate_limiter
+from .reconcile import MAX_IDENTITIES_PER_CALL, fetch_identity_states
+from .ses_domain_identity import desired_mail_from_domain, required_records
+from .ses_domain_identity_batch import DEFAULT_PROPERTIES, clean_domain_configs
+from .utils import run_concurrently
+from .zonefile import ZoneFileWriter
+
+# Largest page size allowed by SES:ListIdentities
+LIST_IDENTITIES_PAGE_SIZE = 1000
+
+# Report statuses
+OK = "ok"
+DRIFTED = "drifted"  # exists, but doesn't match the manifest
+MISSING = "missing"  # in the manifest, but doesn't exist
+UNMANAGED = "unmanaged"  # exists, but isn't in the manifest
+ERROR = "error"  # couldn't audit the region
+
+PROBLEM_STATUSES = (DRIFTED, MISSING, ERROR)
+
+
+def audit(manifest, out, regions=(), max_concurrency=8,
+          include_unmanaged=False, include_records=False, zone_file=None, get_ses=None):
+    """Audit the SES domain identities in manifest, writing JSON lines reports to out.
+
+    Audits each region used in the manifest, plus any additional regions,
+    concurrently (up to max_concurrency regions at once). get_ses(region) returns
+    the SES client for a region (default: a rate limited calls.ManagedClient).
+
+    If zone_file (a file-like object) is provided, the DNS records required by each
+    existing, enabled identity in the manifest (using its current tokens) are written
+    to it as zone file entries.
+
+    Returns a Counter of report statuses.
+    """
+    if get_ses is None:
+        def get_ses(region):
+            return get_managed_client("ses", region_name=region, rate_limiter=ses_rate_limiter(region))
+
+    configs_by_region = {region: {} for region in regions}
+    for config in clean_domain_configs({**DEFAULT_PROPERTIES, **manifest}):
+        configs_by_region.setdefault(config["Region"], {})[config["Domain"]] = config
+
+    counts = Counter()
+    lock = threading.Lock()
+    zone_file_writer = ZoneFileWriter(zone_file) if zone_file is not None else None
+
+    def emit(report, config=None, state=None):
+        line = json.dumps(report)
+        with lock:
+            out.write(line + "\n")
+            out.flush()
+            counts[report["Status"]] += 1
+            if zone_file_writer is not None and state and (config["EnableSend"] or config["EnableReceive"]):
+                zone_file_writer.write_records(required_records(config, state))
+
+    def audit_region(region):
+        configs = configs_by_region[region]
+        try:
+            ses = get_ses(region)
+            unlisted = set(configs)
+            for identities in list_domain_identities(ses):
+                managed = [identity for identity in identities if identity in configs]
+                unlisted.difference_update(managed)
+                states = fetch_identity_states(ses, managed) if managed else {}
+                for identity in identities:
+                    if identity in configs:
+                        state = states.get(identity, {})
+                        emit(audit_identity(configs[identity], state, include_records), configs[identity], state)
+                    elif include_unmanaged:
+                        emit({"Region": region, "Identity": identity, "Status": UNMANAGED})
+            for domain in sorted(unlisted):
+                emit(audit_identity(configs[domain], {}, include_records))
+        except Exception as error:
+            emit({"Region": region, "Status": ERROR, "Error": f"{error.__class__.__name__}: {error}"})
+
+    run_concurrently(
+        [lambda region=region: audit_region(region) for region in sorted(configs_by_region, key=str)],
+        max_workers=max_concurrency)
+    return counts
+
+
+def list_domain_identities(ses):
+    """Yield lists of (up to MAX_IDENTITIES_PER_CALL) domain identities in ses's region"""
+    params = {"IdentityType": "Domain", "MaxItems": LIST_IDENTITIES_PAGE_SIZE}
+    while True:
+        response = ses.list_identities(**params)
+        identities = response["Identities"]
+        for start in range(0, len(identities), MAX_IDENTITIES_PER_CALL):
+            yield identities[start:start + MAX_IDENTITIES_PER_CALL]
+        if not response.get("NextToken"):
+            return
+        params["NextToken"] = response["NextToken"]
+
+
+def audit_identity(config, state, include_records=False):
+    """Return a report dict comparing an identity's current state with its (cleaned) config.
+
+    state is from reconcile.fetch_identity_states ({} if the identity doesn't exist).
+    """
+    report = {"Region": config["Region"], "Identity": config["Domain"]}
+    enabled = config["EnableSend"] or config["EnableReceive"]
+    problems = []
+    if not state:
+        if enabled:
+            problems.append("identity does not exist")
+        report["Status"] = MISSING if problems else OK
+        report["Problems"] = problems
+        return report
+
+    if not enabled:
+        problems.append("identity exists, but neither EnableSend nor EnableReceive is set")
+    elif state.get("VerificationStatus") != "Success":
+        problems.append(f"verification status is {state.get('VerificationStatus')}")
+
+    if config["EnableSend"]:
+        if not state.get("DkimEnabled"):
+            problems.append("DKIM is not enabled")
+        elif state.get("DkimVerificationStatus") != "Success":
+            problems.append(f"DKIM verification status is {state.get('DkimVerificationStatus')}")
+
+    mail_from_domain = desired_mail_from_domain(config) if enabled else ""
+    current_mail_from_domain = state.get("MailFromDomain", "")
+    if current_mail_from_domain != mail_from_domain:
+        problems.append(f"MAIL FROM domain is {current_mail_from_domain!r}, not {mail_from_domain!r}")
+    elif mail_from_domain and state.get("MailFromDomainStatus") != "Success":
+        problems.append(f"MAIL FROM domain status is {state.get('MailFromDomainStatus')}")
+
+    report["Status"] = DRIFTED if problems else OK
+    report["Problems"] = problems
+    if include_records and problems and enabled:
+        # The DNS records the identity needs, using its current tokens
+        report["Route53RecordSets"] = required_records(config, state)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m aws_cfn_ses_domain.audit",
+        description="Audit Amazon SES domain identities against a manifest, writing JSON lines reports.")
+    parser.add_argument(
+        "manifest", type=argparse.FileType("r"),
+        help="JSON file with Custom::SES_DomainBatch properties ('-' for stdin)")
+    parser.add_argument(
+        "--region", dest="regions", action="append", default=[],
+        help="additional region to audit (can be repeated)")
+    parser.add_argument(
+        "--max-concurrency", type=int, default=8,
+        help="regions to audit at once (default %(default)s)")
+    parser.add_argument(
+        "--include-unmanaged", action="store_true",
+        help="also report domain identities that aren't in the manifest")
+    parser.add_argument(
+        "--include-records", action="store_true",
+        help="include the required Route53RecordSets in reports for drifted identities")
+    parser.add_argument(
+        "--zone-file", type=argparse.FileType("w"),
+        help="also write the DNS records all the manifest's identities require to this zone file")
+    args = parser.parse_args(argv)
+
+    try:
+        manifest = json.load(args.manifest)
+        counts = audit(
+            manifest, sys.stdout, regions=args.regions, max_concurrency=args.max_concurrency,
+            include_unmanaged=args.include_unmanaged, include_records=args.include_records,
+            zone_file=args.zone_file)
+    except ValueError as error:  # (including invalid JSON)
+        parser.error(str(error))
+    print(", ".join(f"{count} {status}" for status, count in sorted(counts.items())) or "no identities",
+          file=sys.stderr)
+    return 1 if any(counts[status] for status in PROBLEM_STATUSES) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
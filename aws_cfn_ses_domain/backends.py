@@ -0,0 +1,179 @@
+# Amazon SES API backends for provisioning identities
+#
+# The handlers provision identities through a backend, selected by a resource's
+# SESBackend property (default: the SES_BACKEND environment variable):
+# - "ses": the classic Amazon SES API. A domain needs separate calls to verify
+#   the identity, enable Easy DKIM and set its MAIL FROM domain, and SES
+#   verifies the domain through a TXT record.
+# - "sesv2": the SESv2 API. CreateEmailIdentity creates a domain identity with
+#   Easy DKIM in a single call (optionally with 2048-bit keys). SESv2 verifies
+#   domains through their DKIM CNAME records (there's no verification TXT record),
+#   so a domain's DKIM records are required even if it only receives email.
+#
+# Both backends return the same outputs (and identity states) as the classic API,
+# so the DNS records are generated by the same code.
+import os
+
+from .calls import get_managed_client
+from .ratelimit import ses_rate_limiter
+
+SES_BACKEND = os.getenv("SES_BACKEND", "ses")
+
+# DkimKeyLength property values, for SESv2's NextSigningKeyLength
+DKIM_KEY_LENGTHS = {
+    "1024": "RSA_1024_BIT",
+    "2048": "RSA_2048_BIT",
+}
+
+# SESv2 status values, as the classic API reports them
+V2_STATUSES = {
+    "PENDING": "Pending",
+    "SUCCESS": "Success",
+    "FAILED": "Failed",
+    "TEMPORARY_FAILURE": "TemporaryFailure",
+    "NOT_STARTED": "NotStarted",
+}
+
+
+class ClassicSESBackend:
+    """Provisions identities with the classic Amazon SES API"""
+
+    name = "ses"
+    service_name = "ses"
+    verifies_with_dkim = False  # (domains are verified by a TXT record)
+
+    def __init__(self, region, client=None):
+        self.region = region
+        self.client = client or get_managed_client(
+            self.service_name, region_name=region, rate_limiter=ses_rate_limiter(region))
+
+    def identity_state(self, domain, attributes=("verification", "dkim")):
+        """Return domain's state (see reconcile.fetch_identity_states), or {} if it doesn't exist"""
+        from .reconcile import fetch_identity_states  # (avoid a circular import)
+        return fetch_identity_states(self.client, [domain], attributes=attributes).get(domain, {})
+
+    def provision_domain(self, domain, properties, operations=None):
+        """Provision (or deprovision) domain for (cleaned) properties; returns dict of output info
+
+        operations are the ses_domain_identity.OPERATION_PROPERTIES keys to run (default all).
+        """
+        from .ses_domain_identity import ALL_OPERATIONS, provision_ses_domain_identity  # (avoid a circular import)
+        return provision_ses_domain_identity(
+            domain, properties, self.client, ALL_OPERATIONS if operations is None else operations)
+
+    def provision_email(self, email_address):
+        # (Sends another verification email, even if the address is already verified)
+        self.client.verify_email_identity(EmailAddress=email_address)
+
+    def delete_identity(self, identity):
+        self.client.delete_identity(Identity=identity)
+
+    def log_rate_limit_stats(self, logger):
+        self.client.log_rate_limit_stats(logger)
+
+
+class SESv2Backend(ClassicSESBackend):
+    """Provisions identities with the SESv2 API"""
+
+    name = "sesv2"
+    service_name = "sesv2"
+    verifies_with_dkim = True
+
+    def identity_state(self, domain, attributes=None):
+        """Return domain's state (in classic API form), or {} if it doesn't exist.
+
+        (A single GetEmailIdentity call returns all the attributes.)
+        """
+        try:
+            response = self.client.get_email_identity(EmailIdentity=domain)
+        except self.client.exceptions.NotFoundException:
+            return {}
+        dkim = response.get("DkimAttributes", {})
+        return {
+            "VerificationStatus": V2_STATUSES.get(response.get("VerificationStatus"), "Pending"),
+            "DkimEnabled": dkim.get("SigningEnabled", False),
+            "DkimVerificationStatus": V2_STATUSES.get(dkim.get("Status"), "NotStarted"),
+            "DkimTokens": dkim.get("Tokens", []),
+            "MailFromDomain": response.get("MailFromAttributes", {}).get("MailFromDomain", ""),
+        }
+
+    def provision_domain(self, domain, properties, operations=None):
+        """Provision (or deprovision) domain for (cleaned) properties; returns dict of output info
+
+        operations are the ses_domain_identity.OPERATION_PROPERTIES keys to run (default all).
+        """
+        from .ses_domain_identity import desired_mail_from_domain, dns_outputs  # (avoid a circular import)
+        if operations is None:
+            operations = ("identity", "dkim", "mail_from")
+        outputs = {}
+        if not (properties["EnableSend"] or properties["EnableReceive"]):
+            if "identity" in operations:
+                # (Deleting an identity also deletes its MAIL FROM domain)
+                self.delete_identity(domain)
+        else:
+            if "identity" in operations or "dkim" in operations:
+                outputs["DkimTokens"] = self.create_domain(domain, properties.get("DkimKeyLength"))
+            else:
+                # Just read the existing tokens
+                outputs["DkimTokens"] = (self.identity_state(domain).get("DkimTokens")
+                                         or self.create_domain(domain, properties.get("DkimKeyLength")))
+            if "mail_from" in operations:
+                mail_from_domain = desired_mail_from_domain(properties)
+                # (Omitting MailFromDomain disables the custom MAIL FROM domain)
+                self.client.put_email_identity_mail_from_attributes(
+                    EmailIdentity=domain, **({"MailFromDomain": mail_from_domain} if mail_from_domain else {}))
+        outputs.update(dns_outputs(properties))
+        return outputs
+
+    def create_domain(self, domain, key_length=None):
+        """Create domain's identity with Easy DKIM (if it doesn't already exist); returns its DKIM tokens"""
+        signing_attributes = {"NextSigningKeyLength": DKIM_KEY_LENGTHS[key_length]} if key_length else {}
+        try:
+            response = self.client.create_email_identity(
+                EmailIdentity=domain,
+                **({"DkimSigningAttributes": signing_attributes} if signing_attributes else {}))
+            return response["DkimAttributes"]["Tokens"]
+        except self.client.exceptions.AlreadyExistsException:
+            pass
+        tokens = self.identity_state(domain).get("DkimTokens")
+        if not tokens or signing_attributes:
+            # An existing identity without Easy DKIM (e.g., created by the classic API
+            # to receive email), or with a different key length requested
+            response = self.client.put_email_identity_dkim_signing_attributes(
+                EmailIdentity=domain, SigningAttributesOrigin="AWS_SES",
+                **({"SigningAttributes": signing_attributes} if signing_attributes else {}))
+            tokens = response["DkimTokens"]
+        return tokens
+
+    def provision_email(self, email_address):
+        # (Unlike the classic API, doesn't send another verification email for an existing identity)
+        try:
+            self.client.create_email_identity(EmailIdentity=email_address)
+        except self.client.exceptions.AlreadyExistsException:
+            pass
+
+    def delete_identity(self, identity):
+        try:
+            self.client.delete_email_identity(EmailIdentity=identity)
+        except self.client.exceptions.NotFoundException:
+            pass  # (the classic API's DeleteIdentity also succeeds for a missing identity)
+
+
+BACKENDS = {backend.name: backend for backend in (ClassicSESBackend, SESv2Backend)}
+
+
+def backend_class(name):
+    """Return the backend class for name ("ses" or "sesv2").
+
+    Raises ValueError, with a message suitable for a FAILED response, for unknown names.
+    """
+    try:
+        return BACKENDS[name]
+    except (KeyError, TypeError):
+        raise ValueError(f"The 'SESBackend' property must be one of {', '.join(map(repr, BACKENDS))},"
+                         f" not '{name}'.") from None
+
+
+def get_backend(name, region, client=None):
+    """Return a backend instance for name, provisioning in region"""
+    return backend_class(name)(region, client=client)
@@ -0,0 +1,177 @@
+# Common handling for AWS API calls made by the handlers
+
+import functools
+import logging
+import os
+import random
+import threading
+import time
+
+from .clients import get_client
+from .deadline import MIN_TIMEOUT, DeadlineExceeded, current_deadline
+from .logs import log_verbose
+from .metrics import current_metrics
+
+# Attempts for each API call (including the first), if it fails with a transient error
+MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "5"))
+BACKOFF_BASE = 0.5  # seconds
+BACKOFF_CAP = 10.0  # seconds
+
+# ClientError codes indicating the call was throttled
+THROTTLING_ERROR_CODES = {
+    "Throttling", "ThrottlingException", "ThrottledException", "RequestThrottled",
+    "RequestThrottledException", "TooManyRequestsException", "RequestLimitExceeded",
+}
+
+
+class ManagedClient:
+    """Wraps a boto3 client, so that every API call goes through call().
+
+    Other attributes (meta, exceptions, get_paginator, ...) pass through
+    to the wrapped client unchanged.
+
+    Calls wait for rate_limiter (if any), which is told about each throttled and
+    successful call. The total wait and number of throttled calls are tracked
+    in rate_limit_wait and throttled. Calls are retried (with jittered backoff)
+    after throttling and other transient errors. No attempt (or wait for
+    rate_limiter) is started unless it can begin at least MIN_TIMEOUT before
+    deadline (default: the current deadline.current_deadline()).
+
+    If client_factory is provided, it is called with the deadline before each
+    attempt, and should return a client with timeouts budgeted to the time remaining.
+    """
+
+    def __init__(self, client, rate_limiter=None, deadline=None, client_factory=None,
+                 max_attempts=None, sleep=time.sleep):
+        self.client = client
+        self.rate_limiter = rate_limiter
+        self.deadline = deadline
+        self.client_factory = client_factory
+        self.max_attempts = max_attempts or MAX_ATTEMPTS
+        self.sleep = sleep
+        self.rate_limit_wait = 0.0  # seconds
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if name.startswith("_") or not callable(attr) or not self._is_api_method(name):
+            return attr
+        return functools.partial(self.call, name)
+
+    def call(self, method_name, **params):
+        """Call client.method_name(**params)"""
+        deadline = self.deadline or current_deadline()
+        operation = self._operation_name(method_name)
+        metrics = current_metrics()
+        start = time.perf_counter() if metrics is not None else 0.0
+        attempt = 0
+        try:
+            while True:
+                attempt += 1
+                deadline.check(f"before calling {operation}", needed=MIN_TIMEOUT)
+                if self.rate_limiter is not None:
+                    # (Don't sleep into the time reserved for sending the response)
+                    deadline.check(f"waiting for the rate limit to call {operation}",
+                                   needed=self.rate_limiter.next_wait() + MIN_TIMEOUT)
+                    wait = self.rate_limiter.acquire()
+                    with self._lock:
+                        self.rate_limit_wait += wait
+                    deadline.check(f"waiting for the rate limit to call {operation}", needed=MIN_TIMEOUT)
+                client = self.client if self.client_factory is None else self.client_factory(deadline)
+                try:
+                    response = getattr(client, method_name)(**params)
+                except Exception as error:
+                    if is_throttling(error):
+                        with self._lock:
+                            self.throttled += 1
+                        if self.rate_limiter is not None:
+                            self.rate_limiter.on_throttle()
+                    if attempt >= self.max_attempts or not is_retryable(error):
+                        raise
+                    backoff = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt - 1)))
+                    if backoff >= deadline.remaining():
+                        raise DeadlineExceeded(f"retrying {operation} after: {error}") from error
+                    self.sleep(backoff)
+                else:
+                    if self.rate_limiter is not None:
+                        self.rate_limiter.on_success()
+                    break
+        except Exception as error:
+            log_verbose(operation, request=params, error=f"{error.__class__.__name__}: {error}", attempts=attempt)
+            if metrics is not None:
+                metrics.record_call(operation, self._region_name(), time.perf_counter() - start,
+                                    attempts=attempt, outcome=error_outcome(error))
+            raise
+        log_verbose(operation, request=params, response=response, attempts=attempt)
+        if metrics is not None:
+            metrics.record_call(operation, self._region_name(), time.perf_counter() - start, attempts=attempt)
+        return response
+
+    def _is_api_method(self, name):
+        api_methods = getattr(getattr(self.client, "meta", None), "method_to_api_mapping", None)
+        if not isinstance(api_methods, dict):
+            return True  # (not a real boto3 client, e.g. a mock)
+        return name in api_methods
+
+    def _operation_name(self, method_name):
+        """Return e.g. "SES:VerifyDomainIdentity" for "verify_domain_identity" (for messages)"""
+        meta = getattr(self.client, "meta", None)
+        api_methods = getattr(meta, "method_to_api_mapping", None)
+        if not isinstance(api_methods, dict):
+            return method_name
+        service = getattr(getattr(meta, "service_model", None), "service_id", None) or "AWS"
+        return f"{service}:{api_methods.get(method_name, method_name)}"
+
+    def _region_name(self):
+        region_name = getattr(getattr(self.client, "meta", None), "region_name", None)
+        return region_name if isinstance(region_name, str) else ""
+
+    def log_rate_limit_stats(self, logger):
+        """Log the time spent waiting for rate_limiter, to help tune rate limits"""
+        if self.rate_limiter is None:
+            return
+        level = logging.WARNING if self.throttled else logging.INFO
+        logger.log(level, "Waited %.3fs for rate limit; %d calls throttled; limit now %.3g calls/sec",
+                   self.rate_limit_wait, self.throttled, self.rate_limiter.rate)
+
+
+def is_throttling(error):
+    """Whether error (from a boto3 client call) means the call was throttled"""
+    from botocore.exceptions import ClientError
+    return (isinstance(error, ClientError)
+            and (error.response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES
+                 or error.response.get("ResponseMetadata", {}).get("HTTPStatusCode") == 429))
+
+
+def error_outcome(error):
+    """Return a short description of error (from a boto3 client call), for metrics"""
+    from botocore.exceptions import ClientError
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code") or "ClientError"
+    return error.__class__.__name__
+
+
+def is_retryable(error):
+    """Whether error (from a boto3 client call) is transient, so the call can be retried"""
+    from botocore.exceptions import ClientError, ConnectionError, HTTPClientError
+    if is_throttling(error):
+        return True
+    if isinstance(error, ClientError):
+        return error.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0) >= 500
+    return isinstance(error, (ConnectionError, HTTPClientError))
+
+
+def get_managed_client(service_name, region_name=None, rate_limiter=None, deadline=None):
+    """Return a ManagedClient for service_name in region_name.
+
+    Each call uses a (cached) client with timeouts budgeted to deadline
+    (default: the current deadline).
+    """
+    deadline = deadline or current_deadline()
+
+    def client_factory(deadline):
+        return get_client(service_name, region_name=region_name, config=deadline.client_config())
+
+    return ManagedClient(client_factory(deadline), rate_limiter=rate_limiter, deadline=deadline,
+                         client_factory=client_factory)
@@ -1,9 +1,21 @@
 # cfnresponse (simplified for Python 3)
 # adapted from https://github.com/jorgebastida/cfn-response
+#
+# Unlike the original, responses are sent over kept-alive connections
+# (reused across warm invocations), with explicit timeouts, and with retries
+# (jittered exponential backoff) bounded by the Lambda's remaining time.
+# A lost response would otherwise leave the stack waiting up to an hour.
 import json
 import logging
-from urllib.error import HTTPError
-from urllib.request import Request, urlopen
+import os
+import random
+import threading
+import time
+
+from .deadline import Deadline
+from .logs import log_failure_detail, log_verbose
+from .metrics import SUCCESS as METRICS_SUCCESS, current_metrics
+from .replay import remember_response
 
 logger = logging.getLogger()
 
@@ -11,9 +23,32 @@ logger = logging.getLogger()
 SUCCESS = "SUCCESS"
 FAILED = "FAILED"
 
+CONNECT_TIMEOUT = float(os.getenv("CFN_RESPONSE_CONNECT_TIMEOUT", "5"))  # seconds
+READ_TIMEOUT = float(os.getenv("CFN_RESPONSE_READ_TIMEOUT", "15"))  # seconds
+MAX_ATTEMPTS = int(os.getenv("CFN_RESPONSE_MAX_ATTEMPTS", "6"))
+BACKOFF_BASE = 0.25  # seconds
+BACKOFF_CAP = 8.0  # seconds
+# Stop retrying this long before the Lambda times out (so it can exit cleanly)
+TIME_RESERVE = 0.5  # seconds
+MIN_ATTEMPT_TIME = 1.0  # seconds
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# CloudFormation rejects custom resource responses over 4096 bytes
+# (including the status, ids and reason), so limit the size of the Data
+RESPONSE_DATA_LIMIT = 3072
+
+# Timing for each attempt made by the most recent send()
+last_attempts = []
 
-def send(event, context, response_status, reason=None, response_data=None, physical_resource_id=None):
-    response_body = json.dumps({
+
+def send(event, context, response_status, reason=None, response_data=None, physical_resource_id=None,
+         replayed=False):
+    if not replayed:
+        # (Before sending, in case the Lambda Function is stopped partway through)
+        remember_response(event, {"response_status": response_status, "reason": reason,
+                                  "response_data": response_data, "physical_resource_id": physical_resource_id})
+    response = {
         "Status": response_status,
         "Reason": reason or "See the details in CloudWatch Log Stream: {}".format(context.log_stream_name),
         "PhysicalResourceId": physical_resource_id or context.log_stream_name,
@@ -21,17 +56,162 @@ def send(event, context, response_status, reason=None, response_data=None, physi
         "RequestId": event["RequestId"],
         "LogicalResourceId": event["LogicalResourceId"],
         "Data": response_data or {}
-    })
-    logger.info("Sending response %r", response_body)
-
-    request = Request(event["ResponseURL"], method="PUT",
-                      data=response_body.encode("utf-8"),
-                      headers={"Content-Type": ""})  # "application/json" will cause 403
-    try:
-        response = urlopen(request)
-    except HTTPError as exc:
-        logger.exception("Error sending response: code=%s", exc.code)
-        return False
-    else:
-        logger.info("Successfully sent response: status=%s reason=%s", response.status, response.reason)
+    }
+    response_body = json.dumps(response)
+    log_verbose("Sending response", response=response)
+    if response_status == FAILED:
+        log_failure_detail()  # (everything leading up to the failure)
+
+    # (Handlers stop their own work early enough to leave time for this)
+    deadline = Deadline.from_context(context, reserve=TIME_RESERVE)
+    start = time.perf_counter()
+    attempts = put_response(event["ResponseURL"], response_body.encode("utf-8"), deadline=deadline.expires_at)
+    last_attempts[:] = attempts
+    final = attempts[-1]
+    succeeded = final["status"] is not None and 200 <= final["status"] < 300
+    metrics = current_metrics()
+    if metrics is not None:
+        if succeeded:
+            outcome = METRICS_SUCCESS
+        elif final["error"] is not None:
+            outcome = final["error"].split(":")[0]  # (the exception class name)
+        else:
+            outcome = f"HTTP {final['status']}"
+        metrics.record_call("CloudFormation:PutResponse", os.getenv("AWS_REGION"), time.perf_counter() - start,
+                            attempts=len(attempts), outcome=outcome)
+    if succeeded:
+        logger.info("Successfully sent response: status=%s reason=%s attempts=%d",
+                    final["status"], final["reason"], len(attempts))
         return True
+    else:
+        logger.error("Error sending response: code=%s error=%s attempts=%r",
+                     final["status"], final["error"], attempts)
+        return False
+
+
+def limit_response_data(outputs, optional_outputs, limit=RESPONSE_DATA_LIMIT):
+    """Return outputs, omitting optional_outputs (in order) as needed to fit within limit bytes (as JSON).
+
+    Lists any omitted attributes in the "OmittedAttributes" output.
+    (Omitted values are still available in the function's logs.)
+    """
+    outputs = outputs.copy()
+    omitted = []
+    for key in optional_outputs:
+        if len(json.dumps({**outputs, "OmittedAttributes": omitted})) <= limit:
+            break
+        if key in outputs:
+            del outputs[key]
+            omitted.append(key)
+    if omitted:
+        logger.warning("Omitted %r from response to fit CloudFormation's size limit", omitted)
+        outputs["OmittedAttributes"] = omitted
+    return outputs
+
+
+def put_response(url, body, deadline=None, max_attempts=None, connect_timeout=None, read_timeout=None):
+    """PUT body to url, retrying transient failures; returns a list of per-attempt info dicts.
+
+    Each dict has the attempt number, HTTP status and reason (None if no response),
+    error (str or None), duration (seconds), and whether an existing connection was reused.
+    deadline is a time.monotonic() value after which no further attempts are started.
+    """
+    from urllib.parse import urlsplit
+    max_attempts = max_attempts or MAX_ATTEMPTS
+    connect_timeout = connect_timeout or CONNECT_TIMEOUT
+    read_timeout = read_timeout or READ_TIMEOUT
+
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path = f"{path}?{parts.query}"
+    headers = {
+        "Content-Type": "",  # "application/json" will cause 403
+        "Content-Length": str(len(body)),
+    }
+
+    attempts = []
+    while True:
+        attempt = {"attempt": len(attempts) + 1, "status": None, "reason": None,
+                   "error": None, "duration": 0.0, "reused": False}
+        attempts.append(attempt)
+        # (Always allow a short attempt, even if the deadline has already passed)
+        time_left = None if deadline is None else max(deadline - time.monotonic(), MIN_ATTEMPT_TIME)
+
+        start = time.monotonic()
+        try:
+            conn, attempt["reused"] = _pool.acquire(parts.scheme, parts.netloc, _capped(connect_timeout, time_left))
+            try:
+                conn.sock.settimeout(_capped(read_timeout, time_left))
+                conn.request("PUT", path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()  # (must drain the response to reuse the connection)
+            except Exception:
+                conn.close()
+                raise
+            attempt["status"], attempt["reason"] = response.status, response.reason
+            if response.will_close:
+                conn.close()
+            else:
+                _pool.release(parts.scheme, parts.netloc, conn)
+        except Exception as error:
+            attempt["error"] = f"{error.__class__.__name__}: {error}"
+        attempt["duration"] = time.monotonic() - start
+        log_verbose("PUT response attempt", attempt=attempt)
+
+        if attempt["error"] is None and attempt["status"] not in RETRYABLE_STATUSES:
+            return attempts
+        if attempt["error"] is not None and attempt["reused"]:
+            continue  # the server probably closed an idle keep-alive connection: retry right away
+        if len(attempts) >= max_attempts:
+            return attempts
+
+        backoff = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (len(attempts) - 1)))
+        if deadline is not None and time.monotonic() + backoff >= deadline:
+            return attempts
+        time.sleep(backoff)
+
+
+def _capped(timeout, time_left):
+    return timeout if time_left is None else min(timeout, time_left)
+
+
+class _ConnectionPool:
+    """Idle keep-alive connections by (scheme, netloc), kept across warm invocations"""
+
+    def __init__(self):
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, scheme, netloc, connect_timeout):
+        """Return (connection, reused)"""
+        with self._lock:
+            conn = self._idle.pop((scheme, netloc), None)
+        if conn is not None:
+            return conn, True
+
+        import http.client
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(netloc, timeout=connect_timeout)
+        elif scheme == "http":
+            conn = http.client.HTTPConnection(netloc, timeout=connect_timeout)
+        else:
+            raise ValueError(f"Unsupported ResponseURL scheme {scheme!r}")
+        conn.connect()
+        return conn, False
+
+    def release(self, scheme, netloc, conn):
+        with self._lock:
+            previous = self._idle.pop((scheme, netloc), None)
+            self._idle[(scheme, netloc)] = conn
+        if previous is not None:
+            previous.close()
+
+    def clear(self):
+        with self._lock:
+            conns, self._idle = list(self._idle.values()), {}
+        for conn in conns:
+            conn.close()
+
+
+_pool = _ConnectionPool()
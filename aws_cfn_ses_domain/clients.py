@@ -0,0 +1,156 @@
+# Shared boto3 client cache
+#
+# Creating a boto3 client repeats session setup, endpoint resolution and
+# service model loading. Lambda keeps module state alive between warm
+# invocations, so the handlers get their clients from here instead.
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger()
+
+
+# Seconds an unused client stays cached (0 disables caching)
+DEFAULT_IDLE_TTL = float(os.getenv("CLIENT_CACHE_TTL", "900"))
+
+# Client kwargs that identify the credentials a client signs with
+CREDENTIAL_KWARGS = ("aws_access_key_id", "aws_secret_access_key", "aws_session_token")
+
+# Environment variables Lambda uses to supply the execution role's credentials
+CREDENTIAL_ENV_VARS = ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SESSION_TOKEN")
+
+
+class _Entry:
+    __slots__ = ("client", "last_used", "expires_at")
+
+    def __init__(self, client, last_used, expires_at=None):
+        self.client = client
+        self.last_used = last_used
+        self.expires_at = expires_at
+
+
+class ClientCache:
+    """Thread-safe cache of boto3 clients.
+
+    Clients are keyed by service, region, any other client kwargs, and
+    (a fingerprint of) the credentials they will sign with. A cached client
+    is evicted once it has been idle longer than idle_ttl seconds, or when
+    its credentials expire (if an expiration was given to get_client).
+    """
+
+    def __init__(self, idle_ttl=DEFAULT_IDLE_TTL, clock=time.time):
+        self.idle_ttl = idle_ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = {}
+        # boto3's default session isn't thread-safe, so clients are also created under this lock
+        self._lock = threading.Lock()
+
+    def get_client(self, service_name, region_name=None, expiration=None, **kwargs):
+        """Return a (possibly cached) boto3.client(service_name, region_name=region_name, **kwargs).
+
+        expiration is an optional datetime (or epoch seconds) when the credentials
+        in kwargs expire, such as the Expiration returned from sts.assume_role.
+        """
+        key = self._cache_key(service_name, region_name, kwargs)
+        with self._lock:
+            now = self.clock()
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._is_fresh(entry, now):
+                    entry.last_used = now
+                    self.hits += 1
+                    return entry.client
+                del self._entries[key]
+                self.evictions += 1
+                logger.debug("Evicted stale cached %s client for %s", service_name, region_name)
+
+            self.misses += 1
+            import boto3
+            client = boto3.client(service_name, region_name=region_name, **kwargs)
+            if self.idle_ttl > 0:
+                self._entries[key] = _Entry(client, now, _to_timestamp(expiration))
+            return client
+
+    def evict_expired(self):
+        """Remove all stale clients from the cache; returns number evicted"""
+        with self._lock:
+            now = self.clock()
+            stale = [key for key, entry in self._entries.items() if not self._is_fresh(entry, now)]
+            for key in stale:
+                del self._entries[key]
+            self.evictions += len(stale)
+        if stale:
+            logger.debug("Evicted %d stale cached clients", len(stale))
+        return len(stale)
+
+    def clear(self):
+        """Remove all clients and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+            }
+
+    def _is_fresh(self, entry, now):
+        if entry.expires_at is not None and now >= entry.expires_at:
+            return False
+        return now - entry.last_used < self.idle_ttl
+
+    @staticmethod
+    def _cache_key(service_name, region_name, kwargs):
+        credentials = tuple(kwargs.get(name) for name in CREDENTIAL_KWARGS)
+        if not any(credentials):
+            # Default credential chain: in Lambda, that's the role's credentials from the env
+            credentials = tuple(os.getenv(name) for name in CREDENTIAL_ENV_VARS)
+        # (Keep raw secrets out of the key, in case it ever ends up in a log)
+        fingerprint = hashlib.sha256(repr(credentials).encode("utf-8")).hexdigest()
+        other_kwargs = tuple(sorted(
+            (name, _hashable(value)) for name, value in kwargs.items()
+            if name not in CREDENTIAL_KWARGS))
+        return service_name, region_name, fingerprint, other_kwargs
+
+
+def _hashable(value):
+    # botocore.config.Config compares by identity: key on the options it was given
+    options = getattr(value, "_user_provided_options", None)
+    if options is not None:
+        return type(value).__name__, repr(sorted(options.items()))
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+def _to_timestamp(expiration):
+    if isinstance(expiration, datetime):
+        return expiration.timestamp()
+    return expiration
+
+
+# The cache shared by all handlers in this Lambda container
+client_cache = ClientCache()
+
+
+def get_client(service_name, region_name=None, **kwargs):
+    """Return a cached boto3 client (see ClientCache.get_client)"""
+    return client_cache.get_client(service_name, region_name=region_name, **kwargs)
+
+
+def client_cache_stats():
+    """Return the shared client cache's hit/miss/eviction counters"""
+    return client_cache.stats()
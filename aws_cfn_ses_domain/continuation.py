@@ -0,0 +1,28 @@
+# Continuing a long-running request in a new invocation of the same Lambda Function
+#
+# A handler that can't finish before its Lambda deadline (e.g., while waiting
+# for SES verification, or pacing many SES calls to its rate limit) checkpoints
+# its progress into the request event, and invokes its own Lambda Function
+# asynchronously with that event. The new invocation resumes from the checkpoint.
+# Only the final invocation sends the CloudFormation response.
+import json
+import logging
+
+logger = logging.getLogger()
+
+# Seconds kept (before the deadline) to checkpoint and invoke the continuation
+CONTINUATION_RESERVE = 5.0
+
+# Request event field holding a continuation's checkpoint
+CONTINUATION_FIELD = "SESDomainContinuation"
+
+
+def continue_in_new_invocation(lambda_client, event, context, checkpoint):
+    """Asynchronously invoke this Lambda Function again, with event plus checkpoint"""
+    checkpoint = dict(checkpoint, Invocations=checkpoint.get("Invocations", 1) + 1)
+    payload = dict(event, **{CONTINUATION_FIELD: checkpoint})
+    lambda_client.invoke(
+        FunctionName=context.invoked_function_arn,
+        InvocationType="Event",
+        Payload=json.dumps(payload).encode("utf-8"))
+    logger.info("Continuing the request in invocation %d", checkpoint["Invocations"])
@@ -0,0 +1,109 @@
+# Deadline tracking for handler invocations, based on the Lambda context's remaining time.
+#
+# The handlers start a deadline for each invocation. AWS calls made through
+# calls.ManagedClient check it before every attempt, and use connect and read
+# timeouts budgeted to fit within it. Some time is always kept in reserve,
+# so a handler can still send CloudFormation a FAILED response explaining
+# what timed out (rather than leaving the stack waiting for an hour).
+import math
+import os
+import time
+
+
+# Seconds kept in reserve (after the deadline) for sending the CloudFormation response
+RESPONSE_RESERVE = float(os.getenv("DEADLINE_RESPONSE_RESERVE", "1.0"))
+
+# Maximum connect and read timeouts (seconds) for each AWS API request
+CONNECT_TIMEOUT = float(os.getenv("AWS_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("AWS_READ_TIMEOUT", "20"))
+
+# Least time (seconds) worth starting an AWS API request with
+MIN_TIMEOUT = 0.25
+
+
+class DeadlineExceeded(Exception):
+    """Raised instead of starting work that can't finish before the deadline"""
+
+    def __init__(self, activity):
+        super().__init__(f"Timed out {activity} (the Lambda Function was about to time out)")
+
+
+class Deadline:
+    """The time by which a handler must finish its work.
+
+    expires_at is a clock() value, or None for no time limit.
+    """
+
+    def __init__(self, expires_at=None, clock=time.monotonic):
+        self.expires_at = expires_at
+        self.clock = clock
+
+    @classmethod
+    def from_context(cls, context, reserve=RESPONSE_RESERVE, clock=time.monotonic):
+        """Return a Deadline reserve seconds before the Lambda context times out.
+
+        (Has no time limit if context isn't a Lambda context.)
+        """
+        try:
+            remaining = context.get_remaining_time_in_millis() / 1000
+        except AttributeError:
+            return cls(clock=clock)  # not running in Lambda: no time limit
+        return cls(clock() + remaining - reserve, clock=clock)
+
+    def remaining(self):
+        """Seconds left before the deadline (math.inf if none; negative once passed)"""
+        if self.expires_at is None:
+            return math.inf
+        return self.expires_at - self.clock()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self, activity, needed=0.0):
+        """Raise DeadlineExceeded (describing activity) if the deadline has passed,
+        or will pass within needed seconds"""
+        if self.expired() or self.remaining() < needed:
+            raise DeadlineExceeded(activity)
+
+    def timeouts(self):
+        """Return (connect_timeout, read_timeout) budgeted to the remaining time.
+
+        The budget is rounded down to a power of two seconds, so the clients
+        created for these timeouts can be cached and reused. (It is never longer
+        than the remaining time, so a slow request can't run past the deadline.)
+        """
+        remaining = self.remaining()
+        if remaining >= READ_TIMEOUT:
+            budget = math.inf
+        elif remaining > 0:
+            budget = 2 ** math.floor(math.log2(remaining))
+        else:
+            budget = MIN_TIMEOUT  # (expired: ManagedClient won't start a request)
+        return min(CONNECT_TIMEOUT, budget), min(READ_TIMEOUT, budget)
+
+    def client_config(self):
+        """Return a botocore Config with budgeted timeouts.
+
+        botocore's own retries are disabled: ManagedClient retries
+        within the deadline instead.
+        """
+        from botocore.config import Config
+        connect_timeout, read_timeout = self.timeouts()
+        return Config(
+            connect_timeout=connect_timeout, read_timeout=read_timeout,
+            retries={"total_max_attempts": 1})
+
+
+# The deadline for the current handler invocation
+_current = Deadline()
+
+
+def current_deadline():
+    return _current
+
+
+def start_deadline(context, reserve=RESPONSE_RESERVE):
+    """Start (and return) the current deadline for a handler invoked with context"""
+    global _current
+    _current = Deadline.from_context(context, reserve=reserve)
+    return _current
@@ -0,0 +1,55 @@
+# AWS Lambda handler for all the custom resource types, dispatching on the event's ResourceType
+#
+# A single Lambda Function serving every type keeps a single pool of warm containers
+# (rather than one per type, each with its own cold starts). Each type's handler
+# module is only imported when a request for that type first arrives.
+
+import logging
+import os
+
+from .cfnresponse import FAILED, SUCCESS, send
+from .warmup import handles_warmup
+
+logger = logging.getLogger()
+logger.setLevel(os.getenv("LOG_LEVEL", "WARNING"))
+
+
+# ResourceType: handler (a callable, or the name of a handler in this package)
+RESOURCE_HANDLERS = {
+    "Custom::SES_Domain": "handle_domain_identity_request",
+    "Custom::SES_DomainBatch": "handle_domain_identity_batch_request",
+    "Custom::SES_EmailIdentity": "handle_email_identity_request",
+    "Custom::SES_EmailIdentityBatch": "handle_email_identity_batch_request",
+}
+
+
+def register_resource_type(resource_type, handler):
+    """Route requests for resource_type to handler (a callable, or a handler name in this package)"""
+    RESOURCE_HANDLERS[resource_type] = handler
+
+
+def get_handler(resource_type):
+    """Return the handler function for resource_type, or None if it isn't registered"""
+    handler = RESOURCE_HANDLERS.get(resource_type)
+    if isinstance(handler, str):
+        from importlib import import_module
+        handler = getattr(import_module(__package__), handler)  # (imports the handler's module on first use)
+    return handler
+
+
+@handles_warmup
+def handle_request(event, context):
+    handler = get_handler(event.get("ResourceType"))
+    if handler is not None:
+        return handler(event, context)
+
+    physical_resource_id = event.get("PhysicalResourceId") or "MISSING"
+    if event["RequestType"] == "Delete":
+        # This function can't have created it, so don't block deleting it
+        logger.warning("Ignoring Delete for unsupported ResourceType %r", event.get("ResourceType"))
+        return send(event, context, SUCCESS, physical_resource_id=physical_resource_id)
+    return send(event, context, FAILED,
+                reason="Unsupported ResourceType {resource_type!r} (must be one of {supported}).".format(
+                    resource_type=event.get("ResourceType"),
+                    supported=", ".join(sorted(RESOURCE_HANDLERS))),
+                physical_resource_id=physical_resource_id)
@@ -0,0 +1,242 @@
+# Planning the DNS records required by Amazon SES domain identities, in bulk
+#
+# Each record is a dict in AWS::Route53::RecordSet form:
+# {"Name": ..., "Type": ..., "ResourceRecords": [...], "TTL": ...}
+
+# Record templates, compiled once (bound str.format methods with positional fields)
+_VERIFICATION_NAME = "_amazonses.{}.".format
+_QUOTED = '"{}"'.format
+_DKIM_NAME = "{}._domainkey.{}.".format
+_DKIM_VALUE = "{}.dkim.amazonses.com.".format
+_FQDN = "{}.".format
+_MX_VALUE = "10 {}.".format
+_DMARC_NAME = "_dmarc.{}.".format
+
+
+def record_key(record):
+    """Return the (case-insensitive) key for a record: Route 53 allows one record set per name and type"""
+    return record["Name"].lower(), record["Type"]
+
+
+def domain_records(properties):
+    """Return the list of records required for one domain.
+
+    properties are a domain's (cleaned) properties, combined with its SES outputs
+    (VerificationToken, DkimTokens, MailFromDomain, MailFromMX, MailFromSPF, DMARC,
+    ReceiveMX -- any that are missing or empty are omitted).
+    """
+    domain = properties["Domain"]
+    ttl = properties["TTL"]
+    records = []
+
+    verification_token = properties.get("VerificationToken")
+    if verification_token:
+        records.append({
+            "Name": _VERIFICATION_NAME(domain),
+            "Type": "TXT",
+            "ResourceRecords": [_QUOTED(verification_token)],
+            "TTL": ttl})
+
+    dkim_tokens = properties.get("DkimTokens")
+    if dkim_tokens:
+        records.extend([{
+            "Name": _DKIM_NAME(token, domain),
+            "Type": "CNAME",
+            "ResourceRecords": [_DKIM_VALUE(token)],
+            "TTL": ttl,
+        } for token in dkim_tokens])
+
+    mail_from_domain = properties.get("MailFromDomain")
+    if mail_from_domain:
+        if properties.get("MailFromMX"):
+            records.append({
+                "Name": _FQDN(mail_from_domain),
+                "Type": "MX",
+                "ResourceRecords": [_MX_VALUE(properties["MailFromMX"])],
+                "TTL": ttl})
+        if properties.get("MailFromSPF"):
+            records.append({
+                "Name": _FQDN(mail_from_domain),
+                "Type": "TXT",
+                "ResourceRecords": [properties["MailFromSPF"]],
+                "TTL": ttl})
+
+    dmarc = properties.get("DMARC")
+    if dmarc:
+        records.append({
+            "Name": _DMARC_NAME(domain),
+            "Type": "TXT",
+            "ResourceRecords": [dmarc],
+            "TTL": ttl})
+
+    receive_mx = properties.get("ReceiveMX")
+    if receive_mx:
+        records.append({
+            "Name": _FQDN(domain),
+            "Type": "MX",
+            "ResourceRecords": [_MX_VALUE(receive_mx)],
+            "TTL": ttl})
+
+    return records
+
+
+class RecordPlanner:
+    """Plans the records for many domains, merging records that share a name and type.
+
+    Keeps an index of the planned records by record_key. A record that collides
+    with an earlier one is merged into it (adding any new values), as Route 53 requires.
+    Use plan() to stream records as they become final, or add() each domain and
+    then records() for all of them.
+
+    A domain can only have one DMARC policy, so differing _dmarc values raise ValueError.
+    """
+
+    def __init__(self):
+        self.index = {}
+        self.final = set()  # keys of the records plan() has yielded (and dropped from the index)
+
+    def add(self, properties):
+        """Plan the records for one domain's properties (see domain_records).
+
+        Returns the records with a new name and type. (Records merged into
+        earlier ones aren't returned: the earlier record gets their values.)
+        """
+        index = self.index
+        new_records = []
+        for record in domain_records(properties):
+            key = record_key(record)
+            if key in self.final:
+                raise ValueError(f"Record {record['Name']} for {properties['Domain']!r} was already planned:"
+                                 f" list a domain and its subdomains together.")
+            existing = index.get(key)
+            if existing is None:
+                index[key] = record
+                new_records.append(record)
+                continue
+            values = existing["ResourceRecords"]
+            new_values = [value for value in record["ResourceRecords"] if value not in values]
+            if new_values and key[0].startswith("_dmarc."):
+                raise ValueError(f"Conflicting DMARC records for {properties['Domain']!r}:"
+                                 f" {values[0]} and {new_values[0]}.")
+            values.extend(new_values)
+        return new_records
+
+    def plan(self, configs):
+        """Yield the merged records for configs (an iterable of domain properties), once they're final.
+
+        Records can only collide between a domain and its subdomains, so each group of
+        related domains is yielded when a config for an unrelated domain follows it.
+        (Records outside their domain are held until the end.) Yielded records are dropped
+        from the index, so memory use doesn't grow with them. configs must list related
+        domains together -- e.g., sorted by domain_sort_key -- or ValueError is raised
+        for a record that collides with one already yielded.
+        """
+        root = None
+        group = []
+        held = []
+        for properties in configs:
+            domain = properties["Domain"].lower()
+            if root is None or not (domain == root or domain.endswith(f".{root}")):
+                yield from self._finalize(group)
+                group = []
+                root = domain
+            for record in self.add(properties):
+                name = record["Name"].lower()
+                if name == f"{root}." or name.endswith(f".{root}."):
+                    group.append(record)
+                else:
+                    held.append(record)
+        yield from self._finalize(group)
+        yield from self._finalize(held)
+
+    def _finalize(self, records):
+        for record in records:
+            key = record_key(record)
+            self.final.add(key)
+            del self.index[key]
+            yield record
+
+    def records(self):
+        """Return all planned records (merged) not yet yielded by plan(), in the order first planned"""
+        return list(self.index.values())
+
+
+def domain_sort_key(domain):
+    """Return a sort key that lists each domain just before its subdomains (for RecordPlanner.plan)"""
+    return domain.lower().split(".")[::-1]
+
+
+def plan_records(configs):
+    """Return the merged list of records required for configs (an iterable of domain properties).
+
+    Raises ValueError if configs require conflicting DMARC records.
+    """
+    planner = RecordPlanner()
+    for properties in configs:
+        planner.add(properties)
+    return planner.records()
+
+
+# The values each compact_records entry refers to by position in its "Values" list
+_COMPACT_FIELDS = ("TTL", "MailFromDomain", "MailFromMX", "MailFromSPF", "DMARC", "ReceiveMX")
+
+
+def compact_records(configs):
+    """Return a compact index of the records required for configs (an iterable of domain properties).
+
+    The index is a dict with "Values" (the distinct values shared between domains: TTL,
+    MAIL FROM subdomain and MX, SPF, DMARC and receiving MX), and "Domains", with an entry
+    for each config in order: [VerificationToken, DkimTokens, *positions in Values]
+    (positions follow _COMPACT_FIELDS, and are null for missing values).
+    A MailFromDomain under the domain is listed relative to it; anything else ends with a period.
+    Use expand_records to recover the merged records.
+    """
+    values = {}
+    entries = []
+    for properties in configs:
+        domain = properties["Domain"]
+        mail_from_domain = properties.get("MailFromDomain")
+        if mail_from_domain:
+            if mail_from_domain.endswith(f".{domain}"):
+                mail_from_domain = mail_from_domain[:-len(domain) - 1]
+            else:
+                mail_from_domain = _FQDN(mail_from_domain)
+        shared = {**properties, "MailFromDomain": mail_from_domain}
+        entries.append([
+            properties.get("VerificationToken") or None,
+            properties.get("DkimTokens") or [],
+            *(values.setdefault(shared[field], len(values)) if shared.get(field) else None
+              for field in _COMPACT_FIELDS)])
+    return {"Values": list(values), "Domains": entries}
+
+
+def expand_records(domains, index):
+    """Return the merged records for domains (a list of domain names) from compact_records' index"""
+    values = index["Values"]
+    planner = RecordPlanner()
+    for domain, (verification_token, dkim_tokens, *positions) in zip(domains, index["Domains"]):
+        properties = {field: values[position] if position is not None else None
+                      for field, position in zip(_COMPACT_FIELDS, positions)}
+        mail_from_domain = properties["MailFromDomain"]
+        if mail_from_domain:
+            properties["MailFromDomain"] = (
+                mail_from_domain[:-1] if mail_from_domain.endswith(".") else f"{mail_from_domain}.{domain}")
+        planner.add({**properties, "Domain": domain,
+                     "VerificationToken": verification_token, "DkimTokens": dkim_tokens})
+    return planner.records()
+
+
+def merge_records(records):
+    """Return records, combining any with the same name and type into a single record.
+
+    (Doesn't modify the records passed in.)
+    """
+    merged = {}
+    for record in records:
+        key = record_key(record)
+        if key in merged:
+            values = merged[key]["ResourceRecords"]
+            values.extend(value for value in record["ResourceRecords"] if value not in values)
+        else:
+            merged[key] = dict(record, ResourceRecords=list(record["ResourceRecords"]))
+    return list(merged.values())
@@ -0,0 +1,366 @@
+# Local Amazon SES and CloudFormation response emulator, for end-to-end and load testing
+#
+# Usage: python -m aws_cfn_ses_domain.emulator [--ses-port PORT] [--responses-port PORT]
+#                                              [--latency SECONDS] [--throttle-probability P] ...
+#
+# SESEmulator is an HTTP server speaking enough of the (classic) Amazon SES query API
+# to answer the calls the handlers make, keeping identities in memory. It can add
+# latency to each call, and throttle calls (at random, or above a rate limit).
+# Point the unmodified handlers at it with its environ() (botocore's
+# AWS_ENDPOINT_URL_SES setting, plus placeholder credentials).
+#
+# ResponseCollector is an HTTP server accepting CloudFormation custom resource
+# responses: use its response_url() as each request event's presigned ResponseURL.
+#
+# (Not emulated: the SESv2 API, Route 53, and the Lambda re-invocations
+# used by WaitForVerification and Custom::SES_EmailIdentityBatch continuations.)
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote
+from xml.sax.saxutils import escape
+
+SES_NAMESPACE = "http://ses.amazonaws.com/doc/2010-12-01/"
+
+
+class _LocalServer:
+    """Threaded HTTP/1.1 (keep-alive) server on localhost, run in a background thread"""
+
+    def __init__(self, port=0, latency=0.0):
+        self.latency = latency  # seconds added to each request
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                server._handle(self)
+
+            def do_PUT(self):
+                server._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.url = "http://127.0.0.1:{}".format(self.server.server_address[1])
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _handle(self, request):
+        body = request.rfile.read(int(request.headers.get("Content-Length") or 0))
+        if self.latency:
+            time.sleep(self.latency)
+        status, content_type, response_body = self.respond(request.command, request.path, body)
+        request.send_response(status)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(response_body)))
+        request.end_headers()
+        request.wfile.write(response_body)
+
+    def respond(self, method, path, body):
+        """Return (status, content type, body bytes) for a request"""
+        raise NotImplementedError
+
+
+class SESError(Exception):
+    def __init__(self, code, message, status=400, error_type="Sender"):
+        super().__init__(message)
+        self.code = code
+        self.status = status
+        self.error_type = error_type
+
+
+class XmlMap(dict):
+    """A dict serialized as an SES query API map (entry/key/value elements)"""
+
+
+class SESEmulator(_LocalServer):
+    """Local Amazon SES (classic query API) endpoint.
+
+    latency: seconds added to every call
+    throttle_probability: fraction of calls (at random) answered with a Throttling error
+    rate_limit: calls per second allowed (bursts up to one second's worth, at least 1); calls
+        over the limit get a Throttling error, like SES's per-account limits
+    verify_after: seconds after an identity is created until SES reports it verified
+        (None to leave identities pending)
+    """
+
+    def __init__(self, port=0, latency=0.0, throttle_probability=0.0, rate_limit=None, verify_after=0.0,
+                 seed=None):
+        super().__init__(port=port, latency=latency)
+        self.throttle_probability = throttle_probability
+        self.rate_limit = rate_limit
+        self.verify_after = verify_after
+        self.identities = {}  # identity: dict of its attributes
+        self.calls = Counter()  # action: calls (including throttled ones)
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self._burst = max(rate_limit or 0.0, 1.0)
+        self._tokens = self._burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def environ(self):
+        """Return environment variables pointing boto3 (and so the handlers) at this emulator"""
+        return {
+            "AWS_ENDPOINT_URL_SES": self.url,
+            "AWS_ACCESS_KEY_ID": "EMULATED",
+            "AWS_SECRET_ACCESS_KEY": "EMULATED",
+        }
+
+    def stats(self):
+        with self._lock:
+            return {"calls": dict(self.calls), "throttled": self.throttled, "identities": len(self.identities)}
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls.clear()
+            self.throttled = 0
+
+    def respond(self, method, path, body):
+        params = {key: values[0] for key, values in parse_qs(body.decode("utf-8")).items()}
+        action = params.get("Action", "")
+        request_id = str(uuid.uuid4())
+        try:
+            with self._lock:
+                self.calls[action] += 1
+                self._check_throttling()
+                result = self._dispatch(action, params)
+        except SESError as error:
+            body = (f'<ErrorResponse xmlns="{SES_NAMESPACE}"><Error><Type>{error.error_type}</Type>'
+                    f'<Code>{error.code}</Code><Message>{escape(str(error))}</Message></Error>'
+                    f'<RequestId>{request_id}</RequestId></ErrorResponse>')
+            return error.status, "text/xml", body.encode("utf-8")
+        body = (f'<{action}Response xmlns="{SES_NAMESPACE}"><{action}Result>{_to_xml(result)}</{action}Result>'
+                f'<ResponseMetadata><RequestId>{request_id}</RequestId></ResponseMetadata></{action}Response>')
+        return 200, "text/xml", body.encode("utf-8")
+
+    def _check_throttling(self):
+        throttle = self.throttle_probability and self._random.random() < self.throttle_probability
+        if self.rate_limit:
+            now = time.monotonic()
+            self._tokens = min(self._burst, self._tokens + (now - self._updated) * self.rate_limit)
+            self._updated = now
+            if self._tokens < 1:
+                throttle = True
+            elif not throttle:
+                self._tokens -= 1
+        if throttle:
+            self.throttled += 1
+            raise SESError("Throttling", "Maximum sending rate exceeded.")
+
+    def _dispatch(self, action, params):
+        try:
+            method = getattr(self, "action_" + action)
+        except AttributeError:
+            raise SESError("InvalidAction", f"The action {action!r} is not emulated.") from None
+        return method(params)
+
+    def _identity(self, identity, create=True):
+        if identity not in self.identities and create:
+            self.identities[identity] = {"Created": time.monotonic(), "DkimEnabled": False, "DkimTokens": []}
+        return self.identities.get(identity)
+
+    def _status(self, attributes):
+        verified = (self.verify_after is not None
+                    and time.monotonic() - attributes["Created"] >= self.verify_after)
+        return "Success" if verified else "Pending"
+
+    @staticmethod
+    def _members(params, name):
+        members = []
+        while f"{name}.member.{len(members) + 1}" in params:
+            members.append(params[f"{name}.member.{len(members) + 1}"])
+        return members
+
+    def action_VerifyDomainIdentity(self, params):
+        attributes = self._identity(params["Domain"])
+        attributes.setdefault("VerificationToken", uuid.uuid4().hex)
+        return {"VerificationToken": attributes["VerificationToken"]}
+
+    def action_VerifyDomainDkim(self, params):
+        attributes = self._identity(params["Domain"])
+        if not attributes["DkimTokens"]:
+            attributes["DkimTokens"] = [uuid.uuid4().hex for _ in range(3)]
+        attributes["DkimEnabled"] = True
+        return {"DkimTokens": attributes["DkimTokens"]}
+
+    def action_VerifyEmailIdentity(self, params):
+        self._identity(params["EmailAddress"])
+        return {}
+
+    def action_DeleteIdentity(self, params):
+        self.identities.pop(params["Identity"], None)
+        return {}
+
+    # (Like SES, the setters quietly succeed for an identity that doesn't exist)
+
+    def action_SetIdentityMailFromDomain(self, params):
+        attributes = self._identity(params["Identity"], create=False)
+        if attributes is not None:
+            attributes["MailFromDomain"] = params.get("MailFromDomain", "")
+            attributes["BehaviorOnMXFailure"] = params.get("BehaviorOnMXFailure", "UseDefaultValue")
+        return {}
+
+    def action_SetIdentityDkimEnabled(self, params):
+        attributes = self._identity(params["Identity"], create=False)
+        if attributes is not None:
+            attributes["DkimEnabled"] = params["DkimEnabled"] == "true"
+        return {}
+
+    def action_GetIdentityVerificationAttributes(self, params):
+        result = XmlMap()
+        for identity in self._members(params, "Identities"):
+            attributes = self._identity(identity, create=False)
+            if attributes is not None:
+                result[identity] = {"VerificationStatus": self._status(attributes)}
+                if "VerificationToken" in attributes:
+                    result[identity]["VerificationToken"] = attributes["VerificationToken"]
+        return {"VerificationAttributes": result}
+
+    def action_GetIdentityDkimAttributes(self, params):
+        result = XmlMap()
+        for identity in self._members(params, "Identities"):
+            attributes = self._identity(identity, create=False)
+            if attributes is not None:
+                result[identity] = {
+                    "DkimEnabled": attributes["DkimEnabled"],
+                    "DkimVerificationStatus": self._status(attributes) if attributes["DkimTokens"] else "NotStarted",
+                    "DkimTokens": attributes["DkimTokens"],
+                }
+        return {"DkimAttributes": result}
+
+    def action_GetIdentityMailFromDomainAttributes(self, params):
+        result = XmlMap()
+        for identity in self._members(params, "Identities"):
+            attributes = self._identity(identity, create=False)
+            if attributes is not None and attributes.get("MailFromDomain"):
+                result[identity] = {
+                    "MailFromDomain": attributes["MailFromDomain"],
+                    "MailFromDomainStatus": self._status(attributes),
+                    "BehaviorOnMXFailure": attributes["BehaviorOnMXFailure"],
+                }
+        return {"MailFromDomainAttributes": result}
+
+    def action_ListIdentities(self, params):
+        identity_type = params.get("IdentityType")
+        identities = [identity for identity in self.identities
+                      if identity_type is None or ("@" in identity) == (identity_type == "EmailAddress")]
+        return {"Identities": identities}
+
+    def action_GetSendQuota(self, params):
+        return {"Max24HourSend": 200.0, "MaxSendRate": float(self.rate_limit or 1), "SentLast24Hours": 0.0}
+
+
+def _to_xml(value):
+    if isinstance(value, XmlMap):
+        return "".join(f"<entry><key>{escape(key)}</key><value>{_to_xml(item)}</value></entry>"
+                       for key, item in value.items())
+    if isinstance(value, dict):
+        return "".join(f"<{key}>{_to_xml(item)}</{key}>" for key, item in value.items())
+    if isinstance(value, list):
+        return "".join(f"<member>{_to_xml(item)}</member>" for item in value)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return escape(str(value))
+
+
+class ResponseCollector(_LocalServer):
+    """Local endpoint collecting CloudFormation custom resource responses (presigned-URL-style PUTs).
+
+    latency: seconds added to every PUT
+    error_probability: fraction of PUTs (at random) answered with a 503, to exercise retries
+    """
+
+    def __init__(self, port=0, latency=0.0, error_probability=0.0, seed=None):
+        super().__init__(port=port, latency=latency)
+        self.error_probability = error_probability
+        self.responses = []  # (parsed JSON) in order received
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._received = threading.Condition()
+
+    def response_url(self, name="response"):
+        """Return a presigned-S3-style URL for a request's response"""
+        return (f"{self.url}/{quote(name)}?X-Amz-Algorithm=AWS4-HMAC-SHA256"
+                f"&X-Amz-Expires=7200&X-Amz-Signature=emulated")
+
+    def respond(self, method, path, body):
+        if method != "PUT":
+            return 405, "text/plain", b"Method not allowed"
+        with self._received:
+            if self.error_probability and self._random.random() < self.error_probability:
+                self.errors += 1
+                return 503, "text/plain", b"Service unavailable"
+            self.responses.append(json.loads(body))
+            self._received.notify_all()
+        return 200, "text/plain", b""
+
+    def reset(self):
+        """Forget the responses (and errors) received so far"""
+        with self._received:
+            del self.responses[:]
+            self.errors = 0
+
+    def wait_for_responses(self, count, timeout=None):
+        """Wait until at least count responses have arrived; returns whether they did"""
+        with self._received:
+            return self._received.wait_for(lambda: len(self.responses) >= count, timeout=timeout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m aws_cfn_ses_domain.emulator",
+        description="Run local Amazon SES and CloudFormation response endpoints, for testing the handlers.")
+    parser.add_argument("--ses-port", type=int, default=0, help="SES endpoint port (default any free port)")
+    parser.add_argument("--responses-port", type=int, default=0,
+                        help="CloudFormation response endpoint port (default any free port)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to each SES call")
+    parser.add_argument("--throttle-probability", type=float, default=0.0,
+                        help="fraction of SES calls to throttle at random")
+    parser.add_argument("--rate-limit", type=float, help="SES calls per second before throttling")
+    parser.add_argument("--verify-after", type=float, default=0.0,
+                        help="seconds until new identities are verified (default %(default)s)")
+    args = parser.parse_args(argv)
+
+    ses = SESEmulator(port=args.ses_port, latency=args.latency, throttle_probability=args.throttle_probability,
+                      rate_limit=args.rate_limit, verify_after=args.verify_after)
+    collector = ResponseCollector(port=args.responses_port)
+    with ses, collector:
+        for name, value in ses.environ().items():
+            print(f"export {name}={value}")
+        print(f"# ResponseURL: {collector.response_url()}", flush=True)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+    print(json.dumps({"ses": ses.stats(), "responses": len(collector.responses)}), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
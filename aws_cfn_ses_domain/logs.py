@@ -0,0 +1,140 @@
+# Structured, size-capped logging of handler events, AWS responses and results
+#
+# Verbose records (events, properties, AWS call requests and responses) are
+# logged at INFO as a single JSON object, formatted lazily (only if the record
+# is actually emitted). Each field is capped at LOG_MAX_FIELD_SIZE characters,
+# the presigned CloudFormation ResponseURL is redacted, and boto3
+# ResponseMetadata is trimmed to its RequestId and HTTPStatusCode.
+#
+# Only LOG_SAMPLE_RATE of invocations log their verbose records. The rest keep
+# them (unformatted), and if the invocation fails, log them all in full, so
+# FAILED requests always have complete detail.
+import json
+import logging
+import os
+import random
+import threading
+
+logger = logging.getLogger()
+
+# Fraction of invocations that log verbose records (at INFO)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1"))
+# Maximum characters logged for each field of a verbose record (0 for no limit)
+LOG_MAX_FIELD_SIZE = int(os.getenv("LOG_MAX_FIELD_SIZE", "2048"))
+# Maximum verbose records kept for an invocation, in case it fails
+MAX_KEPT_RECORDS = 1000
+
+REDACTED = "[REDACTED]"
+
+# ResponseMetadata keys worth logging
+RESPONSE_METADATA_KEYS = ("RequestId", "HTTPStatusCode", "RetryAttempts")
+
+
+class StructuredMessage:
+    """A log message (with fields) that is only serialized to JSON when str() is called"""
+
+    __slots__ = ("message", "fields", "max_field_size")
+
+    def __init__(self, message, fields, max_field_size=None):
+        self.message = message
+        self.fields = fields
+        self.max_field_size = max_field_size
+
+    def __str__(self):
+        record = {"message": self.message}
+        for name, value in self.fields.items():
+            record[name] = cap(sanitize(value), self.max_field_size)
+        return json.dumps(record, default=str)
+
+
+def sanitize(value):
+    """Return value with ResponseURLs redacted and ResponseMetadata trimmed (recursively)"""
+    if isinstance(value, dict):
+        sanitized = {}
+        for key, item in value.items():
+            if key == "ResponseURL" and isinstance(item, str):
+                sanitized[key] = redact_url(item)
+            elif key == "ResponseMetadata" and isinstance(item, dict):
+                sanitized[key] = {k: item[k] for k in RESPONSE_METADATA_KEYS if k in item}
+            else:
+                sanitized[key] = sanitize(item)
+        return sanitized
+    if isinstance(value, (list, tuple)):
+        return [sanitize(item) for item in value]
+    return value
+
+
+def redact_url(url):
+    """Return url without its query (e.g. a presigned URL's signature)"""
+    base, sep, _query = url.partition("?")
+    return f"{base}?{REDACTED}" if sep else base
+
+
+def cap(value, max_size):
+    """Return value, or (if its JSON is longer than max_size) a truncated string of its JSON"""
+    if not max_size:
+        return value
+    serialized = value if isinstance(value, str) else json.dumps(value, default=str)
+    if len(serialized) <= max_size:
+        return value
+    return f"{serialized[:max_size]}... ({len(serialized)} chars)"
+
+
+class InvocationLog:
+    """Verbose logging for one handler invocation (thread-safe)"""
+
+    def __init__(self, sample_rate=None, max_field_size=None, random=random.random):
+        sample_rate = LOG_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.sampled = sample_rate >= 1 or random() < sample_rate
+        self.max_field_size = LOG_MAX_FIELD_SIZE if max_field_size is None else max_field_size
+        self.kept = []  # verbose records that weren't logged
+        self.dropped = 0  # verbose records beyond MAX_KEPT_RECORDS
+        self._lock = threading.Lock()
+
+    def verbose(self, message, **fields):
+        """Log message and fields at INFO (if sampled), or keep them in case the invocation fails"""
+        if self.sampled and logger.isEnabledFor(logging.INFO):
+            logger.info("%s", StructuredMessage(message, fields, self.max_field_size))
+            return
+        # (Snapshot the fields: handlers go on to change some of them, like properties, in place)
+        fields = {name: sanitize(value) for name, value in fields.items()}
+        with self._lock:
+            if len(self.kept) < MAX_KEPT_RECORDS:
+                self.kept.append((message, fields))
+            else:
+                self.dropped += 1
+
+    def log_failure_detail(self):
+        """Log (in full, at WARNING) the verbose records that weren't logged"""
+        with self._lock:
+            kept, self.kept = self.kept, []
+            dropped, self.dropped = self.dropped, 0
+        for message, fields in kept:
+            logger.warning("%s", StructuredMessage(message, fields))
+        if dropped:
+            logger.warning("(%d more verbose records were discarded)", dropped)
+
+
+# The InvocationLog for the invocation in progress
+_current = InvocationLog(sample_rate=1)
+
+
+def start_invocation_log():
+    """Start verbose logging for a new handler invocation (deciding whether it is sampled)"""
+    global _current
+    _current = InvocationLog()
+    return _current
+
+
+def current_invocation_log():
+    return _current
+
+
+def log_verbose(message, **fields):
+    """Log message and fields as a verbose record for the current invocation"""
+    _current.verbose(message, **fields)
+
+
+def log_failure_detail():
+    """Log the current invocation's verbose records that weren't logged (because it's failing)"""
+    _current.log_failure_detail()
@@ -0,0 +1,130 @@
+# Per-call latency metrics, emitted in CloudWatch Embedded Metric Format (EMF)
+#
+# When METRICS_ENABLED is set, each handler invocation records the duration,
+# retries and outcome of every AWS call made through calls.ManagedClient, and
+# of the CloudFormation response PUT. When the invocation ends, the metrics
+# are written to stdout as EMF JSON lines (one for each operation and region,
+# plus one for the invocation itself), which CloudWatch Logs turns into metrics.
+# (EMF allows only a single value for each dimension in a line.)
+#
+# When disabled, recording is skipped entirely.
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from .utils import to_bool
+
+METRICS_ENABLED = to_bool(os.getenv("METRICS_ENABLED", "false"))
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "aws-cfn-ses-domain")
+
+# EMF allows at most 100 values for a metric in each line
+MAX_VALUES_PER_LINE = 100
+
+SUCCESS = "Success"
+
+# Separate from the (root) handler logger, because EMF lines must be bare JSON
+metrics_logger = logging.getLogger(__name__)
+metrics_logger.propagate = False
+metrics_logger.setLevel(logging.INFO)
+
+# Whether the next invocation is the first in this Lambda container
+_cold_start = True
+# The InvocationMetrics for the invocation in progress (None if disabled)
+_current = None
+
+
+class InvocationMetrics:
+    """Collects the AWS calls made during one handler invocation (thread-safe)"""
+
+    def __init__(self, handler_name, cold_start=False, namespace=None, clock=time.time):
+        self.handler_name = handler_name
+        self.cold_start = cold_start
+        self.namespace = namespace or METRICS_NAMESPACE
+        self.clock = clock
+        self.started = time.perf_counter()
+        self.calls = {}  # (operation, region) -> {"Duration": [...], "Retries": [...], ...}
+        self._lock = threading.Lock()
+
+    def record_call(self, operation, region, duration, attempts=1, outcome=SUCCESS):
+        """Record a call to operation (e.g. "SES:VerifyDomainIdentity") taking duration seconds overall"""
+        with self._lock:
+            values = self.calls.setdefault((operation, region or ""), {
+                "Duration": [], "Retries": [], "Errors": [], "Outcome": []})
+            values["Duration"].append(round(duration * 1000, 3))
+            values["Retries"].append(max(attempts - 1, 0))
+            values["Errors"].append(0 if outcome == SUCCESS else 1)
+            values["Outcome"].append(outcome)
+
+    def emf_lines(self):
+        """Return the EMF JSON lines for the metrics recorded so far"""
+        timestamp = int(self.clock() * 1000)
+        lines = []
+        with self._lock:
+            calls = sorted(self.calls.items())
+        for (operation, region), values in calls:
+            for start in range(0, len(values["Duration"]), MAX_VALUES_PER_LINE):
+                chunk = {name: series[start:start + MAX_VALUES_PER_LINE] for name, series in values.items()}
+                lines.append(self._emf_line(timestamp, [["Operation", "Region"]], {
+                    "Duration": "Milliseconds", "Retries": "Count", "Errors": "Count",
+                }, {"Operation": operation, "Region": region, "Handler": self.handler_name, **chunk}))
+        lines.append(self._emf_line(timestamp, [["Handler"]], {
+            "InvocationDuration": "Milliseconds", "ColdStart": "Count",
+        }, {
+            "Handler": self.handler_name,
+            "InvocationDuration": round((time.perf_counter() - self.started) * 1000, 3),
+            "ColdStart": 1 if self.cold_start else 0,
+        }))
+        return lines
+
+    def _emf_line(self, timestamp, dimensions, metrics, values):
+        return json.dumps({
+            "_aws": {
+                "Timestamp": timestamp,
+                "CloudWatchMetrics": [{
+                    "Namespace": self.namespace,
+                    "Dimensions": dimensions,
+                    "Metrics": [{"Name": name, "Unit": unit} for name, unit in metrics.items()],
+                }],
+            },
+            **values,
+        }, separators=(",", ":"))
+
+    def flush(self):
+        """Write the EMF lines to metrics_logger"""
+        if not metrics_logger.handlers:
+            handler = logging.StreamHandler(sys.stdout)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            metrics_logger.addHandler(handler)
+        for line in self.emf_lines():
+            metrics_logger.info(line)
+
+
+def current_metrics():
+    """Return the InvocationMetrics for the invocation in progress (or None if metrics are disabled)"""
+    return _current
+
+
+def instrumented(handler_name):
+    """Decorator for a Lambda handler(event, context), emitting EMF metrics for each invocation"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            global _cold_start, _current
+            if not METRICS_ENABLED:
+                return handler(event, context)
+            _current = InvocationMetrics(handler_name, cold_start=_cold_start)
+            _cold_start = False
+            try:
+                return handler(event, context)
+            finally:
+                invocation, _current = _current, None
+                try:
+                    invocation.flush()
+                except Exception:
+                    logging.getLogger().exception("Error emitting metrics")
+        return wrapper
+    return decorator
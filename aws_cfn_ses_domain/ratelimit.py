@@ -0,0 +1,106 @@
+# Client-side rate limiting for AWS control-plane calls
+
+import os
+import threading
+import time
+
+
+# Amazon SES calls per second (per region) allowed by each Lambda container;
+# the rate adapts between SES_MIN_RATE_LIMIT and SES_RATE_LIMIT (0 for no limit)
+SES_RATE_LIMIT = float(os.getenv("SES_RATE_LIMIT", "5"))
+SES_MIN_RATE_LIMIT = float(os.getenv("SES_MIN_RATE_LIMIT", "0.5"))
+
+
+class RateLimiter:
+    """Thread-safe token bucket.
+
+    Allows an average of `rate` acquisitions per second, with bursts of up
+    to `burst` (default: one second's worth, but at least 1).
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError(f"Invalid rate {rate!r}")
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1))
+        self.clock = clock
+        self.sleep = sleep
+        self.total_wait = 0.0  # seconds spent waiting in acquire()
+        self.throttled = 0  # calls reported to on_throttle()
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Wait until a token is available, take it, and return the seconds waited"""
+        with self._lock:
+            self._refill()
+            # Take the token now (possibly going negative), so later callers queue up behind us
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.total_wait += wait
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+    def next_wait(self):
+        """Return the seconds acquire() would wait if called now (without taking a token)"""
+        with self._lock:
+            self._refill()
+            return max(0.0, (1 - self._tokens) / self.rate)
+
+    def on_success(self):
+        """Report that a rate-limited call succeeded"""
+
+    def on_throttle(self):
+        """Report that a rate-limited call was throttled by the service"""
+        with self._lock:
+            self.throttled += 1
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    """RateLimiter that backs off when calls are throttled, and ramps back up as they succeed.
+
+    The rate starts at (and never exceeds) max_rate. Each throttled call multiplies
+    the rate by decrease_factor (but not below min_rate), and empties the bucket.
+    Each successful call adds increase (default: 5% of max_rate) to the rate.
+    """
+
+    def __init__(self, max_rate, min_rate=None, decrease_factor=0.5, increase=None, **kwargs):
+        super().__init__(max_rate, **kwargs)
+        self.max_rate = self.rate
+        self.min_rate = min(float(min_rate), self.max_rate) if min_rate is not None else self.max_rate / 10
+        self.decrease_factor = decrease_factor
+        self.increase = increase if increase is not None else self.max_rate / 20
+
+    def on_success(self):
+        with self._lock:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self):
+        with self._lock:
+            self._refill()
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self._tokens = min(self._tokens, 0.0)
+
+
+# Shared across warm invocations, so a container remembers its recent throttling
+ses_rate_limiters = {}
+_ses_rate_limiters_lock = threading.Lock()
+
+
+def ses_rate_limiter(region_name):
+    """Return the AdaptiveRateLimiter for Amazon SES calls in region_name (or None if disabled)"""
+    if SES_RATE_LIMIT <= 0:
+        return None
+    with _ses_rate_limiters_lock:
+        if region_name not in ses_rate_limiters:
+            ses_rate_limiters[region_name] = AdaptiveRateLimiter(SES_RATE_LIMIT, min_rate=SES_MIN_RATE_LIMIT)
+        return ses_rate_limiters[region_name]
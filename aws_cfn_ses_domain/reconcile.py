@@ -0,0 +1,66 @@
+# Read-before-write support: fetch current Amazon SES identity state,
+# so handlers can skip mutations that wouldn't change anything
+
+# SES's GetIdentity*Attributes operations accept at most this many identities per call
+MAX_IDENTITIES_PER_CALL = 100
+
+# Verification statuses where SES is still using (or has accepted) the existing token
+ACTIVE_STATUSES = ("Pending", "Success")
+
+
+# The kinds of identity attributes fetch_identity_states can read
+ALL_ATTRIBUTES = ("verification", "dkim", "mail_from")
+
+
+def fetch_identity_states(ses, identities, attributes=ALL_ATTRIBUTES):
+    """Return {identity: state} for the identities that exist in SES.
+
+    Each state dict combines the identity's verification, DKIM and MAIL FROM
+    attributes, as returned by SES (VerificationStatus, VerificationToken,
+    DkimEnabled, DkimVerificationStatus, DkimTokens, MailFromDomain, ...).
+    Makes one SES call for each of the requested attributes per
+    MAX_IDENTITIES_PER_CALL identities.
+
+    (If "verification" isn't included in attributes, an identity that doesn't
+    exist may be indistinguishable from one that does.)
+    """
+    identities = list(identities)
+    states = {}
+
+    def merge(identity_attributes):
+        for identity, values in identity_attributes.items():
+            states.setdefault(identity, {}).update(values)
+
+    for start in range(0, len(identities), MAX_IDENTITIES_PER_CALL):
+        chunk = identities[start:start + MAX_IDENTITIES_PER_CALL]
+        if "verification" in attributes:
+            merge(ses.get_identity_verification_attributes(Identities=chunk)["VerificationAttributes"])
+        if "dkim" in attributes:
+            merge(ses.get_identity_dkim_attributes(Identities=chunk)["DkimAttributes"])
+        if "mail_from" in attributes:
+            merge(ses.get_identity_mail_from_domain_attributes(Identities=chunk)["MailFromDomainAttributes"])
+    if "verification" in attributes:
+        # Only identities with verification attributes actually exist
+        # (SES returns default DKIM and MAIL FROM attributes for unknown identities)
+        states = {identity: state for identity, state in states.items() if "VerificationStatus" in state}
+    return states
+
+
+def identity_exists(state):
+    return bool(state)
+
+
+def identity_needs_verification(state):
+    """Whether SES:VerifyDomainIdentity would change anything for an identity in state"""
+    return not (state.get("VerificationToken") and state.get("VerificationStatus") in ACTIVE_STATUSES)
+
+
+def dkim_needs_verification(state):
+    """Whether SES:VerifyDomainDkim would change anything for an identity in state"""
+    return not (state.get("DkimTokens") and state.get("DkimEnabled")
+                and state.get("DkimVerificationStatus") in ACTIVE_STATUSES)
+
+
+def mail_from_needs_update(state, mail_from_domain):
+    """Whether SES:SetIdentityMailFromDomain(mail_from_domain) would change anything for an identity in state"""
+    return state.get("MailFromDomain", "") != mail_from_domain
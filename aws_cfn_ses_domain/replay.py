@@ -0,0 +1,203 @@
+# Replaying the response to duplicate CloudFormation custom resource requests
+#
+# CloudFormation (and Lambda's async retries) can deliver the same request
+# more than once. Each response sent is stored, keyed by the request's
+# RequestId and a hash of its (canonical) properties. A duplicate request
+# within REPLAY_CACHE_TTL re-sends the stored response, without repeating
+# any Amazon SES calls (e.g., without sending another verification email).
+#
+# REPLAY_CACHE selects the store:
+# - "memory" (default): within a warm Lambda container
+# - "tmp": files in REPLAY_CACHE_DIR (also just within a container, but shared
+#   by all the handlers, and surviving a handler module reload)
+# - "dynamodb": shared by all containers, in table REPLAY_CACHE_TABLE (which
+#   needs a string partition key "Key", and should have TTL enabled on "ExpiresAt")
+# - "none": disabled
+import functools
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger()
+
+REPLAY_CACHE = os.getenv("REPLAY_CACHE", "memory")
+REPLAY_CACHE_TTL = float(os.getenv("REPLAY_CACHE_TTL", "3600"))  # seconds
+REPLAY_CACHE_DIR = os.getenv("REPLAY_CACHE_DIR", os.path.join(tempfile.gettempdir(), "aws-cfn-ses-domain-replay"))
+REPLAY_CACHE_TABLE = os.getenv("REPLAY_CACHE_TABLE", "")
+
+# Request fields that identify a request (along with its RequestId)
+KEY_FIELDS = ("RequestType", "ResourceType", "StackId", "LogicalResourceId", "PhysicalResourceId",
+              "ResourceProperties", "OldResourceProperties")
+
+
+def replay_key(event):
+    """Return the store key for a CloudFormation request event"""
+    canonical = json.dumps({field: event.get(field) for field in KEY_FIELDS},
+                           sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return f"{event.get('RequestId')}:{digest}"
+
+
+class MemoryStore:
+    """Stores responses in memory (thread-safe), evicting the oldest beyond max_entries"""
+
+    def __init__(self, ttl=None, max_entries=1000, clock=time.time):
+        self.ttl = REPLAY_CACHE_TTL if ttl is None else ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = {}  # key -> (expires_at, response); in insertion order
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self.clock() >= entry[0]:
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def put(self, key, response):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (self.clock() + self.ttl, response)
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FileStore:
+    """Stores responses as JSON files in directory"""
+
+    def __init__(self, directory=None, ttl=None, clock=time.time):
+        self.directory = directory or REPLAY_CACHE_DIR
+        self.ttl = REPLAY_CACHE_TTL if ttl is None else ttl
+        self.clock = clock
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("Key") != key or self.clock() >= entry["ExpiresAt"]:
+            return None
+        return entry["Response"]
+
+    def put(self, key, response):
+        os.makedirs(self.directory, exist_ok=True)
+        entry = {"Key": key, "ExpiresAt": self.clock() + self.ttl, "Response": response}
+        # Write atomically, so a concurrent get never sees a partial file
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+class DynamoDBStore:
+    """Stores responses in a DynamoDB table (with partition key "Key", and TTL on "ExpiresAt")"""
+
+    def __init__(self, table_name=None, dynamodb=None, ttl=None, clock=time.time):
+        self.table_name = table_name or REPLAY_CACHE_TABLE
+        if not self.table_name:
+            raise ValueError("DynamoDBStore requires a table_name (REPLAY_CACHE_TABLE)")
+        self._dynamodb = dynamodb
+        self.ttl = REPLAY_CACHE_TTL if ttl is None else ttl
+        self.clock = clock
+
+    @property
+    def dynamodb(self):
+        if self._dynamodb is None:
+            from .calls import get_managed_client  # (deferred: only needed if replaying)
+            return get_managed_client("dynamodb")
+        return self._dynamodb
+
+    def get(self, key):
+        response = self.dynamodb.get_item(
+            TableName=self.table_name, Key={"Key": {"S": key}}, ConsistentRead=True)
+        item = response.get("Item")
+        # (DynamoDB deletes expired items eventually, not immediately)
+        if item is None or self.clock() >= float(item["ExpiresAt"]["N"]):
+            return None
+        return json.loads(item["Response"]["S"])
+
+    def put(self, key, response):
+        self.dynamodb.put_item(TableName=self.table_name, Item={
+            "Key": {"S": key},
+            "ExpiresAt": {"N": str(int(self.clock() + self.ttl))},
+            "Response": {"S": json.dumps(response)},
+        })
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_replay_store():
+    """Return the store selected by REPLAY_CACHE (shared across warm invocations), or None if disabled"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if REPLAY_CACHE == "memory":
+                _store = MemoryStore()
+            elif REPLAY_CACHE == "tmp":
+                _store = FileStore()
+            elif REPLAY_CACHE == "dynamodb":
+                _store = DynamoDBStore()
+            elif REPLAY_CACHE not in ("", "none"):
+                raise ValueError(f"Unknown REPLAY_CACHE {REPLAY_CACHE!r}")
+        return _store
+
+
+def set_replay_store(store):
+    """Use store (or None to return to the REPLAY_CACHE setting); returns the previous store"""
+    global _store
+    with _store_lock:
+        previous, _store = _store, store
+    return previous
+
+
+def remember_response(event, response):
+    """Store response (a dict of cfnresponse.send's arguments) for replay to duplicates of event"""
+    store = get_replay_store()
+    if store is None:
+        return
+    try:
+        store.put(replay_key(event), response)
+    except Exception:
+        logger.warning("Unable to store response for replay", exc_info=True)
+
+
+def replayable(handler):
+    """Decorator for a Lambda handler(event, context), replaying the stored response to duplicate requests"""
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        store = get_replay_store()
+        if store is not None and event.get("RequestId"):
+            try:
+                response = store.get(replay_key(event))
+            except Exception:
+                logger.warning("Unable to check for a stored response", exc_info=True)
+                response = None
+            if response is not None:
+                logger.warning("Replaying the stored %s response to duplicate request %s",
+                               response.get("response_status"), event["RequestId"])
+                from .cfnresponse import send  # (avoid a circular import)
+                return send(event, context, replayed=True, **response)
+        return handler(event, context)
+    return wrapper
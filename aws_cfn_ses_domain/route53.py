@@ -0,0 +1,142 @@
+# Direct Amazon Route 53 updates for the DNS records an SES identity requires
+
+import logging
+import os
+import time
+
+from .deadline import DeadlineExceeded, current_deadline
+from .dns import record_key
+
+logger = logging.getLogger()
+
+
+# Polling for a change to be INSYNC (seconds): first poll delay, growth factor, and maximum delay
+INSYNC_POLL_INITIAL = float(os.getenv("ROUTE53_POLL_INITIAL", "2"))
+INSYNC_POLL_FACTOR = 1.5
+INSYNC_POLL_MAX = float(os.getenv("ROUTE53_POLL_MAX", "10"))
+
+
+class RecordConflict(Exception):
+    """Raised when records can't be added because the hosted zone already has others with the same name and type"""
+
+
+def to_change(action, record):
+    """Return a Route 53 Change for action on a dns.domain_records record"""
+    return {
+        "Action": action,
+        "ResourceRecordSet": {
+            "Name": record["Name"],
+            "Type": record["Type"],
+            "TTL": int(record["TTL"]),
+            "ResourceRecords": [{"Value": value} for value in record["ResourceRecords"]],
+        },
+    }
+
+
+def change_records(route53, hosted_zone_id, creates=(), upserts=(), deletes=(), comment=None):
+    """Apply creates, upserts and deletes to the hosted zone as a single (atomic) change batch.
+
+    Returns the ChangeInfo (with the change's Id and Status), or None if there were no changes.
+    """
+    changes = [to_change("DELETE", record) for record in deletes]
+    changes.extend(to_change("CREATE", record) for record in creates)
+    changes.extend(to_change("UPSERT", record) for record in upserts)
+    if not changes:
+        return None
+    change_batch = {"Changes": changes}
+    if comment:
+        change_batch["Comment"] = comment
+    response = route53.change_resource_record_sets(HostedZoneId=hosted_zone_id, ChangeBatch=change_batch)
+    return response["ChangeInfo"]
+
+
+def wait_for_insync(route53, change_info, deadline=None, clock=time.monotonic, sleep=time.sleep):
+    """Poll until the change described by change_info is INSYNC; return the seconds waited.
+
+    Polls with exponential backoff (INSYNC_POLL_INITIAL up to INSYNC_POLL_MAX seconds).
+    Raises DeadlineExceeded if the change can't be confirmed before deadline
+    (default: the current deadline).
+    """
+    deadline = deadline or current_deadline()
+    start = clock()
+    delay = INSYNC_POLL_INITIAL
+    status = change_info["Status"]
+    while status != "INSYNC":
+        if delay >= deadline.remaining():
+            raise DeadlineExceeded(
+                f"waiting for Route 53 change {change_info['Id']} to be INSYNC"
+                f" (still {status} after {clock() - start:.1f}s)")
+        sleep(delay)
+        delay = min(delay * INSYNC_POLL_FACTOR, INSYNC_POLL_MAX)
+        status = route53.get_change(Id=change_info["Id"])["ChangeInfo"]["Status"]
+    return clock() - start
+
+
+def update_records(route53, hosted_zone_id, records, stale_records=(), owned=(), comment=None, deadline=None):
+    """Add records and delete stale_records in one change batch, and wait for it to be INSYNC.
+
+    Records whose record_key is in owned (records already maintained by the caller)
+    are UPSERTed. Others are CREATEd, so records the caller doesn't own (e.g., a domain's
+    existing MX records or DMARC policy) are never overwritten: Route 53 rejects the
+    change, and this raises RecordConflict.
+
+    (If some stale_records no longer match what's in the zone, the others are deleted
+    separately, with delete_records.) Returns (change_info, seconds until INSYNC),
+    or (None, 0.0) if there was nothing to change.
+    """
+    owned = set(owned)
+    creates = [record for record in records if record_key(record) not in owned]
+    upserts = [record for record in records if record_key(record) in owned]
+    try:
+        try:
+            change_info = change_records(route53, hosted_zone_id, creates=creates, upserts=upserts,
+                                         deletes=stale_records, comment=comment)
+        except route53.exceptions.InvalidChangeBatch as error:
+            if not stale_records:
+                raise
+            logger.info("Deleting stale Route 53 records in %s separately: %s", hosted_zone_id, error)
+            change_info = change_records(route53, hosted_zone_id, creates=creates, upserts=upserts,
+                                         comment=comment)
+            delete_records(route53, hosted_zone_id, stale_records, comment=comment)
+    except route53.exceptions.InvalidChangeBatch as error:
+        if not creates:
+            raise
+        raise RecordConflict(
+            f"Unable to add the DNS records to Route 53 hosted zone {hosted_zone_id}"
+            f" ({error.response['Error']['Message']}). Existing records are never replaced:"
+            f" remove them from the zone, or change the properties that require them."
+        ) from error
+    if change_info is None:
+        return None, 0.0
+    return change_info, wait_for_insync(route53, change_info, deadline=deadline)
+
+
+def delete_records(route53, hosted_zone_id, records, comment=None):
+    """Delete records from the hosted zone, if they still exist; returns the list of records deleted.
+
+    Route 53 rejects a whole change batch if any record in it doesn't exactly match
+    what's in the zone. So if deleting them all at once fails, each record is deleted
+    in its own change (and records that don't match are left alone, with a warning).
+    """
+    records = list(records)
+    if not records:
+        return []
+    try:
+        change_records(route53, hosted_zone_id, deletes=records, comment=comment)
+        return records
+    except route53.exceptions.InvalidChangeBatch as error:
+        if len(records) == 1:
+            logger.warning("Not deleting Route 53 records in %s: %s", hosted_zone_id, error)
+            return []
+        logger.info("Deleting Route 53 records in %s separately: %s", hosted_zone_id, error)
+
+    deleted = []
+    for record in records:
+        try:
+            change_records(route53, hosted_zone_id, deletes=[record], comment=comment)
+        except route53.exceptions.InvalidChangeBatch as error:
+            logger.warning("Not deleting Route 53 %s record %s in %s: %s",
+                           record["Type"], record["Name"], hosted_zone_id, error)
+        else:
+            deleted.append(record)
+    return deleted
@@ -3,12 +3,26 @@
 
 import logging
 import os
-
-import boto3
-from botocore.exceptions import BotoCoreError, ClientError
-
-from .cfnresponse import FAILED, SUCCESS, send
-from .utils import format_arn, to_bool
+import time
+
+from .backends import DKIM_KEY_LENGTHS, SES_BACKEND, backend_class, get_backend
+from .calls import get_managed_client
+from .cfnresponse import FAILED, SUCCESS, limit_response_data, send
+from .continuation import CONTINUATION_FIELD, continue_in_new_invocation
+from .deadline import DeadlineExceeded, start_deadline
+from .dns import domain_records, merge_records, plan_records, record_key
+from .logs import log_verbose, start_invocation_log
+from .metrics import instrumented
+from .ratelimit import ses_rate_limiter
+from .replay import replayable
+from .route53 import RecordConflict, delete_records, update_records
+from .reconcile import (
+    dkim_needs_verification, fetch_identity_states, identity_exists, identity_needs_verification,
+    mail_from_needs_update)
+from .utils import format_arn, parse_arn, run_concurrently, to_bool
+from .verification import VerificationFailed, wait_for_verification
+from .warmup import handles_warmup
+from .zonefile import zone_file_lines
 
 logger = logging.getLogger()
 logger.setLevel(os.getenv("LOG_LEVEL", "WARNING"))
@@ -22,23 +36,52 @@ DEFAULT_PROPERTIES = {
     "CustomDMARC": '"v=DMARC1; p=none; pct=100; sp=none; aspf=r;"',
     "TTL": "1800",
     "Region": os.getenv("AWS_REGION"),  # where the stack (lambda fn) is running
+    "Regions": [],  # if set, provision the domain in each of these regions (instead of Region)
+    "HostedZoneId": "",  # if set, maintain the DNS records directly in this Route 53 zone
+    "SESBackend": SES_BACKEND,  # "ses" (classic API) or "sesv2"
+    "DkimKeyLength": "",  # "1024" or "2048" (sesv2 only); default SES's choice
+    "WaitForVerification": False,  # if true, don't respond until SES has verified the domain
+    "VerificationTimeout": "3300",  # seconds to wait for verification (from the start of the request)
 }
 BOOLEAN_PROPERTIES = ("EnableSend", "EnableReceive")
+# Properties supported only for a single domain (not Custom::SES_DomainBatch)
+SINGLE_DOMAIN_PROPERTIES = (
+    "Regions", "HostedZoneId", "WaitForVerification", "VerificationTimeout", "SESBackend", "DkimKeyLength")
+
+# Attributes to leave out (in order) if a multi-region response would be too large
+MULTI_REGION_OPTIONAL_OUTPUTS = ("ZoneFileEntries", "Route53RecordSets", "Arns")
+
+# Maximum number of independent SES operations to run at once (1 runs them sequentially)
+MAX_CONCURRENCY = int(os.getenv("SES_MAX_CONCURRENCY", "1"))
+
+# Whether to read current SES state first, and skip updates that wouldn't change anything
+RECONCILE = to_bool(os.getenv("SES_RECONCILE", "false"))
+
+# The SES operations update_ses_domain_identity performs, and the (cleaned) properties
+# each depends on. ("Enabled" is EnableSend or EnableReceive. Properties not listed
+# here, like TTL and CustomDMARC, only affect the generated DNS records.)
+OPERATION_PROPERTIES = {
+    "identity": ("Domain", "Region", "Enabled"),
+    "dkim": ("Domain", "Region", "EnableSend", "DkimKeyLength"),
+    "mail_from": ("Domain", "Region", "EnableSend", "MailFromSubdomain"),
+}
+ALL_OPERATIONS = frozenset(OPERATION_PROPERTIES)
 
 
+@handles_warmup
+@instrumented("SES_Domain")
+@replayable
 def handle_domain_identity_request(event, context):
-    logger.info("Received event %r", event)
+    start_deadline(context)
+    start_invocation_log()
+    log_verbose("Received event", event=event)
 
     properties = DEFAULT_PROPERTIES.copy()
     properties.update(event["ResourceProperties"])
-    logger.info("Expanded properties to %r", properties)
+    log_verbose("Expanded properties", properties=properties)
 
     # Clean and validate inputs
-    try:
-        properties["Domain"] = properties["Domain"].strip().rstrip(".")
-    except (AttributeError, TypeError):
-        pass
-    domain = properties["Domain"]
+    properties["Domain"] = domain = clean_domain(properties["Domain"])
 
     if not domain:
         return send(event, context, FAILED,
@@ -52,16 +95,27 @@ def handle_domain_identity_request(event, context):
         resource_type="identity", resource_name=domain,
         defaults_from=event["StackId"])  # current stack's ARN has account and partition
 
-    for prop in BOOLEAN_PROPERTIES:
-        # CloudFormation may convert YAML/JSON bools to strings, so reverse that
-        # https://github.com/medmunds/aws-cfn-ses-domain/issues/10
-        try:
-            properties[prop] = to_bool(properties[prop])
-        except ValueError:
-            return send(event, context, FAILED,
-                        reason=f"The '{prop}' property must be 'true' or 'false',"
-                               f" not '{properties[prop]}'.",
-                        physical_resource_id=domain_arn)
+    try:
+        clean_boolean_properties(properties)
+        clean_verification_properties(properties)
+        clean_backend_properties(properties)
+        properties["Regions"] = clean_regions(properties)
+        # (Changing from Regions back to a single Region also needs the multi-region handling,
+        # to deprovision the other regions without replacing the resource.)
+        multi_region = bool(properties["Regions"]) or (
+            event["RequestType"] == "Update" and bool(event.get("OldResourceProperties", {}).get("Regions")))
+        if multi_region and (properties["HostedZoneId"] or properties["WaitForVerification"]):
+            raise ValueError("The 'Regions' property can't be combined with"
+                             " 'HostedZoneId' or 'WaitForVerification'.")
+    except ValueError as error:
+        return send(event, context, FAILED,
+                    reason=str(error), physical_resource_id=domain_arn)
+
+    continuation = event.get(CONTINUATION_FIELD)
+    if continuation is not None:
+        # Resuming WaitForVerification (the SES and DNS updates are already done)
+        return send_when_verified(event, context, properties, continuation["Outputs"], domain_arn,
+                                  checkpoint=continuation)
 
     if event["RequestType"] == "Delete" and event["PhysicalResourceId"] == domain:
         # v0.3 backwards compatibility:
@@ -73,19 +127,53 @@ def handle_domain_identity_request(event, context):
                     response_data={"Domain": domain},
                     physical_resource_id=domain)
 
+    if event["RequestType"] == "Delete" and identity_region(event["PhysicalResourceId"]) not in (
+            None, *(properties["Regions"] or [properties["Region"]])):
+        # When an Update changes the region(s), the resource gets a new PhysicalResourceId
+        # (the ARN in a region it still uses), and CF will issue a Delete on the old id.
+        # That old identity has already been deprovisioned (or replaced), and the
+        # properties describe the current resource, so ignore the request.
+        return send(event, context, SUCCESS,
+                    response_data={"Domain": domain},
+                    physical_resource_id=event["PhysicalResourceId"])
+
+    if multi_region:
+        return handle_multi_region_request(event, context, properties)
+
+    hosted_zone_id = properties["HostedZoneId"]
+    provisioned_properties = properties.copy()
     if event["RequestType"] == "Delete":
         # Treat Delete as a request to disable both directions
         properties["EnableSend"] = False
         properties["EnableReceive"] = False
 
+    # On Update, only the SES operations affected by changed properties are needed
+    operations = ALL_OPERATIONS
+    old_properties = None
+    if event["RequestType"] == "Update" and "OldResourceProperties" in event:
+        old_properties = clean_old_properties(event["OldResourceProperties"])
+        operations = changed_operations(old_properties, properties)
+        logger.info("Changed properties affect SES operations %r", sorted(operations))
+
     # Update SES
+    from botocore.exceptions import BotoCoreError, ClientError
+    backend = get_backend(properties["SESBackend"], properties["Region"])
     try:
-        outputs = update_ses_domain_identity(domain, properties)
-    except (BotoCoreError, ClientError) as error:
+        if event["RequestType"] == "Delete" and hosted_zone_id:
+            # Remove the DNS records while the identity's tokens are still available
+            state = backend.identity_state(domain, attributes=("verification", "dkim"))
+            route53 = get_managed_client('route53', region_name=properties['Region'])
+            delete_records(route53, hosted_zone_id, required_records(provisioned_properties, state),
+                           comment=f"Amazon SES records for {domain}")
+
+        outputs = backend.provision_domain(domain, properties, operations)
+    except (BotoCoreError, ClientError, DeadlineExceeded) as error:
         # for ClientError, might be helpful to look at error.response, too
         logger.exception("Error updating SES: %s", error)
         return send(event, context, FAILED,
                     reason=str(error), physical_resource_id=domain_arn)
+    finally:
+        backend.log_rate_limit_stats(logger)
 
     # Determine required DNS
     properties.update(outputs)
@@ -98,53 +186,414 @@ def handle_domain_identity_request(event, context):
         "ZoneFileEntries": route53_to_zone_file(route53_records),
     })
 
+    # (Also on an Update that removes HostedZoneId, to delete the records from the old zone)
+    if event["RequestType"] != "Delete" and (
+            hosted_zone_id or (old_properties is not None and old_properties["HostedZoneId"])):
+        try:
+            outputs.update(update_route53_records(
+                get_managed_client('route53', region_name=properties['Region']),
+                hosted_zone_id, route53_records, outputs, old_properties))
+        except (BotoCoreError, ClientError, DeadlineExceeded, RecordConflict) as error:
+            logger.exception("Error updating Route 53: %s", error)
+            return send(event, context, FAILED,
+                        reason=str(error), physical_resource_id=domain_arn)
+
+    return send_when_verified(event, context, properties, outputs, domain_arn)
+
+
+def handle_multi_region_request(event, context, properties):
+    """Provision (cleaned) properties' Domain in each of its Regions concurrently, and send the response.
+
+    The DNS records for all the regions are merged into a single Route53RecordSets.
+    """
+    domain = properties["Domain"]
+    regions = properties["Regions"] or [properties["Region"]]
+    arns = [format_arn(service="ses", region=region, resource_type="identity", resource_name=domain,
+                       defaults_from=event["StackId"])
+            for region in regions]
+    # Keep the existing PhysicalResourceId while the Domain is unchanged and its region
+    # is still listed. (Changing it has CloudFormation delete the "old" resource.) Once its
+    # region is removed, switch to the ARN in the first remaining region, so the id always
+    # names a region the resource uses -- the same ARN the single-region path returns after
+    # the Regions property is dropped. Regions removed from the list are deprovisioned here.
+    physical_resource_id = event.get("PhysicalResourceId")
+    if not (physical_resource_id and physical_resource_id.endswith(f":identity/{domain}")
+            and identity_region(physical_resource_id) in regions):
+        physical_resource_id = arns[0]
+
+    region_operations = {region: ALL_OPERATIONS for region in regions}
+    to_remove = []
+    if event["RequestType"] == "Delete":
+        to_remove, regions = regions, []
+    elif event["RequestType"] == "Update" and "OldResourceProperties" in event:
+        old_properties = clean_old_properties(event["OldResourceProperties"])
+        if old_properties is not None and old_properties["Domain"] == domain:
+            old_regions = old_properties["Regions"] or [old_properties["Region"]]
+            to_remove = [region for region in old_regions if region not in regions]
+            for region in regions:
+                if region in old_regions:
+                    region_operations[region] = changed_operations(
+                        {**old_properties, "Region": region}, {**properties, "Region": region})
+
+    from botocore.exceptions import BotoCoreError, ClientError
+
+    def provision(region, enabled=True):
+        region_properties = {**properties, "Region": region}
+        if not enabled:
+            # Treat removal as a request to disable both directions
+            region_properties.update(EnableSend=False, EnableReceive=False)
+        backend = get_backend(properties["SESBackend"], region)
+        try:
+            return backend.provision_domain(domain, region_properties, region_operations.get(region, ALL_OPERATIONS))
+        except (BotoCoreError, ClientError, DeadlineExceeded) as error:
+            logger.exception("Error updating SES in %s: %s", region, error)
+            return error
+        finally:
+            backend.log_rate_limit_stats(logger)
+
+    all_regions = regions + to_remove
+    results = run_concurrently(
+        [lambda region=region: provision(region) for region in regions]
+        + [lambda region=region: provision(region, enabled=False) for region in to_remove],
+        max_workers=len(all_regions))
+
+    errors = [(region, result) for region, result in zip(all_regions, results) if isinstance(result, Exception)]
+    if errors:
+        reason = "Error updating SES in {count} of {total} regions: {details}".format(
+            count=len(errors), total=len(results),
+            details="; ".join(f"{region}: {error}" for region, error in errors))
+        return send(event, context, FAILED,
+                    reason=reason, physical_resource_id=physical_resource_id)
+
+    # Determine required DNS (one verification TXT record with every region's token,
+    # and one MX record for each of receiving and MAIL FROM, with every region's server)
+    route53_records = plan_records(
+        {**properties, "Region": region, **result} for region, result in zip(regions, results))
+    outputs = {
+        "Arn": physical_resource_id,
+        "Arns": arns if regions else [],
+        "Domain": domain,
+        "Regions": regions,
+        "Route53RecordSets": route53_records,
+        "ZoneFileEntries": route53_to_zone_file(route53_records),
+    }
+    if any("SESCallsAvoided" in result for result in results):
+        outputs["SESCallsAvoided"] = sum(result.get("SESCallsAvoided", 0) for result in results)
+    log_verbose("Multi-region outputs", outputs=outputs)
+
+    return send(event, context, SUCCESS,
+                response_data=limit_response_data(outputs, MULTI_REGION_OPTIONAL_OUTPUTS),
+                physical_resource_id=physical_resource_id)
+
+
+def send_when_verified(event, context, properties, outputs, domain_arn, checkpoint=None):
+    """Send the SUCCESS response -- but with WaitForVerification, only once SES has verified the domain.
+
+    If the domain isn't verified before the Lambda Function's deadline, invokes the function
+    again to keep waiting (with checkpoint info in the event), and doesn't respond yet.
+    """
+    enabled = properties["EnableSend"] or properties["EnableReceive"]
+    if not (properties["WaitForVerification"] and enabled and event["RequestType"] != "Delete"):
+        return send(event, context, SUCCESS,
+                    response_data=outputs, physical_resource_id=domain_arn)
+
+    if checkpoint is None:
+        checkpoint = {"Outputs": outputs, "Started": time.time()}
+    domain = properties["Domain"]
+    from botocore.exceptions import BotoCoreError, ClientError
+    ses = get_managed_client(
+        'ses', region_name=properties['Region'], rate_limiter=ses_rate_limiter(properties['Region']))
+    try:
+        verified = wait_for_verification(
+            ses, domain, check_dkim=properties["EnableSend"],
+            expires_at=checkpoint["Started"] + properties["VerificationTimeout"])
+        if not verified:
+            continue_in_new_invocation(get_managed_client('lambda'), event, context, checkpoint)
+            return None  # (the continuation will respond)
+    except VerificationFailed as error:
+        return send(event, context, FAILED,
+                    reason=str(error), physical_resource_id=domain_arn)
+    except (BotoCoreError, ClientError, DeadlineExceeded) as error:
+        logger.exception("Error waiting for verification: %s", error)
+        return send(event, context, FAILED,
+                    reason=str(error), physical_resource_id=domain_arn)
     return send(event, context, SUCCESS,
                 response_data=outputs, physical_resource_id=domain_arn)
 
 
-def update_ses_domain_identity(domain, properties):
-    """Handle SES (de-)provisioning for domain and returns dict of output info"""
-    ses = boto3.client('ses', region_name=properties['Region'])
+def identity_region(arn):
+    """Return the region from an SES identity ARN, or None if arn isn't one"""
+    try:
+        _partition, service, region, _account, resource = parse_arn(arn)
+    except (AttributeError, TypeError, ValueError):
+        return None
+    return region if service == "ses" and resource.startswith("identity/") else None
+
+
+def clean_domain(domain):
+    """Return domain without surrounding whitespace or a trailing period"""
+    try:
+        return domain.strip().rstrip(".")
+    except (AttributeError, TypeError):
+        return domain
+
+
+def clean_boolean_properties(properties):
+    """Convert the BOOLEAN_PROPERTIES in properties to bool (in place).
+
+    Raises ValueError, with a message suitable for a FAILED response, for invalid values.
+    """
+    for prop in BOOLEAN_PROPERTIES:
+        # CloudFormation may convert YAML/JSON bools to strings, so reverse that
+        # https://github.com/medmunds/aws-cfn-ses-domain/issues/10
+        try:
+            properties[prop] = to_bool(properties[prop])
+        except ValueError:
+            raise ValueError(f"The '{prop}' property must be 'true' or 'false',"
+                             f" not '{properties[prop]}'.") from None
+
+
+def clean_verification_properties(properties):
+    """Convert WaitForVerification to bool and VerificationTimeout to float (in place).
+
+    Raises ValueError, with a message suitable for a FAILED response, for invalid values.
+    """
+    try:
+        properties["WaitForVerification"] = to_bool(properties["WaitForVerification"])
+    except ValueError:
+        raise ValueError(f"The 'WaitForVerification' property must be 'true' or 'false',"
+                         f" not '{properties['WaitForVerification']}'.") from None
+    try:
+        properties["VerificationTimeout"] = float(properties["VerificationTimeout"])
+        if properties["VerificationTimeout"] <= 0:
+            raise ValueError()
+    except (TypeError, ValueError):
+        raise ValueError(f"The 'VerificationTimeout' property must be a positive number of seconds,"
+                         f" not '{properties['VerificationTimeout']}'.") from None
+
+
+def clean_backend_properties(properties):
+    """Validate SESBackend and DkimKeyLength (converting DkimKeyLength to str, in place).
+
+    Raises ValueError, with a message suitable for a FAILED response, for invalid values.
+    """
+    backend = backend_class(properties["SESBackend"])
+    key_length = properties["DkimKeyLength"] = str(properties["DkimKeyLength"] or "")
+    if key_length:
+        if key_length not in DKIM_KEY_LENGTHS:
+            raise ValueError(f"The 'DkimKeyLength' property must be one of"
+                             f" {', '.join(map(repr, DKIM_KEY_LENGTHS))}, not '{key_length}'.")
+        if backend.name == "ses":
+            raise ValueError("The 'DkimKeyLength' property requires the 'sesv2' SESBackend.")
+
+
+def dkim_required(properties):
+    """Whether (cleaned) properties need DKIM records: to sign email, or (with SESv2) to verify the domain"""
+    return properties["EnableSend"] or (
+        properties["EnableReceive"] and backend_class(properties["SESBackend"]).verifies_with_dkim)
+
+
+def clean_regions(properties):
+    """Return the (raw) properties' Regions as a list (possibly empty).
+
+    Raises ValueError, with a message suitable for a FAILED response, for invalid values.
+    """
+    regions = properties["Regions"] or []
+    if not isinstance(regions, list) or not all(region and isinstance(region, str) for region in regions):
+        raise ValueError("The 'Regions' property must be a list of AWS Region names.")
+    if len(set(regions)) < len(regions):
+        raise ValueError("The 'Regions' property lists a region more than once.")
+    return regions
+
+
+def clean_old_properties(old_properties):
+    """Return (raw) OldResourceProperties expanded and cleaned like the current properties.
+
+    Returns None if old_properties are invalid.
+    """
+    old_properties = {**DEFAULT_PROPERTIES, **old_properties}
+    old_properties["Domain"] = clean_domain(old_properties["Domain"])
+    try:
+        clean_boolean_properties(old_properties)
+        clean_backend_properties(old_properties)
+        old_properties["Regions"] = clean_regions(old_properties)
+    except ValueError:
+        return None
+    return old_properties
+
+
+def changed_operations(old_properties, properties):
+    """Return the set of OPERATION_PROPERTIES keys affected by changes from old_properties.
+
+    Both old_properties and properties must already be cleaned.
+    If old_properties is None (invalid), all operations are considered affected.
+    """
+    if old_properties is None:
+        return ALL_OPERATIONS
+
+    def operation_inputs(props):
+        return {**props, "Enabled": props["EnableSend"] or props["EnableReceive"]}
+
+    old_inputs = operation_inputs(old_properties)
+    new_inputs = operation_inputs(properties)
+    return frozenset(
+        operation for operation, inputs in OPERATION_PROPERTIES.items()
+        if any(old_inputs[prop] != new_inputs[prop] for prop in inputs))
+
+
+def existing_token_attributes(properties, operations):
+    """Return the fetch_identity_states attributes needed for the tokens of operations not being run"""
+    attributes = []
+    if "identity" not in operations and (properties["EnableSend"] or properties["EnableReceive"]):
+        attributes.append("verification")
+    if "dkim" not in operations and properties["EnableSend"]:
+        attributes.append("dkim")
+    return tuple(attributes)
+
+
+def provision_ses_domain_identity(domain, properties, ses, operations=ALL_OPERATIONS):
+    """Read any SES state needed (for RECONCILE, or the operations skipped), then update_ses_domain_identity"""
+    current_state = None
+    if RECONCILE:
+        current_state = fetch_identity_states(ses, [domain]).get(domain, {})
+    elif operations != ALL_OPERATIONS:
+        # Read just the existing tokens the skipped operations would have returned
+        attributes = existing_token_attributes(properties, operations)
+        if attributes:
+            current_state = fetch_identity_states(ses, [domain], attributes=attributes).get(domain, {})
+        else:
+            current_state = {}
+    return update_ses_domain_identity(
+        domain, properties, ses=ses, current_state=current_state, reconcile=RECONCILE, operations=operations)
+
+
+def update_ses_domain_identity(domain, properties, max_concurrency=None, ses=None,
+                               current_state=None, reconcile=None, operations=ALL_OPERATIONS):
+    """Handle SES (de-)provisioning for domain and returns dict of output info
+
+    The identity itself is verified (or deleted) first. The remaining SES
+    operations don't depend on each other, so they are issued concurrently
+    when max_concurrency (default SES_MAX_CONCURRENCY) is greater than 1.
+
+    ses is the SES client to use (default: a rate limited calls.ManagedClient for properties['Region']).
+
+    current_state is the identity's state from reconcile.fetch_identity_states
+    (or {} if it doesn't exist). If reconcile is true (the default when current_state
+    is provided), SES operations that wouldn't change anything are skipped.
+
+    Only the OPERATION_PROPERTIES keys in operations are run; the others are skipped,
+    using their existing tokens from current_state. (If current_state doesn't have
+    a skipped operation's tokens, it is run anyway.)
+
+    If any SES operations are skipped, the number is returned in outputs["SESCallsAvoided"].
+    """
+    if max_concurrency is None:
+        max_concurrency = MAX_CONCURRENCY
+    if ses is None:
+        ses = get_managed_client(
+            'ses', region_name=properties['Region'], rate_limiter=ses_rate_limiter(properties['Region']))
 
     outputs = {}
     enable_send = properties["EnableSend"]
     enable_receive = properties["EnableReceive"]
 
-    if enable_send or enable_receive:
+    def verify_domain_identity():
         response = ses.verify_domain_identity(Domain=domain)
-        logger.info("SES:VerifyDomainIdentity(Domain=%r) => %r", domain, response)
-        outputs["VerificationToken"] = response["VerificationToken"]
+        return {"VerificationToken": response["VerificationToken"]}
+
+    def delete_identity():
+        ses.delete_identity(Identity=domain)
+        return {}
+
+    def verify_domain_dkim():
+        response = ses.verify_domain_dkim(Domain=domain)
+        # ??? ses.set_identity_dkim_enabled(Identity=domain, DkimEnabled=True)
+        return {"DkimTokens": response["DkimTokens"]}
+
+    def set_identity_mail_from_domain():
+        ses.set_identity_mail_from_domain(Identity=domain, MailFromDomain=mail_from_domain)
+        return {}
+
+    # (An empty mail_from_domain disables the custom MAIL FROM domain.
+    # Could check first using ses.get_identity_mail_from_domain,
+    # but clearing it doesn't cause an error even if not set/applicable.)
+    mail_from_domain = desired_mail_from_domain(properties)
+
+    if current_state is None:
+        current_state = {}
+        reconcile = False
+    elif reconcile is None:
+        reconcile = True
+
+    # Each stage's operations are independent; stages run in order
+    avoided = 0
+    identity_stage = []
+    attributes_stage = []
+    if enable_send or enable_receive:
+        if current_state.get("VerificationToken") and (
+                "identity" not in operations
+                or reconcile and not identity_needs_verification(current_state)):
+            outputs["VerificationToken"] = current_state["VerificationToken"]
+            avoided += 1
+        else:
+            identity_stage.append(verify_domain_identity)
+    elif "identity" not in operations or reconcile and not identity_exists(current_state):
+        avoided += 1
     else:
         # Neither send nor receive, so de-provision
-        response = ses.delete_identity(Identity=domain)
-        logger.info("SES:DeleteIdentity(Identity=%r) => %r", domain, response)
+        identity_stage.append(delete_identity)
 
     if enable_send:
-        response = ses.verify_domain_dkim(Domain=domain)
-        logger.info("SES:VerifyDomainDKIM(Domain=%r) => %r", domain, response)
-        # ??? ses.set_identity_dkim_enabled(Identity=domain, DkimEnabled=True)
-        outputs["DkimTokens"] = response["DkimTokens"]
+        if current_state.get("DkimTokens") and (
+                "dkim" not in operations
+                or reconcile and not dkim_needs_verification(current_state)):
+            outputs["DkimTokens"] = current_state["DkimTokens"]
+            avoided += 1
+        else:
+            attributes_stage.append(verify_domain_dkim)
+
+    if "mail_from" not in operations or reconcile and (
+            not (enable_send or enable_receive)
+            or not mail_from_needs_update(current_state, mail_from_domain)):
+        # (Deleting an identity also deletes its MAIL FROM domain)
+        avoided += 1
+    else:
+        attributes_stage.append(set_identity_mail_from_domain)
+
+    for stage in (identity_stage, attributes_stage):
+        for result in run_concurrently(stage, max_workers=max_concurrency):
+            outputs.update(result)
+
+    if reconcile or operations != ALL_OPERATIONS:
+        logger.info("Skipped %d SES calls for %s", avoided, domain)
+        outputs["SESCallsAvoided"] = avoided
+
+    outputs.update(dns_outputs(properties))
+    return outputs
 
-    if enable_send and properties["MailFromSubdomain"]:
-        mail_from_domain = "{MailFromSubdomain}.{Domain}".format(**properties)
+
+def desired_mail_from_domain(properties):
+    """Return the custom MAIL FROM domain for (cleaned) properties, or "" for none"""
+    if properties["EnableSend"] and properties["MailFromSubdomain"]:
+        return "{MailFromSubdomain}.{Domain}".format(**properties)
+    return ""
+
+
+def dns_outputs(properties):
+    """Return the outputs for (cleaned) properties that don't depend on SES responses"""
+    outputs = {}
+    mail_from_domain = desired_mail_from_domain(properties)
+    if mail_from_domain:
         outputs.update({
             "MailFromDomain": mail_from_domain,
             "MailFromMX": "feedback-smtp.{Region}.amazonses.com".format(**properties),
             "MailFromSPF": '"v=spf1 include:amazonses.com -all"',
         })
-    else:
-        # Disable custom Mail FROM domain.
-        # (Could check first using ses.get_identity_mail_from_domain,
-        # but clearing it doesn't cause an error even if not set/applicable.)
-        mail_from_domain = ""
-    response = ses.set_identity_mail_from_domain(Identity=domain, MailFromDomain=mail_from_domain)
-    logger.info("SES:SetIdentityMailFromDomain(Domain=%r, MailFromDomain=%r) => %r",
-                domain, mail_from_domain, response)
-
-    if enable_send and properties["CustomDMARC"]:
+
+    if properties["EnableSend"] and properties["CustomDMARC"]:
         outputs["DMARC"] = properties["CustomDMARC"]
 
-    if enable_receive:
+    if properties["EnableReceive"]:
         outputs.update({
             "ReceiveMX": "inbound-smtp.{Region}.amazonaws.com".format(**properties),
         })
@@ -152,58 +601,65 @@ def update_ses_domain_identity(domain, properties):
     return outputs
 
 
+def required_records(properties, state):
+    """Return the DNS records (cleaned) properties require, using the tokens in state.
+
+    state is from reconcile.fetch_identity_states (or the outputs of update_ses_domain_identity).
+    """
+    outputs = dns_outputs(properties)
+    if (properties["EnableSend"] or properties["EnableReceive"]) and state.get("VerificationToken"):
+        outputs["VerificationToken"] = state["VerificationToken"]
+    if dkim_required(properties) and state.get("DkimTokens"):
+        outputs["DkimTokens"] = state["DkimTokens"]
+    return generate_route53_records({**properties, **outputs})
+
+
+def update_route53_records(route53, hosted_zone_id, records, outputs, old_properties=None):
+    """Add records to the Route 53 hosted zone, and wait for the change to be INSYNC.
+
+    Only records this resource already maintained in the zone (on Update, with cleaned
+    old_properties) are replaced; existing records it doesn't own raise RecordConflict.
+    Records no longer required are deleted (from the old hosted zone, if it changed,
+    or was removed: with no hosted_zone_id, this only deletes). Returns additional outputs.
+    """
+    comment = "Amazon SES records for {Domain}".format(**outputs)
+    stale_records = []
+    owned = set()
+    if old_properties is not None and old_properties["HostedZoneId"]:
+        keys = {record_key(record) for record in records}
+        old_records = required_records(old_properties, outputs)
+        if old_properties["HostedZoneId"] == hosted_zone_id:
+            stale_records = [record for record in old_records if record_key(record) not in keys]
+            owned = {record_key(record) for record in old_records}
+        else:
+            delete_records(route53, old_properties["HostedZoneId"], old_records, comment=comment)
+    if not hosted_zone_id:
+        return {}
+
+    change_info, propagation_seconds = update_records(
+        route53, hosted_zone_id, records, stale_records, owned=owned, comment=comment)
+    if change_info is None:
+        return {}  # (no records required, and none stale)
+    logger.info("Route 53 change %s was INSYNC after %.1fs", change_info["Id"], propagation_seconds)
+    return {
+        "Route53ChangeId": change_info["Id"],
+        "Route53PropagationSeconds": round(propagation_seconds, 1),
+    }
+
+
 def generate_route53_records(properties):
     """Return list of AWS::Route53::RecordSet resources required"""
-    records = []
-
-    if properties.get("VerificationToken"):
-        records.append({
-            "Name": "_amazonses.{Domain}.".format(**properties),
-            "Type": "TXT",
-            "ResourceRecords": ['"{VerificationToken}"'.format(**properties)]})
-
-    if properties.get("DkimTokens"):
-        records.extend([{
-            "Name": "{token}._domainkey.{Domain}.".format(token=token, **properties),
-            "Type": "CNAME",
-            "ResourceRecords": ["{token}.dkim.amazonses.com.".format(token=token)],
-        } for token in properties["DkimTokens"]])
-
-    if properties.get("MailFromDomain"):
-        if properties.get("MailFromMX"):
-            records.append({
-                "Name": "{MailFromDomain}.".format(**properties),
-                "Type": "MX",
-                "ResourceRecords": ["10 {MailFromMX}.".format(**properties)]})
-        if properties.get("MailFromSPF"):
-            records.append({
-                "Name": "{MailFromDomain}.".format(**properties),
-                "Type": "TXT",
-                "ResourceRecords": [properties["MailFromSPF"]]})
-
-    if properties.get("DMARC"):
-        records.append({
-            "Name": "_dmarc.{Domain}.".format(**properties),
-            "Type": "TXT",
-            "ResourceRecords": [properties["DMARC"]]})
-
-    if properties.get("ReceiveMX"):
-        records.append({
-            "Name": "{Domain}.".format(**properties),
-            "Type": "MX",
-            "ResourceRecords": ["10 {ReceiveMX}.".format(**properties)]})
-
-    for record in records:
-        record["TTL"] = properties["TTL"]
-    return records
+    return domain_records(properties)
+
+
+def merge_route53_records(records):
+    """Return records, combining any with the same Name and Type into a single record.
+
+    (Route 53 allows only one record set for each name and type.)
+    """
+    return merge_records(records)
 
 
 def route53_to_zone_file(records):
     """Return a list of Zone File lines from a list of AWS::Route53::RecordSet"""
-    max_name_len = max([len(record["Name"]) for record in records], default=1)
-    return [
-        "{name:{max_name_len}}\t{ttl}\tIN\t{type:5}\t{data}".format(
-            name=record["Name"], max_name_len=max_name_len,
-            ttl=record["TTL"], type=record["Type"],
-            data=" ".join(record["ResourceRecords"]))
-        for record in records]
+    return zone_file_lines(records)
@@ -0,0 +1,267 @@
+# AWS Lambda handler provisioning many Amazon SES domain identities
+# from a single CloudFormation CustomResource
+
+import json
+import logging
+import os
+
+from .calls import get_managed_client
+from .cfnresponse import (
+    FAILED, RESPONSE_DATA_LIMIT, SUCCESS, limit_response_data as cfnresponse_limit_response_data, send)
+from .deadline import DeadlineExceeded, start_deadline
+from .dns import compact_records, plan_records
+from .logs import log_verbose, start_invocation_log
+from .metrics import instrumented
+from .ratelimit import SES_MIN_RATE_LIMIT, AdaptiveRateLimiter
+from .replay import replayable
+from .reconcile import fetch_identity_states
+from .ses_domain_identity import (
+    DEFAULT_PROPERTIES as DOMAIN_DEFAULT_PROPERTIES, RECONCILE, SINGLE_DOMAIN_PROPERTIES,
+    clean_boolean_properties, clean_domain, route53_to_zone_file, update_ses_domain_identity)
+from .utils import format_arn, run_concurrently, truncate
+from .warmup import handles_warmup
+
+logger = logging.getLogger()
+logger.setLevel(os.getenv("LOG_LEVEL", "WARNING"))
+
+
+DEFAULT_PROPERTIES = {
+    "Domains": [],
+    "MaxConcurrency": "8",  # domains provisioned at once
+    "RateLimit": "5",  # SES calls per second (per region)
+    # Defaults for each domain (which can override them individually):
+    **{key: value for key, value in DOMAIN_DEFAULT_PROPERTIES.items()
+       if key != "Domain" and key not in SINGLE_DOMAIN_PROPERTIES},
+}
+DOMAIN_PROPERTIES = tuple(key for key in DOMAIN_DEFAULT_PROPERTIES if key not in SINGLE_DOMAIN_PROPERTIES)
+
+# Attributes replaced by the compact RecordIndex if the response data would be too large
+COMPACTED_OUTPUTS = ("Route53RecordSets", "ZoneFileEntries")
+# Attributes to leave out (in order) if even the compact response data would be too large
+OPTIONAL_OUTPUTS = ("RecordIndex", "Arns", "Domains")
+
+
+@handles_warmup
+@instrumented("SES_DomainBatch")
+@replayable
+def handle_domain_identity_batch_request(event, context):
+    start_deadline(context)
+    start_invocation_log()
+    log_verbose("Received event", event=event)
+
+    properties = DEFAULT_PROPERTIES.copy()
+    properties.update(event["ResourceProperties"])
+    log_verbose("Expanded properties", properties=properties)
+
+    physical_resource_id = event.get("PhysicalResourceId") or "{StackId}/{LogicalResourceId}".format(**event)
+
+    # Clean and validate inputs
+    try:
+        domain_configs = clean_domain_configs(properties)
+        max_concurrency = int(properties["MaxConcurrency"])
+        rate_limit = float(properties["RateLimit"])
+        if max_concurrency < 1 or rate_limit <= 0:
+            raise ValueError("The 'MaxConcurrency' and 'RateLimit' properties must be positive numbers.")
+    except (TypeError, ValueError) as error:
+        return send(event, context, FAILED,
+                    reason=str(error), physical_resource_id=physical_resource_id)
+
+    unreadable = []  # old entries that couldn't be cleaned (so couldn't be deprovisioned)
+    if event["RequestType"] == "Delete":
+        to_remove, domain_configs = domain_configs, []
+    elif event["RequestType"] == "Update":
+        # Deprovision any domains removed from the list
+        old_domain_configs, unreadable = clean_old_domain_configs(event.get("OldResourceProperties", {}))
+        current = {(config["Domain"], config["Region"]) for config in domain_configs}
+        to_remove = [config for config in old_domain_configs
+                     if (config["Domain"], config["Region"]) not in current]
+    else:
+        to_remove = []
+    for config in to_remove:
+        # Treat removal as a request to disable both directions
+        config["EnableSend"] = False
+        config["EnableReceive"] = False
+    all_configs = domain_configs + to_remove
+
+    # Update SES
+    from botocore.exceptions import BotoCoreError, ClientError
+    rate_limiters = {}
+    ses_clients = {}
+    for config in all_configs:
+        region = config["Region"]
+        if region not in ses_clients:
+            rate_limiters[region] = AdaptiveRateLimiter(rate_limit, min_rate=min(SES_MIN_RATE_LIMIT, rate_limit))
+            ses_clients[region] = get_managed_client("ses", region_name=region, rate_limiter=rate_limiters[region])
+
+    current_states = None
+    if RECONCILE:
+        # Read the current state of all the domains, in as few SES calls as possible
+        current_states = {}
+        try:
+            for region, ses in ses_clients.items():
+                domains = [config["Domain"] for config in all_configs if config["Region"] == region]
+                current_states[region] = fetch_identity_states(ses, domains)
+        except (BotoCoreError, ClientError, DeadlineExceeded) as error:
+            logger.exception("Error reading SES state: %s", error)
+            return send(event, context, FAILED,
+                        reason=str(error), physical_resource_id=physical_resource_id)
+
+    def provision(config):
+        current_state = None
+        if current_states is not None:
+            current_state = current_states[config["Region"]].get(config["Domain"], {})
+        try:
+            return update_ses_domain_identity(
+                config["Domain"], config, max_concurrency=1, ses=ses_clients[config["Region"]],
+                current_state=current_state)
+        except (BotoCoreError, ClientError, DeadlineExceeded) as error:
+            logger.exception("Error updating SES for %s: %s", config["Domain"], error)
+            return error
+
+    results = run_concurrently(
+        [lambda config=config: provision(config) for config in all_configs],
+        max_workers=max_concurrency)
+    for ses in ses_clients.values():
+        ses.log_rate_limit_stats(logger)
+
+    errors = [(config["Domain"], result) for config, result in zip(all_configs, results)
+              if isinstance(result, Exception)]
+    if errors:
+        reason = "Error updating SES for {count} of {total} domains: {details}".format(
+            count=len(errors), total=len(results),
+            details="; ".join(f"{domain}: {error}" for domain, error in errors))
+        return send(event, context, FAILED,
+                    reason=truncate(reason, 1000), physical_resource_id=physical_resource_id)
+
+    # Determine required DNS
+    domain_properties = [{**config, **domain_outputs} for config, domain_outputs in zip(domain_configs, results)]
+    route53_records = plan_records(domain_properties)
+    arns = [domain_arn(config["Domain"], config["Region"], event["StackId"]) for config in domain_configs]
+    outputs = {
+        "Arns": arns,
+        "Domains": [config["Domain"] for config in domain_configs],
+        "Route53RecordSets": route53_records,
+        "ZoneFileEntries": route53_to_zone_file(route53_records),
+    }
+    regions = {config["Region"] for config in domain_configs} or {properties["Region"]}
+    if len(regions) == 1:
+        # (There's no single prefix for domains in several regions)
+        outputs["ArnPrefix"] = domain_arn("", regions.pop(), event["StackId"])
+    if current_states is not None:
+        outputs["SESCallsAvoided"] = sum(
+            result["SESCallsAvoided"] for result in results if isinstance(result, dict))
+    log_verbose("Batch outputs", outputs=outputs)
+
+    response_data = limit_response_data(outputs, domain_properties)
+    reasons = []
+    if "OmittedAttributes" in response_data:
+        reasons.append("Omitted {attributes} to fit CloudFormation's response size limit"
+                       " (the complete values are in the function's logs).".format(
+                           attributes=", ".join(response_data["OmittedAttributes"])))
+    if unreadable:
+        reasons.append("Unable to read {count} of the old 'Domains' entries, so any of them removed from the list"
+                       " are still in Amazon SES: {entries}".format(
+                           count=len(unreadable), entries=", ".join(repr(entry) for entry in unreadable)))
+    if reasons:
+        return send(event, context, SUCCESS, reason=truncate(" ".join(reasons), 1000),
+                    response_data=response_data, physical_resource_id=physical_resource_id)
+    return send(event, context, SUCCESS,
+                response_data=response_data, physical_resource_id=physical_resource_id)
+
+
+def clean_domain_configs(properties):
+    """Return a list of cleaned per-domain properties dicts for the batch properties.
+
+    Each entry in properties["Domains"] can be a domain name, or a dict with
+    a "Domain" and any other Custom::SES_Domain properties to override for it.
+    Raises ValueError, with a message suitable for a FAILED response, for invalid properties.
+    """
+    domains = properties["Domains"]
+    if not domains or not isinstance(domains, list):
+        raise ValueError("The 'Domains' property must be a non-empty list.")
+
+    defaults = {key: properties[key] for key in DOMAIN_PROPERTIES if key != "Domain"}
+    configs = []
+    seen = set()
+    for entry in domains:
+        config = defaults.copy()
+        if isinstance(entry, dict):
+            unknown = set(entry) - set(DOMAIN_PROPERTIES)
+            if unknown:
+                raise ValueError(f"Unknown properties {sorted(unknown)!r} for domain {entry.get('Domain')!r}.")
+            config.update(entry)
+        else:
+            config["Domain"] = entry
+        config["Domain"] = clean_domain(config.get("Domain"))
+        if not config["Domain"] or not isinstance(config["Domain"], str):
+            raise ValueError("Every entry in the 'Domains' property requires a 'Domain'.")
+        if (config["Domain"], config["Region"]) in seen:
+            raise ValueError(f"Domain {config['Domain']!r} is listed more than once.")
+        seen.add((config["Domain"], config["Region"]))
+        clean_boolean_properties(config)
+        configs.append(config)
+
+    # (A domain in several regions can only have one DMARC policy)
+    dmarc = {}
+    for config in configs:
+        if config["EnableSend"] and config["CustomDMARC"]:
+            if dmarc.setdefault(config["Domain"], config["CustomDMARC"]) != config["CustomDMARC"]:
+                raise ValueError(f"Domain {config['Domain']!r} has conflicting 'CustomDMARC' values.")
+    return configs
+
+
+def clean_old_domain_configs(old_properties):
+    """Return (cleaned per-domain configs, list of unreadable entries) for an Update's OldResourceProperties.
+
+    If the old properties can't be cleaned as a whole, falls back to the individual
+    Domains entries that can be, so domains removed from the list are still deprovisioned.
+    """
+    properties = {**DEFAULT_PROPERTIES, **old_properties}
+    try:
+        return clean_domain_configs(properties), []
+    except (TypeError, ValueError) as error:
+        logger.warning("Unable to clean the old properties (%s); deprovisioning the domains that can be read",
+                       error)
+    domains = properties["Domains"]
+    if not isinstance(domains, list):
+        return [], [domains]
+    configs = []
+    unreadable = []
+    seen = set()
+    for entry in domains:
+        try:
+            [config] = clean_domain_configs({**properties, "Domains": [entry]})
+        except (TypeError, ValueError):
+            unreadable.append(entry)
+            continue
+        if (config["Domain"], config["Region"]) not in seen:
+            seen.add((config["Domain"], config["Region"]))
+            configs.append(config)
+    if unreadable:
+        logger.warning("Unable to read old 'Domains' entries %r", unreadable)
+    return configs, unreadable
+
+
+def domain_arn(domain, region, stack_id):
+    return format_arn(
+        service="ses", region=region,
+        resource_type="identity", resource_name=domain,
+        defaults_from=stack_id)  # current stack's ARN has account and partition
+
+
+def limit_response_data(outputs, domain_properties=(), limit=RESPONSE_DATA_LIMIT):
+    """Return outputs, made to fit within limit bytes (as JSON).
+
+    If outputs are too large, the COMPACTED_OUTPUTS are replaced by a RecordIndex
+    (see dns.compact_records) for domain_properties, and Arns are left out if there's
+    an ArnPrefix (which, with Domains, gives the same ARNs). Only if that's still too
+    large are OPTIONAL_OUTPUTS omitted (and listed in OmittedAttributes).
+    """
+    if len(json.dumps(outputs)) <= limit:
+        return outputs
+    compacted = {key: value for key, value in outputs.items() if key not in COMPACTED_OUTPUTS}
+    compacted["RecordIndex"] = compact_records(domain_properties)
+    if "ArnPrefix" in compacted:
+        compacted.pop("Arns", None)
+    logger.info("Replaced %r with RecordIndex to fit CloudFormation's size limit", list(COMPACTED_OUTPUTS))
+    return cfnresponse_limit_response_data(compacted, OPTIONAL_OUTPUTS, limit=limit)
@@ -3,11 +3,14 @@
 import logging
 import os
 
-import boto3
-from botocore.exceptions import BotoCoreError, ClientError
-
+from .backends import SES_BACKEND, get_backend
 from .cfnresponse import FAILED, SUCCESS, send
+from .deadline import DeadlineExceeded, start_deadline
+from .logs import log_verbose, start_invocation_log
+from .metrics import instrumented
+from .replay import replayable
 from .utils import format_arn
+from .warmup import handles_warmup
 
 
 logger = logging.getLogger()
@@ -17,15 +20,21 @@ logger.setLevel(os.getenv("LOG_LEVEL", "WARNING"))
 DEFAULT_PROPERTIES = {
     "EmailAddress": "",
     "Region": os.getenv("AWS_REGION"),
+    "SESBackend": SES_BACKEND,  # "ses" (classic API) or "sesv2"
 }
 
 
+@handles_warmup
+@instrumented("SES_EmailIdentity")
+@replayable
 def handle_email_identity_request(event, context):
-    logger.info("Received event %r", event)
+    start_deadline(context)
+    start_invocation_log()
+    log_verbose("Received event", event=event)
 
     properties = DEFAULT_PROPERTIES.copy()
     properties.update(event["ResourceProperties"])
-    logger.info("Expanded properties to %r", properties)
+    log_verbose("Expanded properties", properties=properties)
 
     # Clean and validate inputs
     try:
@@ -39,8 +48,6 @@ def handle_email_identity_request(event, context):
                     reason="The 'EmailAddress' property is required.",
                     physical_resource_id="MISSING")
 
-    ses = boto3.client("ses", region_name=properties["Region"])
-
     # Use an SES Identity ARN as the PhysicalResourceId - see:
     # https://docs.aws.amazon.com/IAM/latest/UserGuide/list_amazonses.html#amazonses-resources-for-iam-policies
     email_arn = format_arn(
@@ -48,21 +55,28 @@ def handle_email_identity_request(event, context):
         resource_type="identity", resource_name=email_address,
         defaults_from=event["StackId"])  # current stack's ARN has account and partition
 
+    try:
+        backend = get_backend(properties["SESBackend"], properties["Region"])
+    except ValueError as error:
+        return send(event, context, FAILED,
+                    reason=str(error), physical_resource_id=email_arn)
+
+    from botocore.exceptions import BotoCoreError, ClientError
     try:
         if event["RequestType"] == "Delete":
-            response = ses.delete_identity(Identity=email_address)
-            logger.info("SES:DeleteIdentity(Identity=%r) => %r", email_address, response)
+            backend.delete_identity(email_address)
         else:
             # Both Create and Update validate the new EmailAddress.
             # (For Update, the change in physical_resource_id will cause CloudFormation
             # to issue a Delete on the old EmailAddress after this request succeeds.)
-            response = ses.verify_email_identity(EmailAddress=email_address)
-            logger.info("SES:VerifyEmailIdentity(EmailAddress=%r) => %r", email_address, response)
-    except (BotoCoreError, ClientError) as error:
+            backend.provision_email(email_address)
+    except (BotoCoreError, ClientError, DeadlineExceeded) as error:
         # for ClientError, might be helpful to look at error.response, too
         logger.exception("Error updating SES: %s", error)
         return send(event, context, FAILED,
                     reason=str(error), physical_resource_id=email_arn)
+    finally:
+        backend.log_rate_limit_stats(logger)
 
     outputs = {
         "Arn": email_arn,
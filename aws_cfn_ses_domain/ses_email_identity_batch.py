@@ -0,0 +1,248 @@
+# AWS Lambda handler verifying many Amazon SES email addresses
+# from a single CloudFormation CustomResource
+#
+# SES allows only about one VerifyEmailIdentity call per second, so the calls are
+# paced to the RateLimit property. On Update, only addresses added to the list are
+# verified (and only those removed are deleted). If the remaining calls can't finish
+# before the Lambda deadline, the handler continues in a new invocation (see continuation.py).
+
+import logging
+import os
+
+from .backends import SES_BACKEND, backend_class, get_backend
+from .calls import get_managed_client
+from .cfnresponse import FAILED, SUCCESS, limit_response_data, send
+from .continuation import CONTINUATION_FIELD, CONTINUATION_RESERVE, continue_in_new_invocation
+from .deadline import Deadline, DeadlineExceeded, current_deadline, start_deadline
+from .logs import log_verbose, start_invocation_log
+from .metrics import instrumented
+from .ratelimit import SES_MIN_RATE_LIMIT, AdaptiveRateLimiter
+from .replay import replayable
+from .utils import format_arn, truncate
+from .warmup import handles_warmup
+
+logger = logging.getLogger()
+logger.setLevel(os.getenv("LOG_LEVEL", "WARNING"))
+
+
+DEFAULT_PROPERTIES = {
+    "EmailAddresses": [],
+    "Region": os.getenv("AWS_REGION"),
+    "RateLimit": "1",  # SES calls per second (SES allows about one VerifyEmailIdentity per second)
+    "SESBackend": SES_BACKEND,  # "ses" (classic API) or "sesv2"
+}
+
+# Attributes to leave out (in order) if the response data would be too large
+OPTIONAL_OUTPUTS = ("Arns", "EmailAddresses")
+
+# Task actions (in the checkpoint's "Tasks" list)
+VERIFY = "verify"
+DELETE = "delete"
+
+
+@handles_warmup
+@instrumented("SES_EmailIdentityBatch")
+@replayable
+def handle_email_identity_batch_request(event, context):
+    start_deadline(context)
+    start_invocation_log()
+    log_verbose("Received event", event=event)
+
+    properties = DEFAULT_PROPERTIES.copy()
+    properties.update(event["ResourceProperties"])
+    log_verbose("Expanded properties", properties=properties)
+
+    physical_resource_id = event.get("PhysicalResourceId") or "{StackId}/{LogicalResourceId}".format(**event)
+
+    # Clean and validate inputs
+    try:
+        email_addresses = clean_email_addresses(properties["EmailAddresses"])
+        rate_limit = float(properties["RateLimit"])
+        if rate_limit <= 0:
+            raise ValueError("The 'RateLimit' property must be a positive number.")
+        backend_class(properties["SESBackend"])
+    except (TypeError, ValueError) as error:
+        return send(event, context, FAILED,
+                    reason=str(error), physical_resource_id=physical_resource_id)
+
+    # Resume a continuation's remaining tasks, or plan them from the property changes
+    checkpoint = event.get(CONTINUATION_FIELD)
+    if checkpoint is None:
+        tasks, unreadable = plan_tasks(event, properties, email_addresses)
+        checkpoint = {"Tasks": tasks, "Total": len(tasks), "Errors": [], "Unreadable": unreadable,
+                      "Verifies": sum(1 for action, *_ in tasks if action == VERIFY)}
+
+    # Update SES, paced to the rate limit, until done or out of time
+    rate_limiter = AdaptiveRateLimiter(rate_limit, min_rate=min(SES_MIN_RATE_LIMIT, rate_limit))
+    deadline = current_deadline()
+    if deadline.expires_at is not None:
+        # (SES calls must leave enough time to invoke the continuation)
+        deadline = Deadline(deadline.expires_at - CONTINUATION_RESERVE, clock=deadline.clock)
+    backends = {}
+
+    def get_task_backend(region, backend_name):
+        if (region, backend_name) not in backends:
+            client = get_managed_client(backend_class(backend_name).service_name, region_name=region,
+                                        rate_limiter=rate_limiter, deadline=deadline)
+            backends[(region, backend_name)] = get_backend(backend_name, region, client=client)
+        return backends[(region, backend_name)]
+
+    remaining_tasks, errors = run_paced(checkpoint["Tasks"], get_task_backend, rate_limiter, deadline)
+    errors = checkpoint["Errors"] + errors
+    for backend in backends.values():
+        backend.log_rate_limit_stats(logger)
+
+    if remaining_tasks:
+        from botocore.exceptions import BotoCoreError, ClientError
+        try:
+            continue_in_new_invocation(
+                get_managed_client('lambda'), event, context,
+                dict(checkpoint, Tasks=remaining_tasks, Errors=errors))
+            return None  # (the continuation will respond)
+        except (BotoCoreError, ClientError, DeadlineExceeded) as error:
+            logger.exception("Error continuing the request: %s", error)
+            return send(event, context, FAILED,
+                        reason=str(error), physical_resource_id=physical_resource_id)
+
+    if errors:
+        reason = "Error updating SES for {count} of {total} email addresses: {details}".format(
+            count=len(errors), total=checkpoint["Total"],
+            details="; ".join(f"{email_address}: {error}" for email_address, error in errors))
+        return send(event, context, FAILED,
+                    reason=truncate(reason, 1000), physical_resource_id=physical_resource_id)
+
+    region = properties["Region"]
+    outputs = {
+        "ArnPrefix": email_arn("", region, event["StackId"]),
+        "Arns": [email_arn(email_address, region, event["StackId"]) for email_address in email_addresses],
+        "EmailAddresses": email_addresses,
+        "Region": region,
+    }
+    if event["RequestType"] == "Update":
+        # (Unchanged addresses weren't verified again)
+        outputs["SESCallsAvoided"] = len(email_addresses) - checkpoint["Verifies"]
+    log_verbose("Batch outputs", outputs=outputs)
+
+    unreadable = checkpoint.get("Unreadable")
+    if unreadable:
+        reason = "Unable to read {count} of the old 'EmailAddresses' entries, so any of them removed from the list" \
+                 " are still in Amazon SES: {entries}".format(
+                     count=len(unreadable), entries=", ".join(repr(entry) for entry in unreadable))
+        return send(event, context, SUCCESS, reason=truncate(reason, 1000),
+                    response_data=limit_response_data(outputs, OPTIONAL_OUTPUTS),
+                    physical_resource_id=physical_resource_id)
+    return send(event, context, SUCCESS,
+                response_data=limit_response_data(outputs, OPTIONAL_OUTPUTS),
+                physical_resource_id=physical_resource_id)
+
+
+def plan_tasks(event, properties, email_addresses):
+    """Return (list of [action, region, SESBackend, email_address] tasks, unreadable old entries) for the request.
+
+    Deletes come before verifies. For Update, addresses already in the old properties
+    (in the same region) aren't verified again.
+    """
+    region, backend_name = properties["Region"], properties["SESBackend"]
+    if event["RequestType"] == "Delete":
+        return [[DELETE, region, backend_name, email_address] for email_address in email_addresses], []
+
+    old_addresses, old_region, old_backend_name, unreadable = [], region, backend_name, []
+    if event["RequestType"] == "Update":
+        old_properties = {**DEFAULT_PROPERTIES, **event.get("OldResourceProperties", {})}
+        old_addresses, unreadable = clean_old_email_addresses(old_properties["EmailAddresses"])
+        old_region = old_properties["Region"]
+        try:
+            old_backend_name = backend_class(old_properties["SESBackend"]).name
+        except (TypeError, ValueError):
+            pass  # (both SES APIs share the same identities, so the current backend can delete them)
+
+    if old_region == region:
+        # (Both SES APIs share the same identities, so a SESBackend change alone needs no calls)
+        current, existing = set(email_addresses), set(old_addresses)
+        to_delete = [email_address for email_address in old_addresses if email_address not in current]
+        to_verify = [email_address for email_address in email_addresses if email_address not in existing]
+    else:
+        to_delete, to_verify = old_addresses, email_addresses
+    return ([[DELETE, old_region, old_backend_name, email_address] for email_address in to_delete]
+            + [[VERIFY, region, backend_name, email_address] for email_address in to_verify]), unreadable
+
+
+def run_paced(tasks, get_task_backend, rate_limiter, deadline):
+    """Run tasks in order, until done or the next call couldn't finish before deadline.
+
+    Returns (remaining tasks, list of [email_address, error message] for failed tasks).
+    (The rate-limited clients pace the calls; this just avoids waiting past the deadline.)
+    """
+    from botocore.exceptions import BotoCoreError, ClientError
+    errors = []
+    for index, (action, region, backend_name, email_address) in enumerate(tasks):
+        if rate_limiter.next_wait() >= deadline.remaining():
+            return tasks[index:], errors
+        backend = get_task_backend(region, backend_name)
+        try:
+            if action == DELETE:
+                backend.delete_identity(email_address)
+            else:
+                backend.provision_email(email_address)
+        except DeadlineExceeded:
+            return tasks[index:], errors
+        except (BotoCoreError, ClientError) as error:
+            logger.exception("Error updating SES for %s: %s", email_address, error)
+            errors.append([email_address, str(error)])
+    return [], errors
+
+
+def clean_email_addresses(email_addresses):
+    """Return the list of email_addresses, without surrounding whitespace.
+
+    Raises ValueError, with a message suitable for a FAILED response, for invalid properties.
+    """
+    if not email_addresses or not isinstance(email_addresses, list):
+        raise ValueError("The 'EmailAddresses' property must be a non-empty list.")
+    cleaned = []
+    seen = set()
+    for email_address in email_addresses:
+        if isinstance(email_address, str):
+            email_address = email_address.strip()
+        if not email_address or not isinstance(email_address, str):
+            raise ValueError("Every entry in the 'EmailAddresses' property must be an email address.")
+        if email_address in seen:
+            raise ValueError(f"Email address {email_address!r} is listed more than once.")
+        seen.add(email_address)
+        cleaned.append(email_address)
+    return cleaned
+
+
+def clean_old_email_addresses(email_addresses):
+    """Return (cleaned email addresses, list of unreadable entries) for an Update's old EmailAddresses.
+
+    If the old list can't be cleaned as a whole, falls back to the individual entries
+    that can be, so addresses removed from the list are still deleted.
+    """
+    try:
+        return clean_email_addresses(email_addresses), []
+    except (TypeError, ValueError) as error:
+        logger.warning("Unable to clean the old properties (%s); deleting the email addresses that can be read",
+                       error)
+    if not isinstance(email_addresses, list):
+        return [], [email_addresses]
+    cleaned = []
+    unreadable = []
+    for entry in email_addresses:
+        try:
+            [email_address] = clean_email_addresses([entry])
+        except (TypeError, ValueError):
+            unreadable.append(entry)
+            continue
+        if email_address not in cleaned:
+            cleaned.append(email_address)
+    if unreadable:
+        logger.warning("Unable to read old 'EmailAddresses' entries %r", unreadable)
+    return cleaned, unreadable
+
+
+def email_arn(email_address, region, stack_id):
+    return format_arn(
+        service="ses", region=region,
+        resource_type="identity", resource_name=email_address,
+        defaults_from=stack_id)  # current stack's ARN has account and partition
@@ -1,3 +1,6 @@
+import functools
+
+
 def format_arn(partition=None, service=None, region=None, account=None,
                resource=None, resource_type=None, resource_name=None,
                defaults_from=None):
@@ -15,7 +18,7 @@ def format_arn(partition=None, service=None, region=None, account=None,
         resource = f"{resource_type}/{resource_name}"
     if defaults_from is not None:
         try:
-            _arn, _partition, _service, _region, _account, _resource = defaults_from.split(":")
+            _partition, _service, _region, _account, _resource = parse_arn(defaults_from)
         except (TypeError, ValueError):
             raise ValueError(f"Invalid ARN in defaults_from={defaults_from!r}")
         partition = partition if partition is not None else _partition
@@ -27,6 +30,17 @@ def format_arn(partition=None, service=None, region=None, account=None,
     return f"arn:{partition}:{service}:{region}:{account}:{resource}"
 
 
+@functools.lru_cache(maxsize=64)
+def parse_arn(arn):
+    """Return (partition, service, region, account, resource) from arn.
+
+    Cached, because the handlers fill in the same stack's partition and account
+    for every ARN they return (and a warm container keeps seeing the same stacks).
+    """
+    _arn, partition, service, region, account, resource = arn.split(":")
+    return partition, service, region, account, resource
+
+
 def to_bool(val):
     """Convert val to True or False.
 
@@ -56,3 +70,28 @@ def to_bool(val):
         return False
     else:
         raise ValueError(f"Invalid boolean value {val!r}")
+
+
+def run_concurrently(calls, max_workers=1):
+    """Call each of the (no-argument) calls, and return a list of their results.
+
+    Runs up to max_workers calls at once in a thread pool. Results are in
+    the same order as calls, regardless of which finished first. If any call
+    raises an exception, the first one (in calls order) is re-raised after
+    all calls have finished. (With max_workers <= 1, calls run sequentially
+    in the current thread, stopping at the first exception.)
+    """
+    calls = list(calls)
+    if max_workers <= 1 or len(calls) <= 1:
+        return [call() for call in calls]
+
+    from concurrent.futures import ThreadPoolExecutor, wait
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(calls))) as executor:
+        futures = [executor.submit(call) for call in calls]
+        wait(futures)
+    return [future.result() for future in futures]
+
+
+def truncate(s, max_len):
+    """Return s, shortened (with an ellipsis) to at most max_len characters"""
+    return s if len(s) <= max_len else s[:max_len - 1] + "…"
@@ -0,0 +1,67 @@
+# Waiting for Amazon SES to verify a domain identity, without blocking a Lambda Function
+#
+# Polls the identity's verification (and DKIM) status with backoff until
+# shortly before the invocation's deadline. If it isn't verified by then,
+# the handler continues waiting in a new invocation (see continuation.py).
+# The CloudFormation response is only sent once the identity is verified
+# (or the wait times out). Each invocation is billed for the time it spends
+# polling, so a long wait costs about the whole VerificationTimeout in Lambda
+# duration: continuing earlier would only split it across more invocations.
+import os
+import time
+
+from .continuation import CONTINUATION_RESERVE
+from .deadline import current_deadline
+from .reconcile import fetch_identity_states
+
+# Polling for verification (seconds): first poll delay, growth factor, and maximum delay
+VERIFICATION_POLL_INITIAL = float(os.getenv("VERIFICATION_POLL_INITIAL", "5"))
+VERIFICATION_POLL_FACTOR = 1.5
+VERIFICATION_POLL_MAX = float(os.getenv("VERIFICATION_POLL_MAX", "30"))
+
+VERIFIED = "verified"
+PENDING = "pending"
+
+
+class VerificationFailed(Exception):
+    """Raised when SES reports the verification failed, or it didn't succeed in time"""
+
+
+def verification_status(state, check_dkim=True):
+    """Return VERIFIED or PENDING for an identity's state (from reconcile.fetch_identity_states).
+
+    Raises VerificationFailed if SES has given up on verifying it. (SES reports
+    TemporaryFailure while it can't find the DNS records, but keeps checking.)
+    """
+    statuses = {"Domain verification": state.get("VerificationStatus")}
+    if check_dkim:
+        statuses["DKIM verification"] = state.get("DkimVerificationStatus")
+    for description, status in statuses.items():
+        if status == "Failed":
+            raise VerificationFailed(f"{description} status is {status} (check the DNS records)")
+    return VERIFIED if all(status == "Success" for status in statuses.values()) else PENDING
+
+
+def wait_for_verification(ses, domain, check_dkim=True, expires_at=None, deadline=None,
+                          clock=time.time, sleep=time.sleep):
+    """Poll SES until domain is verified; return True, or False if the deadline arrives first.
+
+    Stops (returning False) once there wouldn't be CONTINUATION_RESERVE seconds left
+    before deadline (default: the current deadline) after the next poll delay.
+    Raises VerificationFailed if verification fails, or isn't done by expires_at (a clock() time).
+    """
+    deadline = deadline or current_deadline()
+    delay = VERIFICATION_POLL_INITIAL
+    while True:
+        state = fetch_identity_states(ses, [domain], attributes=("verification", "dkim")).get(domain, {})
+        if verification_status(state, check_dkim) == VERIFIED:
+            return True
+        if expires_at is not None and clock() + delay > expires_at:
+            raise VerificationFailed(
+                f"Timed out waiting for Amazon SES to verify {domain}"
+                f" (domain verification {state.get('VerificationStatus')}"
+                + (f", DKIM verification {state.get('DkimVerificationStatus')})" if check_dkim else ")"))
+        if delay + CONTINUATION_RESERVE >= deadline.remaining():
+            return False
+        sleep(delay)
+        delay = min(delay * VERIFICATION_POLL_FACTOR, VERIFICATION_POLL_MAX)
@@ -0,0 +1,96 @@
+# Lambda init-phase priming and warm-up pings
+#
+# Lambda runs a function's init phase (importing index.py) with a burst of CPU,
+# before the first billed invocation. With PRIME_ON_INIT, index.py uses it to
+# create the cached SES clients for PRIME_REGIONS and open their connections,
+# so the first request doesn't pay for that setup.
+#
+# A warm-up ping (a scheduled EventBridge event, or any event with a WARMUP_FIELD)
+# returns immediately from every handler, without sending a CloudFormation response,
+# so scheduled pings can keep containers warm.
+
+import functools
+import logging
+import os
+
+from .utils import to_bool
+
+logger = logging.getLogger()
+
+PRIME_ON_INIT = to_bool(os.getenv("PRIME_ON_INIT", "false"))
+
+# Regions whose SES clients are primed (comma-separated; default the function's own region)
+PRIME_REGIONS = [region.strip() for region in os.getenv("PRIME_REGIONS", os.getenv("AWS_REGION", "")).split(",")
+                 if region.strip()]
+
+# Event field marking a warm-up ping
+WARMUP_FIELD = "SESDomainWarmUp"
+
+# A cheap, read-only call for each SES API, used to open (and keep alive) a connection
+WARMUP_CALLS = {
+    "ses": "get_send_quota",
+    "sesv2": "get_account",
+}
+
+
+def is_warmup_event(event):
+    """Return True if event is a warm-up ping rather than a CloudFormation request"""
+    try:
+        return bool(event.get(WARMUP_FIELD)) or event.get("detail-type") == "Scheduled Event"
+    except AttributeError:
+        return False
+
+
+def handles_warmup(handler):
+    """Decorator for a Lambda handler(event, context), returning immediately for warm-up pings"""
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        if is_warmup_event(event):
+            logger.info("Warm-up ping")
+            return {"WarmUp": True}
+        return handler(event, context)
+    return wrapper
+
+
+def prime(regions=None, service_names=None):
+    """Create the cached SES clients for regions, and open a connection from each.
+
+    Returns a list of the primed (service_name, region) pairs. Errors are logged
+    and skipped: priming is only an optimization, and mustn't fail the init phase.
+    """
+    from .backends import SES_BACKEND, backend_class
+    from .clients import get_client
+    from .deadline import Deadline
+    from .utils import run_concurrently
+
+    regions = PRIME_REGIONS if regions is None else regions
+    if service_names is None:
+        try:
+            service_names = [backend_class(SES_BACKEND).service_name]
+        except ValueError:
+            service_names = ["ses"]
+
+    # (Same config as a handler's clients have with time to spare, so they share the cached clients)
+    config = Deadline().client_config()
+
+    def prime_client(service_name, region):
+        try:
+            client = get_client(service_name, region_name=region, config=config)
+            getattr(client, WARMUP_CALLS[service_name])()
+        except Exception as error:
+            logger.warning("Unable to prime %s in %s: %s", service_name, region, error)
+            return None
+        return (service_name, region)
+
+    pairs = [(service_name, region) for service_name in service_names for region in regions]
+    results = run_concurrently(
+        [lambda pair=pair: prime_client(*pair) for pair in pairs],
+        max_workers=len(pairs))
+    return [result for result in results if result is not None]
+
+
+def prime_on_init():
+    """Prime the SES clients, if PRIME_ON_INIT is enabled (called by index.py at import)"""
+    if PRIME_ON_INIT:
+        primed = prime()
+        logger.info("Primed %s", ", ".join(f"{service_name} in {region}" for service_name, region in primed))
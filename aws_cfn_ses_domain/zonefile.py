@@ -0,0 +1,89 @@
+# Writing DNS records (dns.domain_records form) as zone file (RFC 1035 master file) entries
+
+# Width of the record type column (fits "CNAME")
+TYPE_WIDTH = 5
+
+
+class ZoneFileWriter:
+    """Streams zone file entries for records to out (any file-like object with write()).
+
+    With the default options, each entry is identical to a ZoneFileEntries line
+    (absolute names, and a TTL on every entry). Options:
+
+    - origin: write an $ORIGIN directive, and (with relative_names) write names
+      within the origin relative to it ("@" for the origin itself)
+    - default_ttl: write a $TTL directive, and omit the TTL from entries that match it
+    - name_width: pad names to this fixed width (longer names aren't truncated),
+      so records can be written without first scanning them all
+    """
+
+    def __init__(self, out, origin=None, default_ttl=None, name_width=0, relative_names=False):
+        if relative_names and not origin:
+            raise ValueError("relative_names requires an origin")
+        self.out = out
+        self.origin = origin if not origin or origin.endswith(".") else origin + "."
+        self.default_ttl = str(default_ttl) if default_ttl is not None else None
+        self.name_width = name_width
+        self.relative_names = relative_names
+        self.header_written = False
+        self._origin_suffix = "." + self.origin.lower() if self.origin else None
+
+    def header_lines(self):
+        """Return the directive lines ($ORIGIN and $TTL) that start the zone file"""
+        lines = []
+        if self.origin:
+            lines.append(f"$ORIGIN {self.origin}")
+        if self.default_ttl is not None:
+            lines.append(f"$TTL {self.default_ttl}")
+        return lines
+
+    def format_name(self, name):
+        if self.relative_names:
+            lower_name = name.lower()
+            if lower_name == self.origin.lower():
+                return "@"
+            if lower_name.endswith(self._origin_suffix):
+                return name[:-len(self._origin_suffix)]
+        return name
+
+    def format_record(self, record):
+        """Return the zone file entry for record (without a line ending)"""
+        name = self.format_name(record["Name"])
+        ttl = str(record["TTL"])
+        data = " ".join(record["ResourceRecords"])
+        if ttl == self.default_ttl:
+            return f"{name:{self.name_width}}\tIN\t{record['Type']:{TYPE_WIDTH}}\t{data}"
+        return f"{name:{self.name_width}}\t{ttl}\tIN\t{record['Type']:{TYPE_WIDTH}}\t{data}"
+
+    def write_header(self):
+        """Write the directive lines (if not already written)"""
+        if not self.header_written:
+            self.header_written = True
+            for line in self.header_lines():
+                self.out.write(line + "\n")
+
+    def write(self, record):
+        """Write the entry for record (after the directives, if not yet written)"""
+        self.write_header()
+        self.out.write(self.format_record(record) + "\n")
+
+    def write_records(self, records):
+        """Write entries for records (any iterable, consumed as it is written); return the count.
+
+        (E.g., pass dns.RecordPlanner().plan(configs) to write each record as soon as it's final.)
+        """
+        self.write_header()
+        format_record = self.format_record
+        write = self.out.write
+        count = 0
+        for record in records:
+            write(format_record(record) + "\n")
+            count += 1
+        return count
+
+
+def zone_file_lines(records):
+    """Return a list of zone file lines (ZoneFileEntries) for records, with names aligned"""
+    name_width = max([len(record["Name"]) for record in records], default=1)
+    format_record = ZoneFileWriter(None, name_width=name_width).format_record
+    return [format_record(record) for record in records]
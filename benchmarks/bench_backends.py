@@ -0,0 +1,93 @@
+"""Compare the classic Amazon SES and SESv2 backends' calls and latency for provisioning a domain.
+
+Runs each backend's provision_domain against stubbed clients, adding a simulated
+network round trip (--latency) to each call, for a new domain (Create) and for
+an Update that changes only the MAIL FROM subdomain.
+
+Usage: python benchmarks/bench_backends.py [--latency MS] [--repeat N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import boto3  # noqa: E402
+from botocore.stub import Stubber  # noqa: E402
+
+from aws_cfn_ses_domain.backends import get_backend  # noqa: E402
+from aws_cfn_ses_domain.ses_domain_identity import DEFAULT_PROPERTIES  # noqa: E402
+
+DOMAIN = "example.com"
+TOKENS = ["DKIM_TOKEN_1", "DKIM_TOKEN_2", "DKIM_TOKEN_3"]
+PROPERTIES = {**DEFAULT_PROPERTIES, "Domain": DOMAIN, "Region": "us-east-1",
+              "EnableSend": True, "EnableReceive": True, "DkimKeyLength": ""}
+
+# (operations, stubbed responses) for each scenario and backend
+SCENARIOS = {
+    "create": {
+        "ses": (None, [
+            ("verify_domain_identity", {"VerificationToken": "ID_TOKEN"}),
+            ("verify_domain_dkim", {"DkimTokens": TOKENS}),
+            ("set_identity_mail_from_domain", {}),
+        ]),
+        "sesv2": (None, [
+            ("create_email_identity", {"DkimAttributes": {"Tokens": TOKENS}}),
+            ("put_email_identity_mail_from_attributes", {}),
+        ]),
+    },
+    "update_mail_from": {
+        "ses": (frozenset(["mail_from"]), [
+            ("get_identity_verification_attributes", {"VerificationAttributes": {DOMAIN: {
+                "VerificationStatus": "Success", "VerificationToken": "ID_TOKEN"}}}),
+            ("get_identity_dkim_attributes", {"DkimAttributes": {DOMAIN: {
+                "DkimEnabled": True, "DkimVerificationStatus": "Success", "DkimTokens": TOKENS}}}),
+            ("set_identity_mail_from_domain", {}),
+        ]),
+        "sesv2": (frozenset(["mail_from"]), [
+            ("get_email_identity", {"DkimAttributes": {"Tokens": TOKENS}}),
+            ("put_email_identity_mail_from_attributes", {}),
+        ]),
+    },
+}
+
+
+def bench_backend(name, operations, responses, latency, repeat):
+    """Return (calls per provision, list of seconds per provision) for backend name"""
+    client = boto3.client(name, region_name="us-east-1", aws_access_key_id="x", aws_secret_access_key="x")
+    calls = []
+
+    def simulate_round_trip(**kwargs):
+        calls.append(kwargs["model"].name)
+        time.sleep(latency)
+
+    client.meta.events.register("before-parameter-build", simulate_round_trip)
+    backend = get_backend(name, "us-east-1", client=client)
+    durations = []
+    with Stubber(client) as stubber:
+        for _ in range(repeat):
+            for method, response in responses:
+                stubber.add_response(method, response)
+            start = time.perf_counter()
+            backend.provision_domain(DOMAIN, PROPERTIES, operations)
+            durations.append(time.perf_counter() - start)
+            stubber.assert_no_pending_responses()
+    return len(calls) // repeat, durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=20, help="simulated ms per call (default %(default)s)")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for scenario, backends in SCENARIOS.items():
+        for name, (operations, responses) in backends.items():
+            calls, durations = bench_backend(name, operations, responses, args.latency / 1000, args.repeat)
+            print(f"{scenario} ({name}): {calls} calls, median {statistics.median(durations) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
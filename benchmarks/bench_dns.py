@@ -0,0 +1,75 @@
+"""Benchmark DNS record planning and zone file writing throughput.
+
+Usage: python benchmarks/bench_dns.py [--domains N] [--repeat N]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aws_cfn_ses_domain.dns import RecordPlanner, plan_records  # noqa: E402
+from aws_cfn_ses_domain.zonefile import ZoneFileWriter  # noqa: E402
+
+
+def domain_configs(count, region="us-east-1"):
+    """Yield count domain configs, each with the full set of SES outputs (8 records)"""
+    for i in range(count):
+        domain = f"domain{i}.example.com"
+        yield {
+            "Domain": domain,
+            "TTL": "1800",
+            "VerificationToken": f"VERIFICATION_TOKEN_{i:08d}",
+            "DkimTokens": [f"dkim{i:08d}a", f"dkim{i:08d}b", f"dkim{i:08d}c"],
+            "MailFromDomain": f"mail.{domain}",
+            "MailFromMX": f"feedback-smtp.{region}.amazonses.com",
+            "MailFromSPF": '"v=spf1 include:amazonses.com -all"',
+            "DMARC": '"v=DMARC1; p=none; pct=100; sp=none; aspf=r;"',
+            "ReceiveMX": f"inbound-smtp.{region}.amazonaws.com",
+        }
+
+
+def bench_plan_records(domains, repeat):
+    """Return (records, best seconds) for planning domains' records"""
+    configs = list(domain_configs(domains))
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        records = plan_records(configs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(records), best
+
+
+def bench_zone_file(domains, repeat):
+    """Return (bytes, best seconds) for planning and streaming domains' records as a compact zone file"""
+    best = None
+    for _ in range(repeat):
+        out = io.StringIO()
+        start = time.perf_counter()
+        writer = ZoneFileWriter(out, origin="example.com.", default_ttl="1800", name_width=40,
+                                relative_names=True)
+        writer.write_records(RecordPlanner().plan(domain_configs(domains)))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(out.getvalue()), best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--domains", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    records, seconds = bench_plan_records(args.domains, args.repeat)
+    print(f"plan_records: {args.domains} domains, {records} records in {seconds * 1000:.1f} ms"
+          f" ({records / seconds:,.0f} records/sec)")
+    size, seconds = bench_zone_file(args.domains, args.repeat)
+    print(f"RecordPlanner.plan + ZoneFileWriter: {records} records, {size:,} chars in {seconds * 1000:.1f} ms"
+          f" ({records / seconds:,.0f} records/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Load test the unmodified handlers end to end, against the local SES and CloudFormation emulator.
+
+Runs --requests Create requests (alternating Custom::SES_Domain and Custom::SES_EmailIdentity),
+through index.handle_request, in --concurrency worker processes. Each worker stands in for a
+warm Lambda container (handlers keep per-invocation state in module globals, so concurrent
+invocations need separate processes, as in Lambda). SES calls go over HTTP to an SESEmulator,
+with injected latency and throttling; responses are PUT to a ResponseCollector.
+
+The workers' client-side SES rate limit (SES_RATE_LIMIT) is off by default, so the
+results measure the handlers and the emulator's limits, rather than the pacing.
+
+Usage: python benchmarks/bench_load.py [--requests N] [--concurrency N] [--latency MS]
+                                       [--throttle-probability P] [--rate-limit N]
+                                       [--client-rate-limit N]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from aws_cfn_ses_domain.emulator import ResponseCollector, SESEmulator  # noqa: E402
+
+STACK_ID = "arn:aws:cloudformation:mock-region:111111111111:stack/load-test/deadbeef"
+
+
+class LoadContext:
+    """Just enough of a Lambda context"""
+    log_stream_name = "load-test-log-stream"
+
+    def get_remaining_time_in_millis(self):
+        return 300000
+
+
+def make_event(n, response_url):
+    if n % 2:
+        resource_type, properties = "Custom::SES_EmailIdentity", {"EmailAddress": f"sender-{n}@example.com"}
+    else:
+        resource_type, properties = "Custom::SES_Domain", {"Domain": f"load-{n}.example.com",
+                                                           "EnableSend": "true", "EnableReceive": "true"}
+    return {
+        "RequestType": "Create",
+        "ResourceType": resource_type,
+        "ResponseURL": response_url,
+        "StackId": STACK_ID,
+        "RequestId": f"load-request-{n}",
+        "LogicalResourceId": f"Load{n}",
+        "ResourceProperties": properties,
+    }
+
+
+def invoke(event):
+    """Run one request in this worker process; returns seconds taken"""
+    import index
+    start = time.perf_counter()
+    index.handle_request(event, LoadContext())
+    return time.perf_counter() - start
+
+
+def run_load(requests, concurrency, ses_options, response_options=None, client_rate_limit=0):
+    """Return a results dict for requests run against new emulators.
+
+    client_rate_limit is the workers' SES_RATE_LIMIT (calls per second per worker; 0 for none).
+    """
+    with SESEmulator(**ses_options) as ses, ResponseCollector(**(response_options or {})) as collector:
+        # (Workers inherit the environment pointing boto3 at the emulator)
+        os.environ.update(ses.environ())
+        os.environ["SES_RATE_LIMIT"] = str(client_rate_limit)
+        os.environ.setdefault("AWS_REGION", "mock-region")
+        events = [make_event(n, collector.response_url(f"load-{n}")) for n in range(requests + concurrency)]
+        events, warmup_events = events[:requests], events[requests:]
+        context = multiprocessing.get_context("spawn")  # (the emulators' threads make fork unsafe)
+        with ProcessPoolExecutor(max_workers=concurrency, mp_context=context) as executor:
+            list(executor.map(invoke, warmup_events))  # (so the results are for warm containers)
+            ses.reset_stats()
+            collector.reset()
+            start = time.perf_counter()
+            durations = sorted(executor.map(invoke, events))
+            elapsed = time.perf_counter() - start
+        statuses = {}
+        for response in collector.responses:
+            statuses[response["Status"]] = statuses.get(response["Status"], 0) + 1
+        return {
+            "requests": requests,
+            "concurrency": concurrency,
+            "client_rate_limit": client_rate_limit,
+            "requests_per_second": round(requests / elapsed, 1),
+            "median_ms": round(statistics.median(durations) * 1000, 1),
+            "p95_ms": round(durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1000, 1),
+            "responses": statuses,
+            "ses": ses.stats(),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="requests to run (default %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=8, help="worker processes (default %(default)s)")
+    parser.add_argument("--latency", type=float, default=20, help="simulated ms per SES call (default %(default)s)")
+    parser.add_argument("--throttle-probability", type=float, default=0.0,
+                        help="fraction of SES calls to throttle at random")
+    parser.add_argument("--rate-limit", type=float, help="SES calls per second (in total) before throttling")
+    parser.add_argument("--client-rate-limit", type=float, default=0,
+                        help="each worker's SES_RATE_LIMIT, in calls per second (default %(default)s: none)")
+    args = parser.parse_args(argv)
+
+    results = run_load(args.requests, args.concurrency, {
+        "latency": args.latency / 1000,
+        "throttle_probability": args.throttle_probability,
+        "rate_limit": args.rate_limit,
+    }, client_rate_limit=args.client_rate_limit)
+    print(json.dumps(results, indent=2))
+    return 0 if set(results["responses"]) == {"SUCCESS"} else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
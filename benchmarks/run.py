@@ -0,0 +1,248 @@
+"""Run the performance benchmarks, writing the results as JSON.
+
+Usage: python benchmarks/run.py [--output results.json] [--thresholds benchmarks/thresholds.json]
+                                [--baseline old-results.json] [--tolerance 0.25] ...
+
+Benchmarks:
+- the Custom::SES_Domain and Custom::SES_EmailIdentity handlers, end to end, against
+  stubbed Amazon SES and a local CloudFormation response endpoint (wall time per
+  invocation, and tracemalloc peak allocations)
+- cold import of the Lambda entry point (index.py), in fresh interpreters
+- DNS record planning and zone file formatting for many (default 10,000) domains,
+  separately and streamed together (RecordPlanner.plan into a ZoneFileWriter)
+  (also reported per domain, so thresholds and baselines apply to any --domains)
+
+Exits with status 1 if any result exceeds its limit in the thresholds file,
+or is more than tolerance slower (or larger) than the same result in baseline.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from unittest.mock import patch
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+# Measure the handlers' own overhead (not the client-side SES rate limit)
+os.environ["SES_RATE_LIMIT"] = "0"
+# (Each iteration repeats the same request, which would otherwise just be replayed)
+os.environ["REPLAY_CACHE"] = "none"
+os.environ.setdefault("AWS_REGION", "mock-region")
+
+import boto3  # noqa: E402
+from botocore.stub import Stubber  # noqa: E402
+
+from aws_cfn_ses_domain.clients import client_cache  # noqa: E402
+from aws_cfn_ses_domain.dns import RecordPlanner, plan_records  # noqa: E402
+from aws_cfn_ses_domain.emulator import ResponseCollector  # noqa: E402
+from aws_cfn_ses_domain.ses_domain_identity import handle_domain_identity_request  # noqa: E402
+from aws_cfn_ses_domain.ses_email_identity import handle_email_identity_request  # noqa: E402
+from aws_cfn_ses_domain.zonefile import ZoneFileWriter, zone_file_lines  # noqa: E402
+from bench_dns import domain_configs  # noqa: E402
+
+DEFAULT_THRESHOLDS = os.path.join(BENCHMARKS_DIR, "thresholds.json")
+
+# Results where smaller is better (all of them); compared against thresholds and baselines
+METRICS = ("median_ms", "p95_ms", "peak_kib", "cumulative_us", "median_us_per_domain", "peak_bytes_per_domain")
+# (Only these are comparable between runs for different numbers of domains)
+PER_DOMAIN_METRICS = ("median_us_per_domain", "peak_bytes_per_domain")
+
+
+class MockContext:
+    """Just enough of a Lambda context"""
+    log_stream_name = "benchmark-log-stream"
+
+    def get_remaining_time_in_millis(self):
+        return 60000
+
+
+def summarize(durations, peak_bytes=None):
+    """Return a result dict for a list of durations (seconds)"""
+    ordered = sorted(durations)
+    result = {
+        "iterations": len(ordered),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+    }
+    if peak_bytes is not None:
+        result["peak_kib"] = round(peak_bytes / 1024, 1)
+    return result
+
+
+def measure(fn, iterations, setup=None):
+    """Time iterations calls of fn() (after calling setup(), untimed), then one more under tracemalloc"""
+    durations = []
+    for _ in range(iterations):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return summarize(durations, peak)
+
+
+def bench_handlers(iterations):
+    ses = boto3.client("ses", region_name="mock-region")
+    stubber = Stubber(ses)
+    context = MockContext()
+    results = {}
+
+    def event(properties, response_url):
+        return {
+            "RequestType": "Create",
+            "ResponseURL": response_url,
+            "StackId": "arn:aws:cloudformation:mock-region:111111111111:stack/benchmark/deadbeef",
+            "RequestId": "benchmark-request",
+            "LogicalResourceId": "Benchmark",
+            "ResourceProperties": properties,
+        }
+
+    def stub_domain_create():
+        stubber.add_response("verify_domain_identity", {"VerificationToken": "ID_TOKEN"})
+        stubber.add_response("verify_domain_dkim", {"DkimTokens": ["DKIM1", "DKIM2", "DKIM3"]})
+        stubber.add_response("set_identity_mail_from_domain", {})
+
+    def stub_email_create():
+        stubber.add_response("verify_email_identity", {})
+
+    with ResponseCollector() as endpoint, stubber, patch("boto3.client", return_value=ses):
+        domain_event = event({"Domain": "example.com", "EnableReceive": "true"}, endpoint.response_url())
+        email_event = event({"EmailAddress": "sender@example.com"}, endpoint.response_url())
+        client_cache.clear()
+        results["domain_identity_create"] = measure(
+            lambda: handle_domain_identity_request(domain_event, context), iterations, setup=stub_domain_create)
+        results["email_identity_create"] = measure(
+            lambda: handle_email_identity_request(email_event, context), iterations, setup=stub_email_create)
+        stubber.assert_no_pending_responses()
+    failed = [response for response in endpoint.responses if response["Status"] != "SUCCESS"]
+    if failed or len(endpoint.responses) != 2 * (iterations + 1):
+        raise RuntimeError(f"Unexpected handler responses: {failed or len(endpoint.responses)}")
+    client_cache.clear()
+    return results
+
+
+def bench_import(iterations):
+    """Cold import of index.py, in fresh interpreters"""
+    cumulative = []
+    for _ in range(iterations):
+        stderr = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import index"],
+            cwd=ROOT_DIR, capture_output=True, text=True, check=True).stderr
+        for line in stderr.splitlines():
+            if line.startswith("import time:") and line.rstrip().endswith("| index"):
+                cumulative.append(int(line.split("|")[1]))
+    return {"index_import": {"iterations": len(cumulative), "min_us": min(cumulative),
+                             "cumulative_us": int(statistics.median(cumulative))}}
+
+
+def per_domain(result, domains):
+    """Add the number of domains, and per-domain time and memory, to a measure() result"""
+    result["domains"] = domains
+    result["median_us_per_domain"] = round(result["median_ms"] * 1000 / domains, 3)
+    result["peak_bytes_per_domain"] = round(result["peak_kib"] * 1024 / domains)
+    return result
+
+
+def bench_records(domains, iterations):
+    configs = list(domain_configs(domains))
+    records = plan_records(configs)
+    results = {}
+    results["plan_records"] = per_domain(measure(lambda: plan_records(configs), iterations), domains)
+    results["zone_file_lines"] = per_domain(measure(lambda: zone_file_lines(records), iterations), domains)
+
+    def write_zone_file():
+        writer = ZoneFileWriter(io.StringIO(), origin="example.com", default_ttl="1800",
+                                name_width=40, relative_names=True)
+        writer.write_records(records)
+    results["zone_file_writer"] = per_domain(measure(write_zone_file, iterations), domains)
+
+    def plan_zone_file():
+        # (Streaming: each record is written as soon as it's final)
+        writer = ZoneFileWriter(io.StringIO(), origin="example.com", default_ttl="1800",
+                                name_width=40, relative_names=True)
+        writer.write_records(RecordPlanner().plan(configs))
+    results["plan_zone_file"] = per_domain(measure(plan_zone_file, iterations), domains)
+    return results
+
+
+def check(results, thresholds=None, baseline=None, tolerance=0.25):
+    """Return a list of failure messages for results exceeding thresholds or regressing from baseline"""
+    failures = []
+    for name, limits in (thresholds or {}).items():
+        for metric, limit in limits.items():
+            value = results.get(name, {}).get(metric)
+            if value is not None and value > limit:
+                failures.append(f"{name} {metric} {value} exceeds threshold {limit}")
+    for name, old in (baseline or {}).items():
+        result = results.get(name, {})
+        for metric in METRICS if old.get("domains") == result.get("domains") else PER_DOMAIN_METRICS:
+            value, old_value = result.get(metric), old.get(metric)
+            if value is not None and old_value and value > old_value * (1 + tolerance):
+                failures.append(f"{name} {metric} {value} regressed more than {tolerance:.0%}"
+                                f" from baseline {old_value}")
+    return failures
+
+
+def load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", "-o", help="write the JSON results to this file (default stdout)")
+    parser.add_argument("--iterations", type=int, default=50, help="handler invocations (default %(default)s)")
+    parser.add_argument("--import-iterations", type=int, default=5, help="cold imports (default %(default)s)")
+    parser.add_argument("--domains", type=int, default=10000, help="domains for the DNS benchmarks")
+    parser.add_argument("--record-iterations", type=int, default=5, help="DNS benchmark runs (default %(default)s)")
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS,
+                        help="JSON file of {benchmark: {metric: limit}} (default %(default)s; '' for none)")
+    parser.add_argument("--baseline", help="earlier JSON results to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed regression from baseline, as a fraction (default %(default)s)")
+    args = parser.parse_args(argv)
+
+    results = {}
+    results.update(bench_handlers(args.iterations))
+    results.update(bench_import(args.import_iterations))
+    results.update(bench_records(args.domains, args.record_iterations))
+
+    thresholds = load_json(args.thresholds) if args.thresholds else None
+    baseline = load_json(args.baseline)["results"] if args.baseline else None
+    failures = check(results, thresholds, baseline, args.tolerance)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+        "failures": failures,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    for failure in failures:
+        print(f"FAILED: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
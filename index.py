@@ -1,5 +1,22 @@
-from aws_cfn_ses_domain import handle_domain_identity_request, handle_email_identity_request
-__all__ = [
+# AWS Lambda entry point. Each handler (and its module) is imported on first use,
+# so a function only loads the resource types it actually serves.
+import aws_cfn_ses_domain
+from aws_cfn_ses_domain.warmup import prime_on_init
+
+__all__ = [  # noqa: F822 (provided by __getattr__)
+    'handle_request',
     'handle_domain_identity_request',
+    'handle_domain_identity_batch_request',
     'handle_email_identity_request',
+    'handle_email_identity_batch_request',
 ]
+
+
+def __getattr__(name):
+    if name not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(aws_cfn_ses_domain, name)
+
+
+# (Uses Lambda's init phase to set up SES clients, if PRIME_ON_INIT is enabled)
+prime_on_init()
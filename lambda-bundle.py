@@ -0,0 +1,135 @@
+#!/bin/env python3
+"""Helpers for building the slim Lambda bundle (see `make package-slim` and `make bundle-report`).
+
+strip: remove the botocore (and boto3) service models not in --services from a build dir,
+  and any stray bytecode, so the bundle carries only what the Lambda Functions use.
+report: compare Lambda zip files' sizes and measured cold import times.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+# Python code for a cold start: import the handlers, then create each client they use.
+# Runs with -B, because /var/task is read-only in Lambda (so nothing compiled at import is ever cached).
+COLD_START_CODE = """
+import time
+start = time.perf_counter()
+import index
+handlers = [getattr(index, name) for name in index.__all__]  # (index imports them lazily)
+imported = time.perf_counter()
+import boto3
+for service in {services!r}:
+    boto3.client(service, region_name="us-east-1", aws_access_key_id="x", aws_secret_access_key="x")
+clients = time.perf_counter()
+print(imported - start, clients - start)
+"""
+
+
+def strip_models(build_dir, services):
+    """Remove service models not in services (and __pycache__ dirs) from build_dir; return bytes removed"""
+    removed = 0
+    for data_dir in (os.path.join(build_dir, "botocore", "data"), os.path.join(build_dir, "boto3", "data")):
+        if not os.path.isdir(data_dir):
+            continue
+        for name in os.listdir(data_dir):
+            model_dir = os.path.join(data_dir, name)
+            if os.path.isdir(model_dir) and name not in services:
+                removed += dir_size(model_dir)
+                shutil.rmtree(model_dir)
+    for dirpath, dirnames, _ in os.walk(build_dir):
+        if "__pycache__" in dirnames:
+            removed += dir_size(os.path.join(dirpath, "__pycache__"))
+            shutil.rmtree(os.path.join(dirpath, "__pycache__"))
+            dirnames.remove("__pycache__")
+    return removed
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(dirpath, filename))
+               for dirpath, _, filenames in os.walk(path) for filename in filenames)
+
+
+def measure_cold_start(bundle_dir, services, runs):
+    """Return the median (import seconds, import + clients seconds) over runs fresh interpreters"""
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-B", "-c", COLD_START_CODE.format(services=services)],
+            cwd=bundle_dir, capture_output=True, text=True, check=True,
+            env=dict(os.environ, PYTHONPATH=bundle_dir, AWS_REGION="us-east-1"))
+        timings.append([float(value) for value in result.stdout.split()])
+    return tuple(statistics.median(timing[i] for timing in timings) for i in range(2))
+
+
+def report(zip_files, services, runs):
+    """Return a list of result dicts, one for each of zip_files"""
+    results = []
+    for zip_file in zip_files:
+        with tempfile.TemporaryDirectory() as bundle_dir:
+            with zipfile.ZipFile(zip_file) as archive:
+                archive.extractall(bundle_dir)
+                uncompressed = sum(info.file_size for info in archive.infolist())
+            import_seconds, cold_start_seconds = measure_cold_start(bundle_dir, services, runs)
+            results.append({
+                "zip": zip_file,
+                "zip_bytes": os.path.getsize(zip_file),
+                "uncompressed_bytes": uncompressed,
+                "bundles_boto3": os.path.isdir(os.path.join(bundle_dir, "botocore")),
+                "import_ms": round(import_seconds * 1000, 1),
+                "cold_start_ms": round(cold_start_seconds * 1000, 1),
+            })
+    return results
+
+
+def print_report(results, out=sys.stdout):
+    baseline = results[0]
+    out.write(f"{'zip':<50} {'zip size':>12} {'unzipped':>12} {'import':>10} {'+ clients':>10}\n")
+    for result in results:
+        out.write("{name:<50} {zip_bytes:>12,} {uncompressed_bytes:>12,} {import_ms:>8.1f}ms {cold_start_ms:>8.1f}ms"
+                  "{note}\n".format(
+                      name=os.path.basename(result["zip"]),
+                      note="" if result["bundles_boto3"] else "  (uses the local boto3)",
+                      **result))
+    for result in results[1:]:
+        out.write("{name}: zip size {size:+.0%}, cold start {time:+.0%} vs {baseline}\n".format(
+            name=os.path.basename(result["zip"]), baseline=os.path.basename(baseline["zip"]),
+            size=result["zip_bytes"] / baseline["zip_bytes"] - 1,
+            time=result["cold_start_ms"] / baseline["cold_start_ms"] - 1))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    strip_parser = subparsers.add_parser("strip", help="remove unused service models from a build dir")
+    strip_parser.add_argument("build_dir")
+    strip_parser.add_argument("--services", nargs="+", required=True, metavar="SERVICE",
+                              help="botocore service names to keep (e.g. ses sesv2 route53 sts)")
+
+    report_parser = subparsers.add_parser("report", help="compare Lambda zips' sizes and cold import times")
+    report_parser.add_argument("zip_files", nargs="+", metavar="ZIP", help="the first is the baseline")
+    report_parser.add_argument("--services", nargs="+", default=["ses", "route53"], metavar="SERVICE",
+                               help="clients to create after importing (default %(default)s)")
+    report_parser.add_argument("--runs", type=int, default=5, help="cold starts to measure (default %(default)s)")
+    report_parser.add_argument("--json", metavar="FILE", help="also write the results as JSON to FILE")
+
+    args = parser.parse_args(argv)
+    if args.command == "strip":
+        removed = strip_models(args.build_dir, set(args.services))
+        print(f"Removed {removed:,} bytes of unused service models and bytecode from {args.build_dir}")
+    else:
+        results = report(args.zip_files, args.services, args.runs)
+        print_report(results)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+import os
+
+
+# Mock the AWS Lambda Runtime environment
+# (to the extent helpful for mock tests locally).
+# This must happen before any test module imports a handler.
+os.environ["AWS_REGION"] = "mock-region"
@@ -1,14 +1,30 @@
-import os
 from unittest import TestCase
 from unittest.mock import patch, ANY as MOCK_ANY
 
 import boto3
 from botocore.stub import Stubber
 
+from aws_cfn_ses_domain.clients import client_cache
+from aws_cfn_ses_domain.ratelimit import ses_rate_limiters
+from aws_cfn_ses_domain.replay import MemoryStore, set_replay_store
 
-# Mock the AWS Lambda Runtime environment
-# (to the extent helpful for mock tests locally).
-os.environ["AWS_REGION"] = "mock-region"  # (before importing handler)
+
+class MockClock:
+    """A fake clock (for clock= arguments), which only advances when sleep() is called.
+
+    Tests can also set now directly. Each sleep is recorded in sleeps.
+    """
+
+    def __init__(self, now=0.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
 
 
 class HandlerTestCase(TestCase):
@@ -16,11 +32,12 @@ class HandlerTestCase(TestCase):
 
     Mocks boto3.client('ses') and cfnresponse.send, and
     uses botocore.stub.Stubber to simulate/validate AWS responses.
+    (The shared client cache, rate limiters and replay store are cleared before each test.)
     """
 
     maxDiff = None  # full diffs are helpful for Stubber assertions
 
-    # HandlerTestCase will patch boto3.client and cfnresponse.send within this module:
+    # HandlerTestCase will patch cfnresponse.send within this module:
     patch_base = 'aws_cfn_ses_domain.<handler_module>'  # concrete tests must override
 
     def setUp(self):
@@ -30,8 +47,19 @@ class HandlerTestCase(TestCase):
         if self.patch_base == HandlerTestCase.patch_base:
             raise NotImplementedError(f"{self.__class__.__name__} must override patch_base")
 
+        client_cache.clear()
+        self.addCleanup(client_cache.clear)
+
+        # (each test starts without any memory of earlier throttling)
+        rate_limiters_patcher = patch.dict(ses_rate_limiters, clear=True)
+        rate_limiters_patcher.start()
+        self.addCleanup(rate_limiters_patcher.stop)
+
+        self.replay_store = MemoryStore()
+        self.addCleanup(set_replay_store, set_replay_store(self.replay_store))
+
         ses = boto3.client('ses', region_name='STUBBED')  # need a real client for Stubber
-        boto3_client_patcher = patch(f'{self.patch_base}.boto3.client', return_value=ses)
+        boto3_client_patcher = patch('boto3.client', return_value=ses)
         self.mock_boto3_client = boto3_client_patcher.start()
         self.addCleanup(boto3_client_patcher.stop)
 
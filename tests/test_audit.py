@@ -0,0 +1,144 @@
+import io
+import json
+from unittest import TestCase
+from unittest.mock import patch
+
+import boto3
+from botocore.stub import Stubber
+
+from aws_cfn_ses_domain.audit import audit, main
+
+
+class TestAudit(TestCase):
+
+    maxDiff = None
+
+    def setUp(self):
+        self.ses = boto3.client('ses', region_name='us-test-1')
+        self.stubber = Stubber(self.ses)
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+        self.out = io.StringIO()
+
+    def tearDown(self):
+        self.stubber.assert_no_pending_responses()
+
+    def run_audit(self, manifest, **kwargs):
+        manifest = {"Region": "us-test-1", **manifest}
+        counts = audit(manifest, self.out, get_ses=lambda region: self.ses, **kwargs)
+        reports = [json.loads(line) for line in self.out.getvalue().splitlines()]
+        return counts, reports
+
+    def add_state_responses(self, identities, verification, dkim, mail_from):
+        self.stubber.add_response(
+            'get_identity_verification_attributes', {'VerificationAttributes': verification},
+            {'Identities': identities})
+        self.stubber.add_response(
+            'get_identity_dkim_attributes', {'DkimAttributes': dkim}, {'Identities': identities})
+        self.stubber.add_response(
+            'get_identity_mail_from_domain_attributes', {'MailFromDomainAttributes': mail_from},
+            {'Identities': identities})
+
+    def test_audit(self):
+        self.stubber.add_response(
+            'list_identities',
+            {'Identities': ["ok.example", "other.example"], 'NextToken': "page2"},
+            {'IdentityType': "Domain", 'MaxItems': 1000})
+        self.add_state_responses(
+            ["ok.example"],
+            verification={"ok.example": {'VerificationStatus': "Success", 'VerificationToken': "TOKEN"}},
+            dkim={"ok.example": {'DkimEnabled': True, 'DkimVerificationStatus': "Success",
+                                 'DkimTokens': ["DKIM"]}},
+            mail_from={"ok.example": {'MailFromDomain': "mail.ok.example", 'MailFromDomainStatus': "Success",
+                                      'BehaviorOnMXFailure': "UseDefaultValue"}})
+        self.stubber.add_response(
+            'list_identities',
+            {'Identities': ["drifted.example"]},
+            {'IdentityType': "Domain", 'MaxItems': 1000, 'NextToken': "page2"})
+        self.add_state_responses(
+            ["drifted.example"],
+            verification={"drifted.example": {'VerificationStatus': "Failed", 'VerificationToken': "TOKEN"}},
+            dkim={"drifted.example": {'DkimEnabled': True, 'DkimVerificationStatus': "Pending",
+                                      'DkimTokens': ["DKIM"]}},
+            mail_from={})
+
+        counts, reports = self.run_audit(
+            {"Domains": ["ok.example", "drifted.example", "missing.example"]},
+            include_unmanaged=True, include_records=True)
+
+        self.assertEqual(reports, [
+            {"Region": "us-test-1", "Identity": "ok.example", "Status": "ok", "Problems": []},
+            {"Region": "us-test-1", "Identity": "other.example", "Status": "unmanaged"},
+            {"Region": "us-test-1", "Identity": "drifted.example", "Status": "drifted", "Problems": [
+                "verification status is Failed",
+                "DKIM verification status is Pending",
+                "MAIL FROM domain is '', not 'mail.drifted.example'",
+            ], "Route53RecordSets": reports[2]["Route53RecordSets"]},
+            {"Region": "us-test-1", "Identity": "missing.example", "Status": "missing",
+             "Problems": ["identity does not exist"]},
+        ])
+        self.assertEqual(len(reports[2]["Route53RecordSets"]), 5)
+        self.assertEqual(counts, {"ok": 1, "unmanaged": 1, "drifted": 1, "missing": 1})
+
+    def test_zone_file(self):
+        self.stubber.add_response(
+            'list_identities', {'Identities': ["ok.example", "other.example"]},
+            {'IdentityType': "Domain", 'MaxItems': 1000})
+        self.add_state_responses(
+            ["ok.example"],
+            verification={"ok.example": {'VerificationStatus': "Success", 'VerificationToken': "TOKEN"}},
+            dkim={"ok.example": {'DkimEnabled': True, 'DkimVerificationStatus': "Success",
+                                 'DkimTokens': ["DKIM"]}},
+            mail_from={})
+        zone_file = io.StringIO()
+        self.run_audit({"Domains": ["ok.example", "missing.example"], "EnableSend": "true", "TTL": "300"},
+                       zone_file=zone_file)
+        # (Only for the managed identities that exist)
+        self.assertEqual(zone_file.getvalue().splitlines(), [
+            '_amazonses.ok.example.\t300\tIN\tTXT  \t"TOKEN"',
+            'DKIM._domainkey.ok.example.\t300\tIN\tCNAME\tDKIM.dkim.amazonses.com.',
+            'mail.ok.example.\t300\tIN\tMX   \t10 feedback-smtp.us-test-1.amazonses.com.',
+            'mail.ok.example.\t300\tIN\tTXT  \t"v=spf1 include:amazonses.com -all"',
+            '_dmarc.ok.example.\t300\tIN\tTXT  \t"v=DMARC1; p=none; pct=100; sp=none; aspf=r;"',
+        ])
+
+    def test_disabled_identity_should_not_exist(self):
+        self.stubber.add_response(
+            'list_identities', {'Identities': ["old.example"]}, {'IdentityType': "Domain", 'MaxItems': 1000})
+        self.add_state_responses(
+            ["old.example"],
+            verification={"old.example": {'VerificationStatus': "Success", 'VerificationToken': "TOKEN"}},
+            dkim={}, mail_from={})
+        counts, reports = self.run_audit({"Domains": ["old.example", "gone.example"], "EnableSend": "false"})
+        self.assertEqual(reports, [
+            {"Region": "us-test-1", "Identity": "old.example", "Status": "drifted",
+             "Problems": ["identity exists, but neither EnableSend nor EnableReceive is set"]},
+            {"Region": "us-test-1", "Identity": "gone.example", "Status": "ok", "Problems": []},
+        ])
+
+    def test_region_error(self):
+        self.stubber.add_client_error('list_identities', "AccessDenied", "Not authorized")
+        counts, reports = self.run_audit({"Domains": ["example.com"]})
+        self.assertEqual(reports, [{
+            "Region": "us-test-1", "Status": "error",
+            "Error": "ClientError: An error occurred (AccessDenied) when calling"
+                     " the ListIdentities operation: Not authorized"}])
+        self.assertEqual(counts, {"error": 1})
+
+    def test_main_invalid_manifest(self):
+        with patch('sys.stdin', io.StringIO('{"Domains": []}')), patch('sys.stderr', io.StringIO()) as stderr:
+            with self.assertRaises(SystemExit):
+                main(["-"])
+        self.assertIn("The 'Domains' property must be a non-empty list.", stderr.getvalue())
+
+    def test_main(self):
+        self.stubber.add_response(
+            'list_identities', {'Identities': []}, {'IdentityType': "Domain", 'MaxItems': 1000})
+        manifest = io.StringIO('{"Domains": ["example.com"], "Region": "us-test-1"}')
+        with patch('sys.stdin', manifest), patch('sys.stdout', self.out), \
+                patch('sys.stderr', io.StringIO()) as stderr, \
+                patch('aws_cfn_ses_domain.audit.get_managed_client', return_value=self.ses):
+            exit_code = main(["-"])
+        self.assertEqual(exit_code, 1)  # (problems found)
+        self.assertEqual(json.loads(self.out.getvalue())["Status"], "missing")
+        self.assertEqual(stderr.getvalue(), "1 missing\n")
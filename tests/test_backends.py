@@ -0,0 +1,133 @@
+from unittest import TestCase
+
+import boto3
+from botocore.stub import Stubber
+
+from aws_cfn_ses_domain.backends import ClassicSESBackend, SESv2Backend, backend_class, get_backend
+from aws_cfn_ses_domain.dns import domain_records
+from aws_cfn_ses_domain.ses_domain_identity import DEFAULT_PROPERTIES
+
+
+def domain_properties(**overrides):
+    return {**DEFAULT_PROPERTIES, "Domain": "example.com", "Region": "us-east-1",
+            "EnableSend": True, "EnableReceive": True, "DkimKeyLength": "", **overrides}
+
+
+class TestBackendClass(TestCase):
+
+    def test_names(self):
+        self.assertIs(backend_class("ses"), ClassicSESBackend)
+        self.assertIs(backend_class("sesv2"), SESv2Backend)
+
+    def test_unknown(self):
+        with self.assertRaisesRegex(ValueError, "The 'SESBackend' property must be one of 'ses', 'sesv2', not 'v3'."):
+            backend_class("v3")
+
+
+class TestSESv2Backend(TestCase):
+
+    def setUp(self):
+        client = boto3.client('sesv2', region_name='us-east-1')
+        self.stubber = Stubber(client)
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+        self.backend = get_backend("sesv2", "us-east-1", client=client)
+
+    def tearDown(self):
+        self.stubber.assert_no_pending_responses()
+
+    def add_create(self, tokens=("DKIM_1", "DKIM_2", "DKIM_3"), **params):
+        self.stubber.add_response(
+            'create_email_identity',
+            {'IdentityType': "DOMAIN", 'VerifiedForSendingStatus': False,
+             'DkimAttributes': {'SigningEnabled': True, 'Status': "PENDING", 'Tokens': list(tokens)}},
+            {'EmailIdentity': "example.com", **params})
+
+    def test_create_in_one_call(self):
+        self.add_create(DkimSigningAttributes={'NextSigningKeyLength': "RSA_2048_BIT"})
+        self.stubber.add_response(
+            'put_email_identity_mail_from_attributes', {},
+            {'EmailIdentity': "example.com", 'MailFromDomain': "mail.example.com"})
+        outputs = self.backend.provision_domain("example.com", domain_properties(DkimKeyLength="2048"))
+        self.assertEqual(outputs["DkimTokens"], ["DKIM_1", "DKIM_2", "DKIM_3"])
+        self.assertNotIn("VerificationToken", outputs)
+        self.assertEqual(outputs["MailFromDomain"], "mail.example.com")
+
+    def test_existing_identity(self):
+        self.stubber.add_client_error('create_email_identity', "AlreadyExistsException")
+        self.stubber.add_response(
+            'get_email_identity',
+            {'IdentityType': "DOMAIN", 'VerificationStatus': "SUCCESS",
+             'DkimAttributes': {'SigningEnabled': True, 'Status': "SUCCESS", 'Tokens': ["DKIM_1"]}},
+            {'EmailIdentity': "example.com"})
+        outputs = self.backend.provision_domain(
+            "example.com", domain_properties(EnableSend=False), operations=("identity",))
+        self.assertEqual(outputs["DkimTokens"], ["DKIM_1"])  # (required to verify the domain)
+
+    def test_existing_identity_without_dkim(self):
+        self.stubber.add_client_error('create_email_identity', "AlreadyExistsException")
+        self.stubber.add_response(
+            'get_email_identity',
+            {'IdentityType': "DOMAIN", 'DkimAttributes': {'SigningEnabled': False, 'Status': "NOT_STARTED"}},
+            {'EmailIdentity': "example.com"})
+        self.stubber.add_response(
+            'put_email_identity_dkim_signing_attributes', {'DkimTokens': ["DKIM_1"]},
+            {'EmailIdentity': "example.com", 'SigningAttributesOrigin': "AWS_SES"})
+        self.assertEqual(self.backend.create_domain("example.com"), ["DKIM_1"])
+
+    def test_delete_missing(self):
+        self.stubber.add_client_error('delete_email_identity', "NotFoundException")
+        outputs = self.backend.provision_domain(
+            "example.com", domain_properties(EnableSend=False, EnableReceive=False))
+        self.assertEqual(outputs, {})
+
+    def test_identity_state(self):
+        self.stubber.add_response(
+            'get_email_identity',
+            {'IdentityType': "DOMAIN", 'VerificationStatus': "TEMPORARY_FAILURE",
+             'DkimAttributes': {'SigningEnabled': True, 'Status': "PENDING", 'Tokens': ["DKIM_1"]},
+             'MailFromAttributes': {'MailFromDomain': "mail.example.com", 'MailFromDomainStatus': "PENDING",
+                                    'BehaviorOnMxFailure': "USE_DEFAULT_VALUE"}},
+            {'EmailIdentity': "example.com"})
+        self.assertEqual(self.backend.identity_state("example.com"), {
+            "VerificationStatus": "TemporaryFailure",
+            "DkimEnabled": True,
+            "DkimVerificationStatus": "Pending",
+            "DkimTokens": ["DKIM_1"],
+            "MailFromDomain": "mail.example.com",
+        })
+
+    def test_identity_state_missing(self):
+        self.stubber.add_client_error('get_email_identity', "NotFoundException")
+        self.assertEqual(self.backend.identity_state("example.com"), {})
+
+
+class TestBackendParity(TestCase):
+    """Both backends' outputs generate the same DNS records (apart from classic domain verification)"""
+
+    def test_same_records(self):
+        ses = boto3.client('ses', region_name='us-east-1')
+        sesv2 = boto3.client('sesv2', region_name='us-east-1')
+        with Stubber(ses) as ses_stubber, Stubber(sesv2) as sesv2_stubber:
+            ses_stubber.add_response(
+                'verify_domain_identity', {'VerificationToken': "ID_TOKEN"}, {'Domain': "example.com"})
+            ses_stubber.add_response(
+                'verify_domain_dkim', {'DkimTokens': ["DKIM_1", "DKIM_2"]}, {'Domain': "example.com"})
+            ses_stubber.add_response(
+                'set_identity_mail_from_domain', {},
+                {'Identity': "example.com", 'MailFromDomain': "mail.example.com"})
+            sesv2_stubber.add_response(
+                'create_email_identity',
+                {'DkimAttributes': {'Tokens': ["DKIM_1", "DKIM_2"]}}, {'EmailIdentity': "example.com"})
+            sesv2_stubber.add_response(
+                'put_email_identity_mail_from_attributes', {},
+                {'EmailIdentity': "example.com", 'MailFromDomain': "mail.example.com"})
+
+            properties = domain_properties()
+            classic = domain_records({**properties, **ClassicSESBackend("us-east-1", ses).provision_domain(
+                "example.com", properties)})
+            v2 = domain_records({**properties, **SESv2Backend("us-east-1", sesv2).provision_domain(
+                "example.com", properties)})
+
+        self.assertEqual(v2, [record for record in classic if record["Name"] != "_amazonses.example.com."])
+        self.assertEqual(len(classic), len(v2) + 1)
@@ -0,0 +1,112 @@
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+from .base import MockClock
+
+from aws_cfn_ses_domain.calls import ManagedClient, is_retryable
+from aws_cfn_ses_domain.deadline import Deadline, DeadlineExceeded
+from aws_cfn_ses_domain.ratelimit import AdaptiveRateLimiter
+
+
+def client_error(code, status=400):
+    return ClientError(
+        {"Error": {"Code": code, "Message": "Details"}, "ResponseMetadata": {"HTTPStatusCode": status}},
+        "VerifyDomainIdentity")
+
+
+class TestManagedClient(TestCase):
+
+    def setUp(self):
+        self.client = Mock()
+        self.sleeps = []
+        uniform_patcher = patch('aws_cfn_ses_domain.calls.random.uniform', side_effect=lambda low, high: high)
+        uniform_patcher.start()
+        self.addCleanup(uniform_patcher.stop)
+
+    def managed(self, **kwargs):
+        kwargs.setdefault("deadline", Deadline())
+        return ManagedClient(self.client, sleep=self.sleeps.append, **kwargs)
+
+    def test_passes_through(self):
+        self.client.verify_domain_identity.return_value = {"VerificationToken": "TOKEN"}
+        response = self.managed().verify_domain_identity(Domain="example.com")
+        self.assertEqual(response, {"VerificationToken": "TOKEN"})
+        self.client.verify_domain_identity.assert_called_once_with(Domain="example.com")
+
+    def test_retries_transient_errors(self):
+        self.client.verify_domain_identity.side_effect = [
+            client_error("Throttling"), client_error("InternalFailure", 500), {"VerificationToken": "TOKEN"}]
+        response = self.managed().verify_domain_identity(Domain="example.com")
+        self.assertEqual(response, {"VerificationToken": "TOKEN"})
+        self.assertEqual(self.sleeps, [0.5, 1.0])  # (jittered) exponential backoff
+
+    def test_max_attempts(self):
+        self.client.verify_domain_identity.side_effect = client_error("Throttling")
+        with self.assertRaises(ClientError):
+            self.managed(max_attempts=3).verify_domain_identity(Domain="example.com")
+        self.assertEqual(self.client.verify_domain_identity.call_count, 3)
+
+    def test_other_errors_not_retried(self):
+        self.client.verify_domain_identity.side_effect = client_error("InvalidParameterValue")
+        with self.assertRaises(ClientError):
+            self.managed().verify_domain_identity(Domain="example.com")
+        self.assertEqual(self.client.verify_domain_identity.call_count, 1)
+
+    def test_deadline_passed(self):
+        deadline = Deadline(expires_at=0, clock=lambda: 1.0)
+        with self.assertRaisesRegex(DeadlineExceeded, "^Timed out before calling verify_domain_identity"):
+            self.managed(deadline=deadline).verify_domain_identity(Domain="example.com")
+        self.client.verify_domain_identity.assert_not_called()
+
+    def test_no_time_to_retry(self):
+        # Retry backoff would pass the deadline
+        self.client.verify_domain_identity.side_effect = client_error("Throttling")
+        deadline = Deadline(expires_at=1.25, clock=lambda: 1.0)
+        with self.assertRaisesRegex(DeadlineExceeded, r"^Timed out retrying verify_domain_identity after: .*Thrott"):
+            self.managed(deadline=deadline).verify_domain_identity(Domain="example.com")
+        self.assertEqual(self.client.verify_domain_identity.call_count, 1)
+
+    def test_rate_limiter(self):
+        rate_limiter = Mock(acquire=Mock(return_value=0.25), next_wait=Mock(return_value=0.25))
+        self.client.verify_domain_identity.side_effect = [client_error("Throttling"), {}]
+        managed = self.managed(rate_limiter=rate_limiter)
+        managed.verify_domain_identity(Domain="example.com")
+        self.assertEqual(rate_limiter.acquire.call_count, 2)
+        rate_limiter.on_throttle.assert_called_once_with()
+        rate_limiter.on_success.assert_called_once_with()
+        self.assertEqual(managed.rate_limit_wait, 0.5)
+        self.assertEqual(managed.throttled, 1)
+
+    def test_no_time_to_wait_for_rate_limit(self):
+        # Don't sleep for the rate limit past the deadline (into the time reserved for the response)
+        clock = MockClock()
+        rate_limiter = AdaptiveRateLimiter(0.5, clock=clock, sleep=clock.sleep)
+        rate_limiter.acquire()
+        deadline = Deadline(expires_at=1.5, clock=clock)  # (the next token is at 2.0)
+        with self.assertRaisesRegex(DeadlineExceeded, "^Timed out waiting for the rate limit"):
+            self.managed(deadline=deadline, rate_limiter=rate_limiter).verify_domain_identity(Domain="example.com")
+        self.assertEqual(clock.sleeps, [])
+        self.client.verify_domain_identity.assert_not_called()
+
+    def test_client_factory(self):
+        budgeted = Mock()
+        budgeted.verify_domain_identity.return_value = {}
+        deadline = Deadline()
+        factory = Mock(return_value=budgeted)
+        self.managed(deadline=deadline, client_factory=factory).verify_domain_identity(Domain="example.com")
+        factory.assert_called_once_with(deadline)
+        budgeted.verify_domain_identity.assert_called_once_with(Domain="example.com")
+        self.client.verify_domain_identity.assert_not_called()
+
+
+class TestIsRetryable(TestCase):
+
+    def test_is_retryable(self):
+        self.assertTrue(is_retryable(client_error("Throttling")))
+        self.assertTrue(is_retryable(client_error("TooManyRequestsException", 429)))
+        self.assertTrue(is_retryable(client_error("ServiceUnavailable", 503)))
+        self.assertTrue(is_retryable(EndpointConnectionError(endpoint_url="https://email.example")))
+        self.assertFalse(is_retryable(client_error("InvalidParameterValue")))
+        self.assertFalse(is_retryable(ValueError("not an AWS error")))
@@ -0,0 +1,183 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+from unittest.mock import patch
+
+from aws_cfn_ses_domain import cfnresponse
+from aws_cfn_ses_domain.metrics import InvocationMetrics
+from aws_cfn_ses_domain.replay import MemoryStore, set_replay_store
+
+
+class MockCloudFormationEndpoint(ThreadingHTTPServer):
+    """Local stand-in for a presigned S3 ResponseURL.
+
+    Responds to each PUT with the next status in `statuses` (200 once exhausted),
+    optionally after `delay` seconds, and records the requests and connections seen.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, statuses=(), delay=0):
+        super().__init__(("127.0.0.1", 0), _RequestHandler)
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.requests = []
+        self.connections = set()
+
+    @property
+    def url(self):
+        return "http://{}:{}/bucket/response?X-Amz-Signature=abc%3D".format(*self.server_address)
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_PUT(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        server.requests.append({"path": self.path, "headers": dict(self.headers), "body": body})
+        server.connections.add(self.client_address)
+        time.sleep(server.delay)
+        status = server.statuses.pop(0) if server.statuses else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class MockLambdaContext:
+    log_stream_name = "2019/01/01/[$LATEST]abcdef"
+
+    def __init__(self, remaining_ms=60000):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+class TestSend(TestCase):
+
+    def setUp(self):
+        self.addCleanup(cfnresponse._pool.clear)
+        self.addCleanup(set_replay_store, set_replay_store(MemoryStore()))
+        backoff_patcher = patch('aws_cfn_ses_domain.cfnresponse.random.uniform', return_value=0)  # don't wait
+        self.mock_backoff = backoff_patcher.start()
+        self.addCleanup(backoff_patcher.stop)
+
+    def start_endpoint(self, **kwargs):
+        endpoint = MockCloudFormationEndpoint(**kwargs)
+        thread = threading.Thread(target=endpoint.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        thread.start()
+        self.addCleanup(endpoint.server_close)
+        self.addCleanup(endpoint.shutdown)
+        return endpoint
+
+    def make_event(self, endpoint):
+        return {
+            "StackId": "arn:aws:cloudformation:mock-region:111111111111:stack/example/deadbeef",
+            "RequestId": "request-id",
+            "LogicalResourceId": "MySESDomain",
+            "ResponseURL": endpoint.url,
+        }
+
+    def test_success(self):
+        endpoint = self.start_endpoint()
+        result = cfnresponse.send(self.make_event(endpoint), MockLambdaContext(), cfnresponse.SUCCESS,
+                                  response_data={"Domain": "example.com"}, physical_resource_id="PHYSICAL_ID")
+        self.assertIs(result, True)
+        self.assertEqual(len(endpoint.requests), 1)
+        request = endpoint.requests[0]
+        self.assertEqual(request["path"], "/bucket/response?X-Amz-Signature=abc%3D")  # not re-encoded
+        self.assertEqual(request["headers"]["Content-Type"], "")
+        self.assertEqual(json.loads(request["body"]), {
+            "Status": "SUCCESS",
+            "Reason": "See the details in CloudWatch Log Stream: 2019/01/01/[$LATEST]abcdef",
+            "PhysicalResourceId": "PHYSICAL_ID",
+            "StackId": "arn:aws:cloudformation:mock-region:111111111111:stack/example/deadbeef",
+            "RequestId": "request-id",
+            "LogicalResourceId": "MySESDomain",
+            "Data": {"Domain": "example.com"},
+        })
+        self.assertEqual(len(cfnresponse.last_attempts), 1)
+        self.assertEqual(cfnresponse.last_attempts[0]["status"], 200)
+        self.assertGreater(cfnresponse.last_attempts[0]["duration"], 0)
+
+    def test_reuses_connection(self):
+        endpoint = self.start_endpoint()
+        event = self.make_event(endpoint)
+        for _ in range(3):
+            self.assertTrue(cfnresponse.send(event, MockLambdaContext(), cfnresponse.SUCCESS))
+        self.assertEqual(len(endpoint.requests), 3)
+        self.assertEqual(len(endpoint.connections), 1)
+        self.assertTrue(cfnresponse.last_attempts[0]["reused"])
+
+    def test_retries_server_errors(self):
+        endpoint = self.start_endpoint(statuses=[503, 500])
+        result = cfnresponse.send(self.make_event(endpoint), MockLambdaContext(), cfnresponse.FAILED,
+                                  reason="Something went wrong")
+        self.assertIs(result, True)
+        self.assertEqual(len(endpoint.requests), 3)
+        self.assertEqual([attempt["status"] for attempt in cfnresponse.last_attempts], [503, 500, 200])
+        self.assertEqual(self.mock_backoff.call_count, 2)
+
+    def test_records_metrics(self):
+        endpoint = self.start_endpoint(statuses=[503])
+        invocation = InvocationMetrics("Test")
+        with patch('aws_cfn_ses_domain.cfnresponse.current_metrics', return_value=invocation):
+            cfnresponse.send(self.make_event(endpoint), MockLambdaContext(), cfnresponse.SUCCESS)
+        (operation, _region), values = invocation.calls.popitem()
+        self.assertEqual(operation, "CloudFormation:PutResponse")
+        self.assertEqual(values["Retries"], [1])
+        self.assertEqual(values["Outcome"], ["Success"])
+
+    def test_failed_logs_detail(self):
+        endpoint = self.start_endpoint()
+        with patch('aws_cfn_ses_domain.cfnresponse.log_failure_detail') as mock_log_failure_detail:
+            cfnresponse.send(self.make_event(endpoint), MockLambdaContext(), cfnresponse.SUCCESS)
+            mock_log_failure_detail.assert_not_called()
+            cfnresponse.send(self.make_event(endpoint), MockLambdaContext(), cfnresponse.FAILED)
+            mock_log_failure_detail.assert_called_once_with()
+
+    def test_client_errors_are_final(self):
+        endpoint = self.start_endpoint(statuses=[403])
+        with self.assertLogs(level="ERROR"):
+            result = cfnresponse.send(self.make_event(endpoint), MockLambdaContext(), cfnresponse.SUCCESS)
+        self.assertIs(result, False)
+        self.assertEqual(len(endpoint.requests), 1)
+
+    def test_max_attempts(self):
+        endpoint = self.start_endpoint(statuses=[500] * 10)
+        with patch('aws_cfn_ses_domain.cfnresponse.MAX_ATTEMPTS', 3):
+            with self.assertLogs(level="ERROR"):
+                result = cfnresponse.send(self.make_event(endpoint), MockLambdaContext(), cfnresponse.SUCCESS)
+        self.assertIs(result, False)
+        self.assertEqual(len(endpoint.requests), 3)
+
+    def test_retries_bounded_by_remaining_time(self):
+        endpoint = self.start_endpoint(statuses=[500] * 10)
+        # Not enough time left (after the reserve) for any backoff
+        context = MockLambdaContext(remaining_ms=cfnresponse.TIME_RESERVE * 1000)
+        with self.assertLogs(level="ERROR"):
+            result = cfnresponse.send(self.make_event(endpoint), context, cfnresponse.SUCCESS)
+        self.assertIs(result, False)
+        self.assertEqual(len(endpoint.requests), 1)
+
+    def test_read_timeout(self):
+        endpoint = self.start_endpoint(delay=0.5)
+        attempts = cfnresponse.put_response(endpoint.url, b"{}", max_attempts=2, read_timeout=0.05)
+        self.assertEqual(len(attempts), 2)
+        self.assertIn("timed out", attempts[-1]["error"])
+
+    def test_connection_error(self):
+        endpoint = self.start_endpoint()
+        url = endpoint.url
+        endpoint.shutdown()
+        endpoint.server_close()
+        attempts = cfnresponse.put_response(url, b"{}", max_attempts=2)
+        self.assertEqual(len(attempts), 2)
+        self.assertTrue(all(attempt["status"] is None for attempt in attempts))
+        self.assertIn("ConnectionRefusedError", attempts[-1]["error"])
@@ -0,0 +1,102 @@
+import os
+import threading
+from datetime import datetime, timezone
+from unittest import TestCase
+from unittest.mock import patch, sentinel
+
+from .base import MockClock
+
+from aws_cfn_ses_domain.clients import ClientCache
+
+
+class TestClientCache(TestCase):
+
+    def setUp(self):
+        self.clock = MockClock(1000.0)
+        self.cache = ClientCache(idle_ttl=60, clock=self.clock)
+
+        boto3_client_patcher = patch('boto3.client', side_effect=lambda *args, **kwargs: object())
+        self.mock_boto3_client = boto3_client_patcher.start()
+        self.addCleanup(boto3_client_patcher.stop)
+
+    def test_reuses_client_per_region(self):
+        ses1 = self.cache.get_client('ses', region_name='us-east-1')
+        ses2 = self.cache.get_client('ses', region_name='us-east-1')
+        ses3 = self.cache.get_client('ses', region_name='eu-west-1')
+        self.assertIs(ses1, ses2)
+        self.assertIsNot(ses1, ses3)
+        self.assertEqual(self.mock_boto3_client.call_count, 2)
+        self.mock_boto3_client.assert_called_with('ses', region_name='eu-west-1')
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 2, "evictions": 0, "size": 2})
+
+    def test_keyed_by_explicit_credentials(self):
+        ses1 = self.cache.get_client('ses', region_name='us-east-1',
+                                     aws_access_key_id='AKID1', aws_secret_access_key='SECRET1')
+        ses2 = self.cache.get_client('ses', region_name='us-east-1',
+                                     aws_access_key_id='AKID2', aws_secret_access_key='SECRET2')
+        self.assertIsNot(ses1, ses2)
+
+    def test_keyed_by_environment_credentials(self):
+        with patch.dict(os.environ, {"AWS_ACCESS_KEY_ID": "AKID1", "AWS_SESSION_TOKEN": "TOKEN1"}):
+            ses1 = self.cache.get_client('ses', region_name='us-east-1')
+        with patch.dict(os.environ, {"AWS_ACCESS_KEY_ID": "AKID1", "AWS_SESSION_TOKEN": "TOKEN2"}):
+            ses2 = self.cache.get_client('ses', region_name='us-east-1')
+        self.assertIsNot(ses1, ses2)
+
+    def test_idle_ttl(self):
+        ses1 = self.cache.get_client('ses', region_name='us-east-1')
+        self.clock.now += 59
+        self.assertIs(self.cache.get_client('ses', region_name='us-east-1'), ses1)
+        self.clock.now += 59  # idle time is measured from last use
+        self.assertIs(self.cache.get_client('ses', region_name='us-east-1'), ses1)
+        self.clock.now += 60
+        with self.assertLogs(level="DEBUG") as captured:
+            self.assertIsNot(self.cache.get_client('ses', region_name='us-east-1'), ses1)
+        self.assertEqual(captured.records[0].getMessage(), "Evicted stale cached ses client for us-east-1")
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_credential_expiration(self):
+        expiration = datetime.fromtimestamp(self.clock.now + 10, tz=timezone.utc)
+        ses1 = self.cache.get_client('ses', region_name='us-east-1', expiration=expiration,
+                                     aws_access_key_id='AKID', aws_secret_access_key='SECRET',
+                                     aws_session_token='TOKEN')
+        self.mock_boto3_client.assert_called_once_with(
+            'ses', region_name='us-east-1',
+            aws_access_key_id='AKID', aws_secret_access_key='SECRET', aws_session_token='TOKEN')
+        self.clock.now += 10
+        ses2 = self.cache.get_client('ses', region_name='us-east-1', expiration=expiration,
+                                     aws_access_key_id='AKID', aws_secret_access_key='SECRET',
+                                     aws_session_token='TOKEN')
+        self.assertIsNot(ses1, ses2)
+
+    def test_evict_expired(self):
+        self.cache.get_client('ses', region_name='us-east-1')
+        self.clock.now += 30
+        self.cache.get_client('ses', region_name='eu-west-1')
+        self.clock.now += 40
+        self.assertEqual(self.cache.evict_expired(), 1)
+        self.assertEqual(self.cache.stats()["size"], 1)
+
+    def test_zero_ttl_disables_caching(self):
+        cache = ClientCache(idle_ttl=0, clock=self.clock)
+        ses1 = cache.get_client('ses', region_name='us-east-1')
+        ses2 = cache.get_client('ses', region_name='us-east-1')
+        self.assertIsNot(ses1, ses2)
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_threads_share_client(self):
+        self.mock_boto3_client.side_effect = None
+        self.mock_boto3_client.return_value = sentinel.client
+        results = []
+
+        def get():
+            results.append(self.cache.get_client('ses', region_name='us-east-1'))
+
+        threads = [threading.Thread(target=get) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [sentinel.client] * 20)
+        self.assertEqual(self.mock_boto3_client.call_count, 1)
+        self.assertEqual(self.cache.stats()["hits"], 19)
@@ -0,0 +1,23 @@
+import json
+from unittest import TestCase
+from unittest.mock import Mock
+
+from aws_cfn_ses_domain.continuation import CONTINUATION_FIELD, continue_in_new_invocation
+
+
+class TestContinueInNewInvocation(TestCase):
+
+    def test_invokes_self_asynchronously(self):
+        lambda_client = Mock()
+        context = Mock(invoked_function_arn="arn:aws:lambda:mock-region:111111111111:function:example")
+        event = {"RequestType": "Create", "RequestId": "REQ"}
+        continue_in_new_invocation(lambda_client, event, context, {"Started": 100.0})
+
+        lambda_client.invoke.assert_called_once()
+        kwargs = lambda_client.invoke.call_args[1]
+        self.assertEqual(kwargs["FunctionName"], "arn:aws:lambda:mock-region:111111111111:function:example")
+        self.assertEqual(kwargs["InvocationType"], "Event")
+        self.assertEqual(json.loads(kwargs["Payload"]), {
+            "RequestType": "Create", "RequestId": "REQ",
+            CONTINUATION_FIELD: {"Started": 100.0, "Invocations": 2},
+        })
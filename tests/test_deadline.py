@@ -0,0 +1,64 @@
+import math
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from .base import MockClock
+
+from aws_cfn_ses_domain.deadline import Deadline, DeadlineExceeded
+
+
+class TestDeadline(TestCase):
+
+    def setUp(self):
+        self.clock = MockClock(100.0)
+
+    def test_from_context(self):
+        context = Mock(get_remaining_time_in_millis=Mock(return_value=30000))
+        deadline = Deadline.from_context(context, reserve=1.5, clock=self.clock)
+        self.assertEqual(deadline.remaining(), 28.5)
+        self.clock.now += 28.5
+        self.assertTrue(deadline.expired())
+
+    def test_no_context(self):
+        deadline = Deadline.from_context(object(), clock=self.clock)
+        self.assertIsNone(deadline.expires_at)
+        self.assertEqual(deadline.remaining(), math.inf)
+        self.assertFalse(deadline.expired())
+        deadline.check("doing anything")  # doesn't raise
+
+    def test_check(self):
+        deadline = Deadline(expires_at=101.0, clock=self.clock)
+        deadline.check("calling SES")
+        self.clock.now = 101.0
+        with self.assertRaisesRegex(DeadlineExceeded, r"^Timed out calling SES \(the Lambda Function"):
+            deadline.check("calling SES")
+
+    def test_check_needed(self):
+        deadline = Deadline(expires_at=101.0, clock=self.clock)
+        deadline.check("calling SES", needed=1.0)
+        with self.assertRaises(DeadlineExceeded):
+            deadline.check("calling SES", needed=1.5)
+
+    @patch('aws_cfn_ses_domain.deadline.CONNECT_TIMEOUT', 5.0)
+    @patch('aws_cfn_ses_domain.deadline.READ_TIMEOUT', 20.0)
+    def test_timeouts(self):
+        deadline = Deadline(expires_at=100.0, clock=self.clock)
+        for remaining, expected in [
+            (300, (5.0, 20.0)),  # plenty of time: the configured timeouts
+            (20, (5.0, 20.0)),
+            (19.9, (5.0, 16)),  # budget rounded down to a power of two
+            (6, (4, 4)),
+            (1.5, (1, 1)),
+            (0.6, (0.5, 0.5)),
+            (0.1, (0.0625, 0.0625)),  # never longer than the time remaining
+        ]:
+            with self.subTest(remaining=remaining):
+                self.clock.now = deadline.expires_at - remaining
+                self.assertEqual(deadline.timeouts(), expected)
+
+    def test_client_config(self):
+        deadline = Deadline(expires_at=102.5, clock=self.clock)
+        config = deadline.client_config()
+        self.assertEqual(config.connect_timeout, 2)
+        self.assertEqual(config.read_timeout, 2)
+        self.assertEqual(config.retries, {"total_max_attempts": 1})
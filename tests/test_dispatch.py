@@ -0,0 +1,44 @@
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from aws_cfn_ses_domain.dispatch import RESOURCE_HANDLERS, get_handler, handle_request, register_resource_type
+from aws_cfn_ses_domain.ses_domain_identity import handle_domain_identity_request
+from aws_cfn_ses_domain.ses_email_identity_batch import handle_email_identity_batch_request
+
+
+class TestDispatch(TestCase):
+
+    def setUp(self):
+        self.mock_context = object()
+        send_patcher = patch('aws_cfn_ses_domain.dispatch.send')
+        self.mock_send = send_patcher.start()
+        self.addCleanup(send_patcher.stop)
+
+    def test_get_handler(self):
+        self.assertIs(get_handler("Custom::SES_Domain"), handle_domain_identity_request)
+        self.assertIs(get_handler("Custom::SES_EmailIdentityBatch"), handle_email_identity_batch_request)
+        self.assertIsNone(get_handler("Custom::Unknown"))
+
+    def test_dispatches_by_resource_type(self):
+        handler = Mock(return_value="RESULT")
+        with patch.dict(RESOURCE_HANDLERS):
+            register_resource_type("Custom::SES_Test", handler)
+            event = {"RequestType": "Create", "ResourceType": "Custom::SES_Test"}
+            self.assertEqual(handle_request(event, self.mock_context), "RESULT")
+        handler.assert_called_once_with(event, self.mock_context)
+        self.mock_send.assert_not_called()
+
+    def test_unsupported_resource_type(self):
+        event = {"RequestType": "Create", "ResourceType": "Custom::SES_Unknown"}
+        handle_request(event, self.mock_context)
+        self.mock_send.assert_called_once_with(
+            event, self.mock_context, "FAILED",
+            reason="Unsupported ResourceType 'Custom::SES_Unknown' (must be one of Custom::SES_Domain,"
+                   " Custom::SES_DomainBatch, Custom::SES_EmailIdentity, Custom::SES_EmailIdentityBatch).",
+            physical_resource_id="MISSING")
+
+    def test_delete_unsupported_resource_type(self):
+        # (Doesn't block deleting a resource this function couldn't have created)
+        event = {"RequestType": "Delete", "ResourceType": "Custom::SES_Unknown", "PhysicalResourceId": "ID"}
+        handle_request(event, self.mock_context)
+        self.mock_send.assert_called_once_with(event, self.mock_context, "SUCCESS", physical_resource_id="ID")
@@ -0,0 +1,143 @@
+from unittest import TestCase
+
+from aws_cfn_ses_domain.dns import (
+    RecordPlanner, compact_records, domain_records, domain_sort_key, expand_records, merge_records, plan_records)
+
+
+def domain_config(domain, **outputs):
+    return {"Domain": domain, "TTL": "300", **outputs}
+
+
+class TestDomainRecords(TestCase):
+
+    def test_all_records(self):
+        records = domain_records(domain_config(
+            "example.com",
+            VerificationToken="ID_TOKEN",
+            DkimTokens=["DKIM1", "DKIM2"],
+            MailFromDomain="mail.example.com",
+            MailFromMX="feedback-smtp.us-east-1.amazonses.com",
+            MailFromSPF='"v=spf1 include:amazonses.com -all"',
+            DMARC='"v=DMARC1; p=none;"',
+            ReceiveMX="inbound-smtp.us-east-1.amazonaws.com"))
+        self.assertEqual(records, [
+            {'Name': '_amazonses.example.com.', 'Type': 'TXT', 'ResourceRecords': ['"ID_TOKEN"'], 'TTL': '300'},
+            {'Name': 'DKIM1._domainkey.example.com.', 'Type': 'CNAME',
+             'ResourceRecords': ['DKIM1.dkim.amazonses.com.'], 'TTL': '300'},
+            {'Name': 'DKIM2._domainkey.example.com.', 'Type': 'CNAME',
+             'ResourceRecords': ['DKIM2.dkim.amazonses.com.'], 'TTL': '300'},
+            {'Name': 'mail.example.com.', 'Type': 'MX',
+             'ResourceRecords': ['10 feedback-smtp.us-east-1.amazonses.com.'], 'TTL': '300'},
+            {'Name': 'mail.example.com.', 'Type': 'TXT',
+             'ResourceRecords': ['"v=spf1 include:amazonses.com -all"'], 'TTL': '300'},
+            {'Name': '_dmarc.example.com.', 'Type': 'TXT', 'ResourceRecords': ['"v=DMARC1; p=none;"'], 'TTL': '300'},
+            {'Name': 'example.com.', 'Type': 'MX',
+             'ResourceRecords': ['10 inbound-smtp.us-east-1.amazonaws.com.'], 'TTL': '300'},
+        ])
+
+    def test_no_outputs(self):
+        self.assertEqual(domain_records(domain_config("example.com", DkimTokens=[], DMARC="")), [])
+
+
+class TestRecordPlanner(TestCase):
+
+    def test_merges_collisions(self):
+        # mail.example.com receives mail, and is also example.com's MAIL FROM domain
+        configs = [
+            domain_config("mail.example.com", ReceiveMX="inbound-smtp.us-east-1.amazonaws.com"),
+            domain_config("Example.com", MailFromDomain="MAIL.example.com",
+                          MailFromMX="feedback-smtp.us-east-1.amazonses.com"),
+            domain_config("mail.example.com", ReceiveMX="inbound-smtp.us-east-1.amazonaws.com"),
+        ]
+        planner = RecordPlanner()
+        for config in configs:
+            planner.add(config)
+        self.assertEqual(planner.records(), [
+            {'Name': 'mail.example.com.', 'Type': 'MX', 'TTL': '300', 'ResourceRecords': [
+                '10 inbound-smtp.us-east-1.amazonaws.com.',
+                '10 feedback-smtp.us-east-1.amazonses.com.',
+            ]},
+        ])
+        self.assertEqual(plan_records(configs), planner.records())
+
+    def test_plan_streams_final_records(self):
+        def configs():
+            yield domain_config("example.com", VerificationToken="TOKEN1")
+            yield domain_config("mail.example.com", VerificationToken="TOKEN2")
+            yield domain_config("example.org", VerificationToken="TOKEN3")
+            raise AssertionError("should not be consumed yet")
+
+        planner = RecordPlanner()
+        records = planner.plan(configs())
+        # (example.com's group is final once an unrelated domain follows it)
+        self.assertEqual([next(records)["Name"], next(records)["Name"]],
+                         ["_amazonses.example.com.", "_amazonses.mail.example.com."])
+        self.assertEqual(planner.records(), [])  # (yielded records are dropped)
+
+    def test_plan_merges_related_domains(self):
+        # (The same domains as test_merges_collisions, but listed with each domain before its subdomains)
+        configs = [
+            domain_config("mail.example.com", ReceiveMX="inbound-smtp.us-east-1.amazonaws.com"),
+            domain_config("Example.com", MailFromDomain="MAIL.example.com",
+                          MailFromMX="feedback-smtp.us-east-1.amazonses.com"),
+            domain_config("mail.example.com", ReceiveMX="inbound-smtp.us-east-1.amazonaws.com"),
+        ]
+        configs.sort(key=lambda config: domain_sort_key(config["Domain"]))
+        self.assertEqual(list(RecordPlanner().plan(configs)), [
+            {'Name': 'MAIL.example.com.', 'Type': 'MX', 'TTL': '300', 'ResourceRecords': [
+                '10 feedback-smtp.us-east-1.amazonses.com.',
+                '10 inbound-smtp.us-east-1.amazonaws.com.',
+            ]},
+        ])
+
+    def test_plan_requires_related_domains_together(self):
+        configs = [
+            domain_config("mail.example.com", ReceiveMX="inbound-smtp.us-east-1.amazonaws.com"),
+            domain_config("example.com", MailFromDomain="mail.example.com",
+                          MailFromMX="feedback-smtp.us-east-1.amazonses.com"),
+        ]
+        with self.assertRaisesRegex(ValueError, "^Record mail.example.com. for 'example.com' was already planned"):
+            list(RecordPlanner().plan(configs))
+
+    def test_conflicting_dmarc(self):
+        # (Identical DMARC records, e.g. for a domain in several regions, are fine)
+        configs = [domain_config("example.com", DMARC='"v=DMARC1; p=none;"')] * 2
+        self.assertEqual(len(plan_records(configs)), 1)
+        configs.append(domain_config("example.com", DMARC='"v=DMARC1; p=reject;"'))
+        with self.assertRaisesRegex(ValueError, "^Conflicting DMARC records for 'example.com'"):
+            plan_records(configs)
+
+    def test_merge_records(self):
+        records = [
+            {'Name': 'example.com.', 'Type': 'MX', 'TTL': '300', 'ResourceRecords': ['10 a.']},
+            {'Name': 'EXAMPLE.com.', 'Type': 'MX', 'TTL': '300', 'ResourceRecords': ['10 b.', '10 a.']},
+        ]
+        self.assertEqual(merge_records(records), [
+            {'Name': 'example.com.', 'Type': 'MX', 'TTL': '300', 'ResourceRecords': ['10 a.', '10 b.']},
+        ])
+        self.assertEqual(records[0]['ResourceRecords'], ['10 a.'])  # (unchanged)
+
+
+class TestCompactRecords(TestCase):
+
+    def test_round_trip(self):
+        shared = {"MailFromMX": "feedback-smtp.us-east-1.amazonses.com", "DMARC": '"v=DMARC1; p=none;"'}
+        configs = [
+            domain_config("example.com", VerificationToken="ID1", DkimTokens=["DKIM1", "DKIM2"],
+                          MailFromDomain="mail.example.com", **shared),
+            domain_config("example.org", VerificationToken="ID2", DkimTokens=["DKIM3"],
+                          MailFromDomain="bounce.example.net", **shared),
+            domain_config("mail.example.com", ReceiveMX="inbound-smtp.us-east-1.amazonaws.com"),
+        ]
+        index = compact_records(configs)
+        self.assertEqual(index, {
+            "Values": ["300", "mail", "feedback-smtp.us-east-1.amazonses.com", '"v=DMARC1; p=none;"',
+                       "bounce.example.net.", "inbound-smtp.us-east-1.amazonaws.com"],
+            "Domains": [
+                ["ID1", ["DKIM1", "DKIM2"], 0, 1, 2, None, 3, None],
+                ["ID2", ["DKIM3"], 0, 4, 2, None, 3, None],
+                [None, [], 0, None, None, None, None, 5],
+            ],
+        })
+        domains = [config["Domain"] for config in configs]
+        self.assertEqual(expand_records(domains, index), plan_records(configs))
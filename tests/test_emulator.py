@@ -0,0 +1,119 @@
+import os
+from unittest import TestCase
+from unittest.mock import patch
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from aws_cfn_ses_domain.clients import client_cache
+from aws_cfn_ses_domain.emulator import ResponseCollector, SESEmulator
+from aws_cfn_ses_domain.ratelimit import ses_rate_limiters
+from aws_cfn_ses_domain.replay import MemoryStore, set_replay_store
+from aws_cfn_ses_domain.ses_domain_identity import handle_domain_identity_request
+from aws_cfn_ses_domain.ses_email_identity import handle_email_identity_request
+
+
+class MockContext:
+    log_stream_name = "emulator-log-stream"
+
+    def get_remaining_time_in_millis(self):
+        return 60000
+
+
+class TestEmulatedHandlers(TestCase):
+    """Runs the handlers end to end, over HTTP: the real SES query protocol and response PUTs"""
+
+    def setUp(self):
+        self.ses = SESEmulator().start()
+        self.addCleanup(self.ses.stop)
+        self.collector = ResponseCollector().start()
+        self.addCleanup(self.collector.stop)
+
+        environ_patcher = patch.dict(os.environ, self.ses.environ())
+        environ_patcher.start()
+        self.addCleanup(environ_patcher.stop)
+        client_cache.clear()
+        self.addCleanup(client_cache.clear)
+        rate_limiters_patcher = patch.dict(ses_rate_limiters, clear=True)
+        rate_limiters_patcher.start()
+        self.addCleanup(rate_limiters_patcher.stop)
+        self.addCleanup(set_replay_store, set_replay_store(MemoryStore()))
+
+    def make_event(self, request_type="Create", **properties):
+        return {
+            "RequestType": request_type,
+            "ResponseURL": self.collector.response_url("MyResource"),
+            "StackId": "arn:aws:cloudformation:mock-region:111111111111:stack/example/deadbeef",
+            "RequestId": f"{request_type}-request",
+            "LogicalResourceId": "MyResource",
+            "ResourceProperties": {"Region": "mock-region", **properties},
+        }
+
+    def test_domain_lifecycle(self):
+        handle_domain_identity_request(
+            self.make_event(Domain="example.com", EnableSend="true", EnableReceive="true"), MockContext())
+        response = self.collector.responses[-1]
+        self.assertEqual(response["Status"], "SUCCESS", response["Reason"])
+        identity = self.ses.identities["example.com"]
+        self.assertEqual(response["Data"]["VerificationToken"], identity["VerificationToken"])
+        self.assertEqual(response["Data"]["DkimTokens"], identity["DkimTokens"])
+        self.assertEqual(identity["MailFromDomain"], "mail.example.com")
+
+        handle_domain_identity_request(
+            dict(self.make_event("Delete", Domain="example.com", EnableSend="true", EnableReceive="true"),
+                 PhysicalResourceId=response["PhysicalResourceId"]),
+            MockContext())
+        self.assertEqual(self.collector.responses[-1]["Status"], "SUCCESS")
+        self.assertNotIn("example.com", self.ses.identities)
+
+    def test_email_identity(self):
+        handle_email_identity_request(self.make_event(EmailAddress="sender@example.com"), MockContext())
+        self.assertEqual(self.collector.responses[-1]["Status"], "SUCCESS")
+        self.assertIn("sender@example.com", self.ses.identities)
+        self.assertEqual(self.ses.stats()["calls"], {"VerifyEmailIdentity": 1})
+
+
+class TestSESEmulator(TestCase):
+
+    def make_client(self, emulator):
+        return boto3.client('ses', region_name="mock-region", endpoint_url=emulator.url,
+                            aws_access_key_id="x", aws_secret_access_key="x",
+                            config=Config(retries={"total_max_attempts": 1}))
+
+    def test_identity_attributes(self):
+        with SESEmulator(verify_after=None) as emulator:
+            ses = self.make_client(emulator)
+            ses.verify_domain_identity(Domain="example.com")
+            ses.verify_domain_dkim(Domain="example.com")
+            attributes = ses.get_identity_dkim_attributes(Identities=["example.com", "missing.com"])
+        self.assertEqual(list(attributes["DkimAttributes"]), ["example.com"])
+        self.assertEqual(attributes["DkimAttributes"]["example.com"]["DkimVerificationStatus"], "Pending")
+        self.assertEqual(len(attributes["DkimAttributes"]["example.com"]["DkimTokens"]), 3)
+
+    def test_throttling(self):
+        with SESEmulator(rate_limit=2) as emulator:
+            ses = self.make_client(emulator)
+            ses.get_send_quota()
+            ses.get_send_quota()
+            with self.assertRaises(ClientError) as cm:
+                ses.get_send_quota()
+        self.assertEqual(cm.exception.response["Error"]["Code"], "Throttling")
+        self.assertEqual(emulator.stats()["throttled"], 1)
+
+    def test_unknown_action(self):
+        with SESEmulator() as emulator:
+            with self.assertRaisesRegex(ClientError, "InvalidAction"):
+                self.make_client(emulator).list_configuration_sets()
+
+
+class TestResponseCollector(TestCase):
+
+    def test_error_injection(self):
+        from aws_cfn_ses_domain.cfnresponse import put_response
+        with ResponseCollector(error_probability=0.5, seed=1) as collector:
+            attempts = put_response(collector.response_url(), b'{"Status": "SUCCESS"}', max_attempts=10)
+            self.assertTrue(collector.wait_for_responses(1, timeout=1))
+        self.assertEqual(attempts[-1]["status"], 200)
+        self.assertEqual(len(attempts), collector.errors + 1)
+        self.assertEqual(collector.responses, [{"Status": "SUCCESS"}])
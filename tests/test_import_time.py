@@ -0,0 +1,83 @@
+import os
+import subprocess
+import sys
+from unittest import TestCase
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous enough for a slow CI runner, but far below boto3's own import cost
+IMPORT_TIME_BUDGET_US = int(os.getenv("IMPORT_TIME_BUDGET_US", "150000"))
+
+DEFERRED_MODULES = ("boto3", "botocore", "urllib.request")
+
+
+def run_python(code, *options):
+    """Run code in a fresh interpreter (from the repo root), and return its stderr and stdout"""
+    result = subprocess.run(
+        [sys.executable, *options, "-c", code],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True,
+        env=dict(os.environ, AWS_REGION="mock-region"))
+    return result.stdout, result.stderr
+
+
+def parse_importtime(output):
+    """Return {module: (self_us, cumulative_us)} from `python -X importtime` output"""
+    timings = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        timings[module.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def measure_import(module="index"):
+    """Return (cumulative_us, {module: (self_us, cumulative_us)}) for importing module in a fresh interpreter"""
+    _, stderr = run_python(f"import {module}", "-X", "importtime")
+    timings = parse_importtime(stderr)
+    return timings[module][1], timings
+
+
+class TestImportTime(TestCase):
+    """Guard the Lambda entry point's cold-start import cost.
+
+    Run with IMPORT_TIME_BUDGET_US to tighten or relax the budget.
+    """
+
+    def test_index_defers_aws_sdk(self):
+        _, timings = measure_import("index")
+        for module in DEFERRED_MODULES:
+            with self.subTest(module=module):
+                self.assertNotIn(module, timings)
+
+    def test_index_import_budget(self):
+        # Take the best of a few runs, to reduce noise from the machine
+        best = min(measure_import("index")[0] for _ in range(3))
+        self.assertLess(best, IMPORT_TIME_BUDGET_US,
+                        f"Importing index took {best}us (budget {IMPORT_TIME_BUDGET_US}us)")
+
+    def test_validation_failure_skips_aws_sdk(self):
+        # Requests that fail validation shouldn't pay for importing boto3
+        stdout, _ = run_python(
+            "import sys\n"
+            "from unittest.mock import patch\n"
+            "import index\n"
+            "with patch('aws_cfn_ses_domain.ses_domain_identity.send'):\n"
+            "    index.handle_domain_identity_request({'RequestType': 'Create', 'ResourceProperties': {}}, None)\n"
+            "with patch('aws_cfn_ses_domain.ses_email_identity.send'):\n"
+            "    index.handle_email_identity_request({'RequestType': 'Create', 'ResourceProperties': {}}, None)\n"
+            "print(sorted(m for m in ('boto3', 'botocore') if m in sys.modules))\n")
+        self.assertEqual(stdout.strip(), "[]")
+
+    def test_dispatch_imports_only_requested_type(self):
+        stdout, _ = run_python(
+            "import sys\n"
+            "from unittest.mock import patch\n"
+            "import index\n"
+            "with patch('aws_cfn_ses_domain.ses_email_identity.send'):\n"
+            "    index.handle_request({'RequestType': 'Create', 'ResourceType': 'Custom::SES_EmailIdentity',\n"
+            "                          'ResourceProperties': {}}, None)\n"
+            "handler_modules = ('aws_cfn_ses_domain.ses_domain_identity', 'aws_cfn_ses_domain.ses_email_identity')\n"
+            "print(sorted(m for m in handler_modules if m in sys.modules))\n")
+        self.assertEqual(stdout.strip(), "['aws_cfn_ses_domain.ses_email_identity']")
@@ -0,0 +1,116 @@
+import json
+import logging
+from unittest import TestCase
+from unittest.mock import patch
+
+from aws_cfn_ses_domain import logs
+from aws_cfn_ses_domain.logs import InvocationLog, StructuredMessage, cap, redact_url, sanitize
+
+
+class TestStructuredMessage(TestCase):
+
+    def test_json(self):
+        message = StructuredMessage("Received event", {"event": {
+            "RequestType": "Create",
+            "ResponseURL": "https://bucket.s3.amazonaws.com/path/response?X-Amz-Signature=SECRET",
+        }})
+        self.assertEqual(json.loads(str(message)), {
+            "message": "Received event",
+            "event": {
+                "RequestType": "Create",
+                "ResponseURL": "https://bucket.s3.amazonaws.com/path/response?[REDACTED]",
+            },
+        })
+
+    def test_lazy(self):
+        class Expensive:
+            formatted = 0
+
+            def __str__(self):
+                Expensive.formatted += 1
+                return "expensive"
+
+        message = StructuredMessage("Lazy", {"value": Expensive()})
+        self.assertEqual(Expensive.formatted, 0)
+        self.assertEqual(json.loads(str(message))["value"], "expensive")
+        self.assertEqual(Expensive.formatted, 1)
+
+    def test_sanitize_response_metadata(self):
+        response = {"VerificationToken": "TOKEN", "ResponseMetadata": {
+            "RequestId": "REQUEST_ID", "HTTPStatusCode": 200, "RetryAttempts": 0,
+            "HTTPHeaders": {"x-amzn-requestid": "REQUEST_ID", "content-length": "123"},
+        }}
+        self.assertEqual(sanitize([response]), [{"VerificationToken": "TOKEN", "ResponseMetadata": {
+            "RequestId": "REQUEST_ID", "HTTPStatusCode": 200, "RetryAttempts": 0}}])
+        self.assertEqual(response["ResponseMetadata"]["HTTPHeaders"]["content-length"], "123")  # (unchanged)
+
+    def test_redact_url(self):
+        self.assertEqual(redact_url("https://example.com/path?sig=x"), "https://example.com/path?[REDACTED]")
+        self.assertEqual(redact_url("https://example.com/path"), "https://example.com/path")
+
+    def test_cap(self):
+        self.assertEqual(cap({"a": 1}, 100), {"a": 1})
+        self.assertEqual(cap("x" * 20, 10), "xxxxxxxxxx... (20 chars)")
+        self.assertEqual(cap(["y" * 20], 10), '["yyyyyyyy... (24 chars)')
+        self.assertEqual(cap("x" * 20, 0), "x" * 20)
+
+
+class TestInvocationLog(TestCase):
+
+    def setUp(self):
+        level_patcher = patch.object(logging.getLogger(), "level", logging.INFO)
+        level_patcher.start()
+        self.addCleanup(level_patcher.stop)
+
+    def test_sampled(self):
+        log = InvocationLog(sample_rate=0.5, max_field_size=10, random=lambda: 0.25)
+        with self.assertLogs(level="INFO") as captured:
+            log.verbose("SES:VerifyDomainIdentity", response="x" * 20)
+        self.assertEqual(len(captured.records), 1)
+        self.assertEqual(json.loads(captured.records[0].getMessage()),
+                         {"message": "SES:VerifyDomainIdentity", "response": "xxxxxxxxxx... (20 chars)"})
+        self.assertEqual(log.kept, [])
+
+    def test_not_sampled(self):
+        log = InvocationLog(sample_rate=0.5, random=lambda: 0.75)
+        with self.assertNoLogs(level="INFO"):
+            log.verbose("Received event", event={"RequestType": "Create"})
+
+        # If the invocation fails, the records are logged in full
+        with self.assertLogs(level="WARNING") as captured:
+            log.log_failure_detail()
+        self.assertEqual([json.loads(record.getMessage()) for record in captured.records],
+                         [{"message": "Received event", "event": {"RequestType": "Create"}}])
+        with self.assertNoLogs(level="INFO"):
+            log.log_failure_detail()  # (only once)
+
+    def test_below_log_level(self):
+        # Records below the log level are also kept for failures
+        log = InvocationLog(sample_rate=1)
+        with patch.object(logging.getLogger(), "level", logging.WARNING):
+            log.verbose("Expanded properties", properties={"Domain": "x" * 5000})
+        self.assertEqual(len(log.kept), 1)
+        with self.assertLogs(level="WARNING") as captured:
+            log.log_failure_detail()
+        self.assertEqual(json.loads(captured.records[0].getMessage())["properties"], {"Domain": "x" * 5000})
+
+    def test_kept_records_are_snapshots(self):
+        log = InvocationLog(sample_rate=0)
+        properties = {"Domain": "example.com.", "Regions": ["us-east-1"]}
+        log.verbose("Expanded properties", properties=properties)
+        properties["Domain"] = "example.com"
+        properties["Regions"].append("us-west-2")
+        with self.assertLogs(level="WARNING") as captured:
+            log.log_failure_detail()
+        self.assertEqual(json.loads(captured.records[0].getMessage())["properties"],
+                         {"Domain": "example.com.", "Regions": ["us-east-1"]})
+
+    def test_kept_records_limited(self):
+        log = InvocationLog(sample_rate=0)
+        with patch.object(logs, "MAX_KEPT_RECORDS", 2):
+            for i in range(5):
+                log.verbose("Record", number=i)
+        with self.assertLogs(level="WARNING") as captured:
+            log.log_failure_detail()
+        self.assertEqual(len(captured.records), 3)
+        self.assertEqual(captured.records[-1].getMessage(), "(3 more verbose records were discarded)")
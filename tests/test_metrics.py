@@ -0,0 +1,134 @@
+import json
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from botocore.exceptions import ClientError
+
+from .base import HandlerTestCase, MOCK_ANY
+
+from aws_cfn_ses_domain import metrics
+from aws_cfn_ses_domain.calls import ManagedClient
+from aws_cfn_ses_domain.deadline import Deadline
+from aws_cfn_ses_domain.metrics import InvocationMetrics, current_metrics, instrumented
+from aws_cfn_ses_domain.ses_email_identity import handle_email_identity_request
+
+
+def emf_documents(log_output):
+    return [json.loads(line.split(":", 2)[2]) for line in log_output]
+
+
+class TestInvocationMetrics(TestCase):
+
+    def test_emf_lines(self):
+        invocation = InvocationMetrics("SES_Domain", cold_start=True, namespace="Test", clock=lambda: 1234.5)
+        invocation.record_call("SES:VerifyDomainIdentity", "us-east-1", 0.0125, attempts=2)
+        invocation.record_call("SES:VerifyDomainIdentity", "us-east-1", 0.004, outcome="Throttling")
+        invocation.record_call("SES:VerifyDomainDkim", "us-east-1", 0.003)
+        documents = [json.loads(line) for line in invocation.emf_lines()]
+        self.assertEqual(len(documents), 3)
+
+        self.assertEqual(documents[1], {
+            "_aws": {
+                "Timestamp": 1234500,
+                "CloudWatchMetrics": [{
+                    "Namespace": "Test",
+                    "Dimensions": [["Operation", "Region"]],
+                    "Metrics": [
+                        {"Name": "Duration", "Unit": "Milliseconds"},
+                        {"Name": "Retries", "Unit": "Count"},
+                        {"Name": "Errors", "Unit": "Count"},
+                    ],
+                }],
+            },
+            "Operation": "SES:VerifyDomainIdentity",
+            "Region": "us-east-1",
+            "Handler": "SES_Domain",
+            "Duration": [12.5, 4.0],
+            "Retries": [1, 0],
+            "Errors": [0, 1],
+            "Outcome": ["Success", "Throttling"],
+        })
+        self.assertEqual(documents[0]["Operation"], "SES:VerifyDomainDkim")
+
+        invocation_document = documents[2]
+        self.assertEqual(invocation_document["_aws"]["CloudWatchMetrics"][0]["Dimensions"], [["Handler"]])
+        self.assertEqual(invocation_document["Handler"], "SES_Domain")
+        self.assertEqual(invocation_document["ColdStart"], 1)
+        self.assertIn("InvocationDuration", invocation_document)
+
+    def test_values_per_line_limited(self):
+        invocation = InvocationMetrics("SES_DomainBatch")
+        for _ in range(250):
+            invocation.record_call("SES:VerifyDomainIdentity", "us-east-1", 0.001)
+        documents = [json.loads(line) for line in invocation.emf_lines()]
+        self.assertEqual([len(document.get("Duration", [])) for document in documents], [100, 100, 50, 0])
+
+
+class TestInstrumented(TestCase):
+
+    def setUp(self):
+        self.client = Mock()
+        self.client.meta.region_name = "us-test-1"
+        self.client.meta.method_to_api_mapping = {"verify_domain_identity": "VerifyDomainIdentity"}
+        self.client.meta.service_model.service_id = "SES"
+
+        @instrumented("Test")
+        def handler(event, context):
+            self.invocation_metrics = current_metrics()
+            ses = ManagedClient(self.client, deadline=Deadline())
+            return ses.verify_domain_identity(Domain=event["Domain"])
+        self.handler = handler
+
+    def test_disabled(self):
+        self.client.verify_domain_identity.return_value = {"VerificationToken": "TOKEN"}
+        with patch.object(metrics, "METRICS_ENABLED", False), \
+                patch.object(metrics.metrics_logger, "info") as mock_info:
+            self.assertEqual(self.handler({"Domain": "example.com"}, None), {"VerificationToken": "TOKEN"})
+        mock_info.assert_not_called()
+        self.assertIsNone(self.invocation_metrics)
+
+    def test_enabled(self):
+        self.client.verify_domain_identity.side_effect = ClientError(
+            {"Error": {"Code": "InvalidParameterValue", "Message": "Details"}}, "VerifyDomainIdentity")
+        with patch.object(metrics, "METRICS_ENABLED", True), \
+                self.assertLogs("aws_cfn_ses_domain.metrics", "INFO") as logs:
+            with self.assertRaises(ClientError):
+                self.handler({"Domain": "example.com"}, None)
+        self.assertIsInstance(self.invocation_metrics, InvocationMetrics)
+        self.assertIsNone(current_metrics())  # (only during the invocation)
+
+        call_document, invocation_document = emf_documents(logs.output)
+        self.assertEqual(call_document["Operation"], "SES:VerifyDomainIdentity")
+        self.assertEqual(call_document["Region"], "us-test-1")
+        self.assertEqual(call_document["Retries"], [0])
+        self.assertEqual(call_document["Errors"], [1])
+        self.assertEqual(call_document["Outcome"], ["InvalidParameterValue"])
+        self.assertEqual(invocation_document["Handler"], "Test")
+
+
+class TestHandlerMetrics(HandlerTestCase):
+
+    patch_base = 'aws_cfn_ses_domain.ses_email_identity'
+
+    def test_email_identity(self):
+        event = {
+            "RequestType": "Create",
+            "ResourceProperties": {
+                "EmailAddress": "sender@example.com",
+                "Region": "us-test-2",
+            },
+            "StackId": self.mock_stack_id}
+        self.ses_stubber.add_response(
+            'verify_email_identity',
+            {},
+            {'EmailAddress': "sender@example.com"})
+        with patch.object(metrics, "METRICS_ENABLED", True), \
+                self.assertLogs("aws_cfn_ses_domain.metrics", "INFO") as logs:
+            handle_email_identity_request(event, self.mock_context)
+        self.assertSentResponse(event, physical_resource_id=MOCK_ANY)
+
+        call_document, invocation_document = emf_documents(logs.output)
+        self.assertEqual(call_document["Operation"], "SES:VerifyEmailIdentity")
+        self.assertEqual(call_document["Region"], "STUBBED")  # (the stubbed client's region)
+        self.assertEqual(call_document["Outcome"], ["Success"])
+        self.assertEqual(invocation_document["Handler"], "SES_EmailIdentity")
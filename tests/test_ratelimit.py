@@ -0,0 +1,68 @@
+from unittest import TestCase
+
+from .base import MockClock
+
+from aws_cfn_ses_domain.ratelimit import AdaptiveRateLimiter, RateLimiter
+
+
+class TestRateLimiter(TestCase):
+
+    def setUp(self):
+        self.clock = MockClock()
+
+    def test_burst_then_rate(self):
+        limiter = RateLimiter(rate=2, burst=3, clock=self.clock, sleep=self.clock.sleep)
+        waits = [limiter.acquire() for _ in range(5)]
+        self.assertEqual(waits, [0, 0, 0, 0.5, 0.5])
+        self.assertEqual(self.clock.now, 1.0)
+        self.assertEqual(limiter.total_wait, 1.0)
+
+    def test_refills_while_idle(self):
+        limiter = RateLimiter(rate=1, clock=self.clock, sleep=self.clock.sleep)
+        self.assertEqual(limiter.acquire(), 0)
+        self.clock.now += 10  # idle time refills only up to the burst size
+        self.assertEqual(limiter.acquire(), 0)
+        self.assertEqual(limiter.acquire(), 1.0)
+
+    def test_next_wait(self):
+        limiter = RateLimiter(rate=2, burst=1, clock=self.clock, sleep=self.clock.sleep)
+        self.assertEqual(limiter.next_wait(), 0)
+        limiter.acquire()
+        self.assertEqual(limiter.next_wait(), 0.5)
+        self.assertEqual(limiter.next_wait(), 0.5)  # (doesn't take a token)
+        self.clock.now += 0.25
+        self.assertEqual(limiter.next_wait(), 0.25)
+
+    def test_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            RateLimiter(rate=0)
+
+
+class TestAdaptiveRateLimiter(TestCase):
+
+    def setUp(self):
+        self.clock = MockClock()
+
+    def test_backs_off_and_recovers(self):
+        limiter = AdaptiveRateLimiter(4, min_rate=1, increase=0.5, clock=self.clock, sleep=self.clock.sleep)
+        self.assertEqual(limiter.acquire(), 0)
+        limiter.on_throttle()
+        self.assertEqual(limiter.rate, 2)
+        self.assertEqual(limiter.acquire(), 0.5)  # throttling empties the bucket
+        limiter.on_throttle()
+        limiter.on_throttle()
+        self.assertEqual(limiter.rate, 1)  # never below min_rate
+        self.assertEqual(limiter.throttled, 3)
+        for _ in range(10):
+            limiter.on_success()
+        self.assertEqual(limiter.rate, 4)  # never above max_rate
+
+    def test_defaults(self):
+        limiter = AdaptiveRateLimiter(10)
+        self.assertEqual(limiter.rate, 10)
+        self.assertEqual(limiter.min_rate, 1)
+        self.assertEqual(limiter.increase, 0.5)
+
+    def test_min_rate_capped(self):
+        limiter = AdaptiveRateLimiter(2, min_rate=5)
+        self.assertEqual(limiter.min_rate, 2)
@@ -0,0 +1,73 @@
+from unittest import TestCase
+
+import boto3
+from botocore.stub import Stubber
+
+from aws_cfn_ses_domain.reconcile import (
+    dkim_needs_verification, fetch_identity_states, identity_needs_verification, mail_from_needs_update)
+
+
+class TestFetchIdentityStates(TestCase):
+
+    def setUp(self):
+        self.ses = boto3.client('ses', region_name='STUBBED')
+        self.ses_stubber = Stubber(self.ses)
+        self.ses_stubber.activate()
+        self.addCleanup(self.ses_stubber.deactivate)
+
+    def tearDown(self):
+        self.ses_stubber.assert_no_pending_responses()
+
+    def test_batches_identities(self):
+        identities = [f"example{n}.com" for n in range(150)]
+        for chunk in (identities[:100], identities[100:]):
+            exists = [identity for identity in chunk if identity in ("example1.com", "example120.com")]
+            self.ses_stubber.add_response(
+                'get_identity_verification_attributes',
+                {'VerificationAttributes': {
+                    identity: {'VerificationStatus': "Success", 'VerificationToken': f"ID_{identity}"}
+                    for identity in exists}},
+                {'Identities': chunk})
+            self.ses_stubber.add_response(
+                'get_identity_dkim_attributes',
+                {'DkimAttributes': {
+                    identity: {'DkimEnabled': True, 'DkimVerificationStatus': "Pending",
+                               'DkimTokens': [f"DKIM_{identity}"]}
+                    for identity in exists}},
+                {'Identities': chunk})
+            self.ses_stubber.add_response(
+                'get_identity_mail_from_domain_attributes',
+                {'MailFromDomainAttributes': {
+                    identity: {'MailFromDomain': f"mail.{identity}", 'MailFromDomainStatus': "Success",
+                               'BehaviorOnMXFailure': "UseDefaultValue"}
+                    for identity in exists}},
+                {'Identities': chunk})
+
+        states = fetch_identity_states(self.ses, identities)
+        self.assertEqual(sorted(states), ["example1.com", "example120.com"])
+        self.assertEqual(states["example120.com"], {
+            'VerificationStatus': "Success", 'VerificationToken': "ID_example120.com",
+            'DkimEnabled': True, 'DkimVerificationStatus': "Pending", 'DkimTokens': ["DKIM_example120.com"],
+            'MailFromDomain': "mail.example120.com", 'MailFromDomainStatus': "Success",
+            'BehaviorOnMXFailure': "UseDefaultValue",
+        })
+
+
+class TestReconcilePredicates(TestCase):
+
+    def test_identity_needs_verification(self):
+        self.assertTrue(identity_needs_verification({}))
+        self.assertTrue(identity_needs_verification({'VerificationStatus': "Failed", 'VerificationToken': "T"}))
+        self.assertFalse(identity_needs_verification({'VerificationStatus': "Pending", 'VerificationToken': "T"}))
+
+    def test_dkim_needs_verification(self):
+        state = {'DkimEnabled': True, 'DkimVerificationStatus': "Success", 'DkimTokens': ["A", "B", "C"]}
+        self.assertFalse(dkim_needs_verification(state))
+        self.assertTrue(dkim_needs_verification(dict(state, DkimEnabled=False)))
+        self.assertTrue(dkim_needs_verification(dict(state, DkimVerificationStatus="NotStarted")))
+        self.assertTrue(dkim_needs_verification({}))
+
+    def test_mail_from_needs_update(self):
+        self.assertFalse(mail_from_needs_update({}, ""))
+        self.assertTrue(mail_from_needs_update({}, "mail.example.com"))
+        self.assertFalse(mail_from_needs_update({'MailFromDomain': "mail.example.com"}, "mail.example.com"))
@@ -0,0 +1,151 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+import boto3
+from botocore.stub import Stubber
+
+from .base import HandlerTestCase, MockClock
+
+from aws_cfn_ses_domain import cfnresponse
+from aws_cfn_ses_domain.replay import DynamoDBStore, FileStore, MemoryStore, replay_key
+from aws_cfn_ses_domain.ses_email_identity import handle_email_identity_request
+
+EVENT = {
+    "RequestType": "Create",
+    "RequestId": "REQUEST_ID",
+    "ResponseURL": "https://example.com/response?signature=1",
+    "StackId": "arn:aws:cloudformation:mock-region:111111111111:stack/example/deadbeef",
+    "LogicalResourceId": "EmailIdentity",
+    "ResourceType": "Custom::SES_EmailIdentity",
+    "ResourceProperties": {"EmailAddress": "sender@example.com", "Region": "us-test-2"},
+}
+
+RESPONSE = {"response_status": "SUCCESS", "reason": None,
+            "response_data": {"Arn": "ARN"}, "physical_resource_id": "ARN"}
+
+
+class TestReplayKey(TestCase):
+
+    def test_canonical(self):
+        reordered = dict(reversed(list(EVENT.items())))
+        reordered["ResourceProperties"] = {"Region": "us-test-2", "EmailAddress": "sender@example.com"}
+        reordered["ResponseURL"] = "https://example.com/response?signature=2"  # (not part of the key)
+        self.assertEqual(replay_key(reordered), replay_key(EVENT))
+        self.assertTrue(replay_key(EVENT).startswith("REQUEST_ID:"))
+
+    def test_differs(self):
+        changed = dict(EVENT, ResourceProperties={"EmailAddress": "other@example.com"})
+        self.assertNotEqual(replay_key(changed), replay_key(EVENT))
+        self.assertNotEqual(replay_key(dict(EVENT, RequestId="OTHER")), replay_key(EVENT))
+
+
+class TestMemoryStore(TestCase):
+
+    def test_ttl(self):
+        clock = MockClock(1000.0)
+        store = MemoryStore(ttl=60, clock=clock)
+        self.assertIsNone(store.get("key"))
+        store.put("key", RESPONSE)
+        clock.now += 59
+        self.assertEqual(store.get("key"), RESPONSE)
+        clock.now += 1
+        self.assertIsNone(store.get("key"))
+
+    def test_max_entries(self):
+        store = MemoryStore(max_entries=2)
+        for key in ("a", "b", "c"):
+            store.put(key, RESPONSE)
+        self.assertIsNone(store.get("a"))
+        self.assertEqual(store.get("c"), RESPONSE)
+
+
+class TestFileStore(TestCase):
+
+    def test_round_trip(self):
+        clock = MockClock(1000.0)
+        with tempfile.TemporaryDirectory() as directory:
+            store = FileStore(os.path.join(directory, "replay"), ttl=60, clock=clock)
+            self.assertIsNone(store.get("key"))
+            store.put("key", RESPONSE)
+            self.assertEqual(FileStore(store.directory, clock=clock).get("key"), RESPONSE)
+            self.assertEqual(len(os.listdir(store.directory)), 1)  # (no leftover temp files)
+            clock.now += 60
+            self.assertIsNone(store.get("key"))
+
+
+class TestDynamoDBStore(TestCase):
+
+    def setUp(self):
+        self.dynamodb = boto3.client("dynamodb", region_name="us-test-1")
+        self.stubber = Stubber(self.dynamodb)
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+        self.clock = MockClock(1000.0)
+        self.store = DynamoDBStore("replay-table", dynamodb=self.dynamodb, ttl=60, clock=self.clock)
+
+    def test_put(self):
+        self.stubber.add_response("put_item", {}, {"TableName": "replay-table", "Item": {
+            "Key": {"S": "key"},
+            "ExpiresAt": {"N": "1060"},
+            "Response": {"S": '{"response_status": "SUCCESS", "reason": null, '
+                              '"response_data": {"Arn": "ARN"}, "physical_resource_id": "ARN"}'},
+        }})
+        self.store.put("key", RESPONSE)
+        self.stubber.assert_no_pending_responses()
+
+    def test_get(self):
+        expected_params = {"TableName": "replay-table", "Key": {"Key": {"S": "key"}}, "ConsistentRead": True}
+        item = {"Key": {"S": "key"}, "ExpiresAt": {"N": "1060"}, "Response": {"S": '{"response_status": "FAILED"}'}}
+        self.stubber.add_response("get_item", {}, expected_params)
+        self.stubber.add_response("get_item", {"Item": item}, expected_params)
+        self.stubber.add_response("get_item", {"Item": item}, expected_params)
+        self.assertIsNone(self.store.get("key"))
+        self.assertEqual(self.store.get("key"), {"response_status": "FAILED"})
+        self.clock.now = 1060  # (expired, but not yet deleted by DynamoDB)
+        self.assertIsNone(self.store.get("key"))
+
+    def test_table_required(self):
+        with patch("aws_cfn_ses_domain.replay.REPLAY_CACHE_TABLE", ""):
+            with self.assertRaisesRegex(ValueError, "table_name"):
+                DynamoDBStore()
+
+
+class TestReplayHandler(HandlerTestCase):
+
+    patch_base = 'aws_cfn_ses_domain.ses_email_identity'
+
+    def setUp(self):
+        super().setUp()
+        self.mock_context = Mock(log_stream_name="LOG_STREAM", **{"get_remaining_time_in_millis.return_value": 60000})
+        self.mock_send.side_effect = cfnresponse.send  # (which stores the response)
+        put_response_patcher = patch('aws_cfn_ses_domain.cfnresponse.put_response',
+                                     return_value=[{"status": 200, "reason": "OK", "error": None}])
+        self.mock_put_response = put_response_patcher.start()
+        self.addCleanup(put_response_patcher.stop)
+
+    def test_duplicate_request_replayed(self):
+        self.ses_stubber.add_response(
+            'verify_email_identity',
+            {},
+            {'EmailAddress': "sender@example.com"})
+        handle_email_identity_request(EVENT, self.mock_context)
+        # (Only one SES call is stubbed: the Stubber would fail if the duplicate called SES again.)
+        with self.assertLogs(level="WARNING") as logs:
+            handle_email_identity_request(dict(EVENT), self.mock_context)
+        self.assertIn("Replaying the stored SUCCESS response to duplicate request REQUEST_ID", logs.output[0])
+
+        self.assertEqual(self.mock_put_response.call_count, 2)
+        first, duplicate = self.mock_put_response.call_args_list
+        self.assertEqual(first[0], duplicate[0])  # (the same response body to the same URL)
+
+    def test_changed_request_not_replayed(self):
+        for email_address in ("sender@example.com", "other@example.com"):
+            self.ses_stubber.add_response(
+                'verify_email_identity',
+                {},
+                {'EmailAddress': email_address})
+            event = dict(EVENT, ResourceProperties=dict(EVENT["ResourceProperties"], EmailAddress=email_address))
+            handle_email_identity_request(event, self.mock_context)
+        self.assertEqual(self.mock_put_response.call_count, 2)
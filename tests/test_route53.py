@@ -0,0 +1,118 @@
+from unittest import TestCase
+
+import boto3
+from botocore.stub import Stubber
+
+from .base import MockClock
+
+from aws_cfn_ses_domain.deadline import Deadline, DeadlineExceeded
+from aws_cfn_ses_domain.dns import record_key
+from aws_cfn_ses_domain.route53 import (
+    RecordConflict, delete_records, to_change, update_records, wait_for_insync)
+
+
+RECORD = {'Name': '_amazonses.example.com.', 'Type': 'TXT', 'TTL': '300', 'ResourceRecords': ['"TOKEN"']}
+STALE_RECORD = {'Name': 'mail.example.com.', 'Type': 'MX', 'TTL': '300',
+                'ResourceRecords': ['10 feedback-smtp.us-east-1.amazonses.com.']}
+
+
+def change_info(status="PENDING"):
+    return {'Id': "/change/C1", 'Status': status, 'SubmittedAt': "2020-01-01T00:00:00Z"}
+
+
+class TestRoute53(TestCase):
+
+    def setUp(self):
+        self.route53 = boto3.client('route53', region_name='us-east-1')
+        self.stubber = Stubber(self.route53)
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+        self.clock = MockClock()
+
+    def tearDown(self):
+        self.stubber.assert_no_pending_responses()
+
+    def test_to_change(self):
+        self.assertEqual(to_change("UPSERT", RECORD), {
+            'Action': "UPSERT",
+            'ResourceRecordSet': {
+                'Name': '_amazonses.example.com.', 'Type': 'TXT', 'TTL': 300,
+                'ResourceRecords': [{'Value': '"TOKEN"'}]}})
+
+    def test_wait_for_insync(self):
+        for status in ("PENDING", "PENDING", "INSYNC"):
+            self.stubber.add_response('get_change', {'ChangeInfo': change_info(status)}, {'Id': "/change/C1"})
+        seconds = wait_for_insync(self.route53, change_info(), deadline=Deadline(),
+                                  clock=self.clock, sleep=self.clock.sleep)
+        self.assertEqual(self.clock.sleeps, [2, 3, 4.5])  # exponential backoff
+        self.assertEqual(seconds, 9.5)
+
+    def test_wait_for_insync_deadline(self):
+        self.stubber.add_response('get_change', {'ChangeInfo': change_info()}, {'Id': "/change/C1"})
+        deadline = Deadline(expires_at=4, clock=self.clock)
+        with self.assertRaisesRegex(DeadlineExceeded, r"Route 53 change /change/C1 to be INSYNC \(still PENDING"):
+            wait_for_insync(self.route53, change_info(), deadline=deadline, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_update_records(self):
+        self.stubber.add_response(
+            'change_resource_record_sets', {'ChangeInfo': change_info("INSYNC")},
+            {'HostedZoneId': "Z123", 'ChangeBatch': {
+                'Comment': "test",
+                'Changes': [to_change("DELETE", STALE_RECORD), to_change("UPSERT", RECORD)]}})
+        info, seconds = update_records(self.route53, "Z123", [RECORD], [STALE_RECORD],
+                                       owned={record_key(RECORD)}, comment="test")
+        self.assertEqual(info["Id"], "/change/C1")
+        self.assertAlmostEqual(seconds, 0, places=2)
+
+    def test_update_records_stale_mismatch(self):
+        # If the stale records have already changed, just UPSERT
+        self.stubber.add_client_error(
+            'change_resource_record_sets', "InvalidChangeBatch", "Tried to delete resource record set but not found")
+        self.stubber.add_response(
+            'change_resource_record_sets', {'ChangeInfo': change_info("INSYNC")},
+            {'HostedZoneId': "Z123", 'ChangeBatch': {'Changes': [to_change("CREATE", RECORD)]}})
+        self.stubber.add_client_error(
+            'change_resource_record_sets', "InvalidChangeBatch", "Tried to delete resource record set but not found",
+            expected_params={'HostedZoneId': "Z123", 'ChangeBatch': {'Changes': [to_change("DELETE", STALE_RECORD)]}})
+        with self.assertLogs(level="WARNING"):
+            update_records(self.route53, "Z123", [RECORD], [STALE_RECORD])
+
+    def test_update_records_conflict(self):
+        # Records not already owned are created, and never replace existing ones
+        self.stubber.add_client_error(
+            'change_resource_record_sets', "InvalidChangeBatch",
+            "[Tried to create resource record set [name='_amazonses.example.com.', type='TXT'] but it already exists]",
+            expected_params={'HostedZoneId': "Z123", 'ChangeBatch': {'Changes': [to_change("CREATE", RECORD)]}})
+        with self.assertRaisesRegex(RecordConflict, r"^Unable to add the DNS records to Route 53 hosted zone Z123"):
+            update_records(self.route53, "Z123", [RECORD])
+
+    def test_delete_records(self):
+        self.stubber.add_response(
+            'change_resource_record_sets', {'ChangeInfo': change_info()},
+            {'HostedZoneId': "Z123", 'ChangeBatch': {
+                'Changes': [to_change("DELETE", RECORD), to_change("DELETE", STALE_RECORD)]}})
+        self.assertEqual(delete_records(self.route53, "Z123", [RECORD, STALE_RECORD]), [RECORD, STALE_RECORD])
+
+    def test_delete_records_missing(self):
+        self.stubber.add_client_error(
+            'change_resource_record_sets', "InvalidChangeBatch", "Tried to delete resource record set but not found")
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(delete_records(self.route53, "Z123", [RECORD]), [])
+
+    def test_delete_records_some_missing(self):
+        # If one record no longer matches, the others are still deleted (separately)
+        self.stubber.add_client_error(
+            'change_resource_record_sets', "InvalidChangeBatch", "Tried to delete resource record set but not found")
+        self.stubber.add_client_error(
+            'change_resource_record_sets', "InvalidChangeBatch", "Tried to delete resource record set but not found",
+            expected_params={'HostedZoneId': "Z123", 'ChangeBatch': {'Changes': [to_change("DELETE", STALE_RECORD)]}})
+        self.stubber.add_response(
+            'change_resource_record_sets', {'ChangeInfo': change_info()},
+            {'HostedZoneId': "Z123", 'ChangeBatch': {'Changes': [to_change("DELETE", RECORD)]}})
+        with self.assertLogs(level="WARNING") as cm:
+            deleted = delete_records(self.route53, "Z123", [STALE_RECORD, RECORD])
+        self.assertEqual(deleted, [RECORD])
+        self.assertIn("Not deleting Route 53 MX record mail.example.com. in Z123", cm.output[-1])
+
+    def test_delete_nothing(self):
+        self.assertEqual(delete_records(self.route53, "Z123", []), [])
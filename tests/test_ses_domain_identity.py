@@ -1,5 +1,15 @@
+import json
+import time
+from unittest.mock import Mock, patch
+
+import boto3
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber
+
 from .base import HandlerTestCase, MOCK_ANY
 
+from aws_cfn_ses_domain.continuation import CONTINUATION_FIELD
+from aws_cfn_ses_domain.ratelimit import AdaptiveRateLimiter, ses_rate_limiters
 from aws_cfn_ses_domain.ses_domain_identity import handle_domain_identity_request
 
 
@@ -53,7 +63,7 @@ class TestDomainIdentityHandler(HandlerTestCase):
         handle_domain_identity_request(event, self.mock_context)
 
         # Should default to SES in current region (where stack is running):
-        self.mock_boto3_client.assert_called_once_with('ses', region_name="mock-region")
+        self.mock_boto3_client.assert_called_once_with('ses', region_name="mock-region", config=MOCK_ANY)
 
         outputs = self.assertSentResponse(
             event, physical_resource_id="arn:aws:ses:mock-region:111111111111:identity/example.com")
@@ -118,7 +128,7 @@ class TestDomainIdentityHandler(HandlerTestCase):
         handle_domain_identity_request(event, self.mock_context)
 
         # Should override SES region when Region property provided:
-        self.mock_boto3_client.assert_called_once_with('ses', region_name="us-test-2")
+        self.mock_boto3_client.assert_called_once_with('ses', region_name="us-test-2", config=MOCK_ANY)
 
         outputs = self.assertSentResponse(
             event, physical_resource_id="arn:aws:ses:us-test-2:111111111111:identity/example.com")
@@ -278,6 +288,23 @@ class TestDomainIdentityHandler(HandlerTestCase):
             ' calling the VerifyDomainIdentity operation: Invalid domain name bad domain name.',
             cm.output[0])
 
+    def test_deadline_exceeded(self):
+        # Not enough time left in the Lambda Function to call SES
+        context = Mock(get_remaining_time_in_millis=Mock(return_value=500))
+        event = {
+            "RequestType": "Create",
+            "ResourceProperties": {
+                "Domain": "example.com",
+            },
+            "StackId": self.mock_stack_id}
+        with self.assertLogs(level="ERROR"):
+            handle_domain_identity_request(event, context)
+
+        self.assertSentResponse(
+            event, context=context, status="FAILED",
+            reason="Timed out before calling SES:VerifyDomainIdentity (the Lambda Function was about to time out)",
+            physical_resource_id="arn:aws:ses:mock-region:111111111111:identity/example.com")
+
     def test_invalid_boolean_property(self):
         event = {
             "RequestType": "Create",
@@ -291,3 +318,991 @@ class TestDomainIdentityHandler(HandlerTestCase):
             event, status="FAILED",
             reason="The 'EnableSend' property must be 'true' or 'false', not 'yes'.",
             physical_resource_id=MOCK_ANY)
+
+    def test_concurrent_mode(self):
+        # In concurrent mode, DKIM and MAIL FROM are requested in parallel,
+        # but only after the identity has been verified.
+        # (Stubber requires a fixed call order, so use a mock SES client here.)
+        event = {
+            "RequestType": "Create",
+            "ResourceProperties": {
+                "Domain": "example.com",
+            },
+            "StackId": self.mock_stack_id}
+        calls = []
+        ses = Mock()
+        ses.verify_domain_identity.side_effect = lambda **kwargs: calls.append("identity") or {
+            'VerificationToken': "ID_TOKEN"}
+        ses.verify_domain_dkim.side_effect = lambda **kwargs: calls.append("dkim") or {
+            'DkimTokens': ["DKIM_TOKEN_1", "DKIM_TOKEN_2"]}
+        ses.set_identity_mail_from_domain.side_effect = lambda **kwargs: calls.append("mail_from") or {}
+        self.mock_boto3_client.return_value = ses
+
+        with patch('aws_cfn_ses_domain.ses_domain_identity.MAX_CONCURRENCY', 4):
+            handle_domain_identity_request(event, self.mock_context)
+
+        self.assertEqual(calls[0], "identity")
+        self.assertCountEqual(calls[1:], ["dkim", "mail_from"])
+        ses.set_identity_mail_from_domain.assert_called_once_with(
+            Identity="example.com", MailFromDomain="mail.example.com")
+        outputs = self.assertSentResponse(
+            event, physical_resource_id="arn:aws:ses:mock-region:111111111111:identity/example.com")
+        self.assertEqual(outputs["VerificationToken"], "ID_TOKEN")
+        self.assertEqual(outputs["DkimTokens"], ["DKIM_TOKEN_1", "DKIM_TOKEN_2"])
+        self.assertEqual(outputs["MailFromDomain"], "mail.example.com")
+        self.assertEqual(len(outputs["Route53RecordSets"]), 6)
+
+    def test_concurrent_mode_error(self):
+        event = {
+            "RequestType": "Create",
+            "ResourceProperties": {
+                "Domain": "example.com",
+            },
+            "StackId": self.mock_stack_id}
+        ses = Mock()
+        ses.verify_domain_identity.return_value = {'VerificationToken': "ID_TOKEN"}
+        ses.verify_domain_dkim.side_effect = ClientError(
+            {"Error": {"Code": "Throttling", "Message": "Rate exceeded"}}, "VerifyDomainDkim")
+        ses.set_identity_mail_from_domain.return_value = {}
+        self.mock_boto3_client.return_value = ses
+
+        rate_limiter = AdaptiveRateLimiter(5, min_rate=0.5, sleep=lambda seconds: None)
+        ses_rate_limiters["mock-region"] = rate_limiter
+        with patch('aws_cfn_ses_domain.ses_domain_identity.MAX_CONCURRENCY', 4), \
+                patch('aws_cfn_ses_domain.calls.random.uniform', return_value=0):  # (no retry backoff)
+            with self.assertLogs(level="ERROR"):
+                handle_domain_identity_request(event, self.mock_context)
+
+        # (throttling is retried, and slows the rate limit, but eventually fails)
+        self.assertEqual(ses.verify_domain_dkim.call_count, 5)
+        self.assertEqual(rate_limiter.throttled, 5)
+        self.assertLess(rate_limiter.rate, 1)
+        self.assertSentResponse(
+            event, status="FAILED",
+            reason="An error occurred (Throttling) when calling the VerifyDomainDkim operation: Rate exceeded",
+            physical_resource_id="arn:aws:ses:mock-region:111111111111:identity/example.com")
+
+
+class TestDomainIdentityHandlerPropertyDiff(HandlerTestCase):
+
+    patch_base = 'aws_cfn_ses_domain.ses_domain_identity'
+
+    def make_update_event(self, old_properties, **properties):
+        return {
+            "RequestType": "Update",
+            "PhysicalResourceId": "arn:aws:ses:mock-region:111111111111:identity/example.com",
+            "ResourceProperties": {"Domain": "example.com", **properties},
+            "OldResourceProperties": {"Domain": "example.com", **old_properties},
+            "StackId": self.mock_stack_id}
+
+    def add_token_responses(self, verification=True, dkim=True):
+        if verification:
+            self.ses_stubber.add_response(
+                'get_identity_verification_attributes',
+                {'VerificationAttributes': {"example.com": {
+                    'VerificationStatus': "Success", 'VerificationToken': "ID_TOKEN"}}},
+                {'Identities': ["example.com"]})
+        if dkim:
+            self.ses_stubber.add_response(
+                'get_identity_dkim_attributes',
+                {'DkimAttributes': {"example.com": {
+                    'DkimEnabled': True, 'DkimVerificationStatus': "Success",
+                    'DkimTokens': ["DKIM_TOKEN_1", "DKIM_TOKEN_2"]}}},
+                {'Identities': ["example.com"]})
+
+    def test_dns_only_change(self):
+        # Changing only TTL and CustomDMARC doesn't modify SES
+        event = self.make_update_event(
+            {"TTL": "1800", "EnableSend": True},
+            TTL="300", EnableSend="true", CustomDMARC='"v=DMARC1; p=reject;"')
+        self.add_token_responses()
+        handle_domain_identity_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=MOCK_ANY)
+        self.assertEqual(outputs["SESCallsAvoided"], 3)
+        self.assertEqual(outputs["VerificationToken"], "ID_TOKEN")
+        self.assertEqual(outputs["DkimTokens"], ["DKIM_TOKEN_1", "DKIM_TOKEN_2"])
+        self.assertEqual(outputs["DMARC"], '"v=DMARC1; p=reject;"')
+        self.assertEqual(len(outputs["Route53RecordSets"]), 6)
+        self.assertTrue(all(record["TTL"] == "300" for record in outputs["Route53RecordSets"]))
+
+    def test_dns_only_change_receive_only(self):
+        event = self.make_update_event(
+            {"EnableSend": "false", "EnableReceive": "true"},
+            EnableSend="false", EnableReceive="true", TTL="300")
+        self.add_token_responses(dkim=False)
+        handle_domain_identity_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=MOCK_ANY)
+        self.assertEqual(outputs["SESCallsAvoided"], 2)
+        self.assertEqual(outputs["VerificationToken"], "ID_TOKEN")
+        self.assertEqual(outputs["ReceiveMX"], "inbound-smtp.mock-region.amazonaws.com")
+
+    def test_mail_from_change(self):
+        event = self.make_update_event({"MailFromSubdomain": "mail"}, MailFromSubdomain="bounce")
+        self.add_token_responses()
+        self.ses_stubber.add_response(
+            'set_identity_mail_from_domain',
+            {},
+            {'Identity': "example.com", 'MailFromDomain': "bounce.example.com"})
+        handle_domain_identity_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=MOCK_ANY)
+        self.assertEqual(outputs["SESCallsAvoided"], 2)
+        self.assertEqual(outputs["MailFromDomain"], "bounce.example.com")
+
+    def test_existing_tokens_missing(self):
+        # If the identity was deleted outside CloudFormation, it's verified again
+        event = self.make_update_event({"TTL": "1800"}, TTL="300", EnableSend="false", EnableReceive="true")
+        event["OldResourceProperties"].update(EnableSend="false", EnableReceive="true")
+        self.ses_stubber.add_response(
+            'get_identity_verification_attributes',
+            {'VerificationAttributes': {}},
+            {'Identities': ["example.com"]})
+        self.ses_stubber.add_response(
+            'verify_domain_identity',
+            {'VerificationToken': "NEW_ID_TOKEN"},
+            {'Domain': "example.com"})
+        handle_domain_identity_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=MOCK_ANY)
+        self.assertEqual(outputs["SESCallsAvoided"], 1)
+        self.assertEqual(outputs["VerificationToken"], "NEW_ID_TOKEN")
+
+    def test_domain_change(self):
+        # A new Domain affects every SES operation
+        event = self.make_update_event({"Domain": "old.example.com."})
+        self.ses_stubber.add_response(
+            'verify_domain_identity',
+            {'VerificationToken': "ID_TOKEN"},
+            {'Domain': "example.com"})
+        self.ses_stubber.add_response(
+            'verify_domain_dkim',
+            {'DkimTokens': ["DKIM_TOKEN_1", "DKIM_TOKEN_2"]},
+            {'Domain': "example.com"})
+        self.ses_stubber.add_response(
+            'set_identity_mail_from_domain',
+            {},
+            {'Identity': "example.com", 'MailFromDomain': "mail.example.com"})
+        handle_domain_identity_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=MOCK_ANY)
+        self.assertNotIn("SESCallsAvoided", outputs)
+
+    def test_normalized_properties_unchanged(self):
+        # Trailing period and string booleans are cleaned before comparing
+        event = self.make_update_event(
+            {"Domain": " example.com. ", "EnableSend": "true", "EnableReceive": "false"},
+            EnableSend=True, EnableReceive=False)
+        self.add_token_responses()
+        handle_domain_identity_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=MOCK_ANY)
+        self.assertEqual(outputs["SESCallsAvoided"], 3)
+
+
+@patch('aws_cfn_ses_domain.route53.INSYNC_POLL_INITIAL', 0)
+class TestDomainIdentityHandlerRoute53(HandlerTestCase):
+
+    patch_base = 'aws_cfn_ses_domain.ses_domain_identity'
+
+    def setUp(self):
+        super().setUp()
+        ses = self.mock_boto3_client.return_value
+        route53 = boto3.session.Session().client('route53', region_name='STUBBED')  # (boto3.client is mocked)
+        self.route53_stubber = Stubber(route53)
+        self.route53_stubber.activate()
+        self.addCleanup(self.route53_stubber.deactivate)
+        self.mock_boto3_client.side_effect = lambda service_name, **kwargs: {
+            'ses': ses, 'route53': route53}[service_name]
+
+    def tearDown(self):
+        super().tearDown()
+        self.route53_stubber.assert_no_pending_responses()
+
+    @staticmethod
+    def record_change(action, name, record_type, value):
+        return {'Action': action, 'ResourceRecordSet': {
+            'Name': name, 'Type': record_type, 'TTL': 1800, 'ResourceRecords': [{'Value': value}]}}
+
+    def test_create(self):
+        event = {
+            "RequestType": "Create",
+            "ResourceProperties": {
+                "Domain": "example.com",
+                "EnableSend": "false",
+                "EnableReceive": "true",
+                "HostedZoneId": "Z123",
+            },
+            "StackId": self.mock_stack_id}
+        self.ses_stubber.add_response(
+            'verify_domain_identity', {'VerificationToken': "ID_TOKEN"}, {'Domain': "example.com"})
+        self.ses_stubber.add_response(
+            'set_identity_mail_from_domain', {}, {'Identity': "example.com", 'MailFromDomain': ""})
+        # All records in one change batch:
+        self.route53_stubber.add_response(
+            'change_resource_record_sets',
+            {'ChangeInfo': {'Id': "/change/C1", 'Status': "PENDING", 'SubmittedAt': "2020-01-01T00:00:00Z"}},
+            {'HostedZoneId': "Z123", 'ChangeBatch': {
+                'Comment': "Amazon SES records for example.com",
+                'Changes': [
+                    # (not owned by this resource yet, so existing records are never replaced)
+                    self.record_change("CREATE", "_amazonses.example.com.", "TXT", '"ID_TOKEN"'),
+                    self.record_change("CREATE", "example.com.", "MX", "10 inbound-smtp.mock-region.amazonaws.com."),
+                ]}})
+        self.route53_stubber.add_response(
+            'get_change',
+            {'ChangeInfo': {'Id': "/change/C1", 'Status': "INSYNC", 'SubmittedAt': "2020-01-01T00:00:00Z"}},
+            {'Id': "/change/C1"})
+        handle_domain_identity_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=MOCK_ANY)
+        self.assertEqual(outputs["Route53ChangeId"], "/change/C1")
+        self.assertIsInstance(outputs["Route53PropagationSeconds"], float)
+        self.assertEqual(len(outputs["Route53RecordSets"]), 2)
+
+    def test_update_deletes_stale_records(self):
+        event = {
+            "RequestType": "Update",
+            "PhysicalResourceId": "arn:aws:ses:mock-region:111111111111:identity/example.com",
+            "ResourceProperties": {
+                "Domain": "example.com",
+                "EnableSend": "false",
+                "EnableReceive": "true",
+                "HostedZoneId": "Z123",
+            },
+            "OldResourceProperties": {
+                "Domain": "example.com",
+                "EnableSend": "true",
+                "EnableReceive": "true",
+                "HostedZoneId": "Z123",
+            },
+            "StackId": self.mock_stack_id}
+        self.ses_stubber.add_response(
+            'get_identity_verification_attributes',
+            {'VerificationAttributes': {"example.com": {
+                'VerificationStatus': "Success", 'VerificationToken': "ID_TOKEN"}}},
+            {'Identities': ["example.com"]})
+        self.ses_stubber.add_response(
+            'set_identity_mail_from_domain', {}, {'Identity': "example.com", 'MailFromDomain': ""})
+        self.route53_stubber.add_response(
+            'change_resource_record_sets',
+            {'ChangeInfo': {'Id': "/change/C2", 'Status': "INSYNC", 'SubmittedAt': "2020-01-01T00:00:00Z"}},
+            {'HostedZoneId': "Z123", 'ChangeBatch': {
+                'Comment': "Amazon SES records for example.com",
+                'Changes': [
+                    # (no longer sending, so the MAIL FROM and DMARC records are stale)
+                    self.record_change("DELETE", "mail.example.com.", "MX",
+                                       "10 feedback-smtp.mock-region.amazonses.com."),
+                    self.record_change("DELETE", "mail.example.com.", "TXT", '"v=spf1 include:amazonses.com -all"'),
+                    self.record_change("DELETE", "_dmarc.example.com.", "TXT",
+                                       '"v=DMARC1; p=none; pct=100; sp=none; aspf=r;"'),
+                    self.record_change("UPSERT", "_amazonses.example.com.", "TXT", '"ID_TOKEN"'),
+                    self.record_change("UPSERT", "example.com.", "MX", "10 inbound-smtp.mock-region.amazonaws.com."),
+                ]}})
+        handle_domain_identity_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=MOCK_ANY)
+        self.assertEqual(outputs["Route53ChangeId"], "/change/C2")
+
+    def test_update_removes_hosted_zone(self):
+        # The records are no longer maintained in Route 53, so they're removed from the old zone
+        event = {
+            "RequestType": "Update",
+            "PhysicalResourceId": "arn:aws:ses:mock-region:111111111111:identity/example.com",
+            "ResourceProperties": {
+                "Domain": "example.com",
+                "EnableSend": "false",
+                "EnableReceive": "true",
+            },
+            "OldResourceProperties": {
+                "Domain": "example.com",
+                "EnableSend": "false",
+                "EnableReceive": "true",
+                "HostedZoneId": "Z123",
+            },
+            "StackId": self.mock_stack_id}
+        self.ses_stubber.add_response(
+            'get_identity_verification_attributes',
+            {'VerificationAttributes': {"example.com": {
+                'VerificationStatus': "Success", 'VerificationToken': "ID_TOKEN"}}},
+            {'Identities': ["example.com"]})
+        self.route53_stubber.add_response(
+            'change_resource_record_sets',
+            {'ChangeInfo': {'Id': "/change/C4", 'Status': "PENDING", 'SubmittedAt': "2020-01-01T00:00:00Z"}},
+            {'HostedZoneId': "Z123", 'ChangeBatch': {
+                'Comment': "Amazon SES records for example.com",
+                'Changes': [
+                    self.record_change("DELETE", "_amazonses.example.com.", "TXT", '"ID_TOKEN"'),
+                    self.record_change("DELETE", "example.com.", "MX", "10 inbound-smtp.mock-region.amazonaws.com."),
+                ]}})
+        handle_domain_identity_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=MOCK_ANY)
+        self.assertEqual(len(outputs["Route53RecordSets"]), 2)
+        self.assertNotIn("Route53ChangeId", outputs)
+
+    def test_delete(self):
+        event = {
+            "RequestType": "Delete",
+            "PhysicalResourceId": "arn:aws:ses:mock-region:111111111111:identity/example.com",
+            "ResourceProperties": {
+                "Domain": "example.com",
+                "EnableSend": "false",
+                "EnableReceive": "true",
+                "HostedZoneId": "Z123",
+            },
+            "StackId": self.mock_stack_id}
+        self.ses_stubber.add_response(
+            'get_identity_verification_attributes',
+            {'VerificationAttributes': {"example.com": {
+                'VerificationStatus': "Success", 'VerificationToken': "ID_TOKEN"}}},
+            {'Identities': ["example.com"]})
+        self.ses_stubber.add_response(
+            'get_identity_dkim_attributes', {'DkimAttributes': {}}, {'Identities': ["example.com"]})
+        self.route53_stubber.add_response(
+            'change_resource_record_sets',
+            {'ChangeInfo': {'Id': "/change/C3", 'Status': "PENDING", 'SubmittedAt': "2020-01-01T00:00:00Z"}},
+            {'HostedZoneId': "Z123", 'ChangeBatch': {
+                'Comment': "Amazon SES records for example.com",
+                'Changes': [
+                    self.record_change("DELETE", "_amazonses.example.com.", "TXT", '"ID_TOKEN"'),
+                    self.record_change("DELETE", "example.com.", "MX", "10 inbound-smtp.mock-region.amazonaws.com."),
+                ]}})
+        self.ses_stubber.add_response('delete_identity', {}, {'Identity': "example.com"})
+        self.ses_stubber.add_response(
+            'set_identity_mail_from_domain', {}, {'Identity': "example.com", 'MailFromDomain': ""})
+        handle_domain_identity_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=MOCK_ANY)
+        self.assertEqual(outputs["Route53RecordSets"], [])
+        self.assertNotIn("Route53ChangeId", outputs)
+
+    def test_existing_records(self):
+        # A domain's existing MX records (e.g., for another mail provider) aren't replaced
+        event = {
+            "RequestType": "Create",
+            "ResourceProperties": {
+                "Domain": "example.com",
+                "EnableSend": "false",
+                "EnableReceive": "true",
+                "HostedZoneId": "Z123",
+            },
+            "StackId": self.mock_stack_id}
+        self.ses_stubber.add_response(
+            'verify_domain_identity', {'VerificationToken': "ID_TOKEN"}, {'Domain': "example.com"})
+        self.ses_stubber.add_response(
+            'set_identity_mail_from_domain', {}, {'Identity': "example.com", 'MailFromDomain': ""})
+        self.route53_stubber.add_client_error(
+            'change_resource_record_sets', "InvalidChangeBatch",
+            "[Tried to create resource record set [name='example.com.', type='MX'] but it already exists]")
+        with self.assertLogs(level="ERROR"):
+            handle_domain_identity_request(event, self.mock_context)
+
+        self.assertSentResponse(
+            event, status="FAILED",
+            reason="Unable to add the DNS records to Route 53 hosted zone Z123 ([Tried to create resource record"
+                   " set [name='example.com.', type='MX'] but it already exists]). Existing records are never"
+                   " replaced: remove them from the zone, or change the properties that require them.",
+            physical_resource_id=MOCK_ANY)
+
+    def test_no_records_required(self):
+        # Nothing to change in Route 53 (and nothing to wait for)
+        event = {
+            "RequestType": "Create",
+            "ResourceProperties": {
+                "Domain": "example.com",
+                "EnableSend": "false",
+                "EnableReceive": "false",
+                "HostedZoneId": "Z123",
+            },
+            "StackId": self.mock_stack_id}
+        self.ses_stubber.add_response('delete_identity', {}, {'Identity': "example.com"})
+        self.ses_stubber.add_response(
+            'set_identity_mail_from_domain', {}, {'Identity': "example.com", 'MailFromDomain': ""})
+        handle_domain_identity_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=MOCK_ANY)
+        self.assertEqual(outputs["Route53RecordSets"], [])
+        self.assertNotIn("Route53ChangeId", outputs)
+
+    def test_stale_records_already_changed(self):
+        # Only stale records to delete, but they no longer match what's in the zone
+        event = {
+            "RequestType": "Update",
+            "PhysicalResourceId": "arn:aws:ses:mock-region:111111111111:identity/example.com",
+            "ResourceProperties": {
+                "Domain": "example.com",
+                "EnableSend": "false",
+                "EnableReceive": "false",
+                "HostedZoneId": "Z123",
+            },
+            "OldResourceProperties": {
+                "Domain": "example.com",
+                "EnableSend": "false",
+                "EnableReceive": "true",
+                "HostedZoneId": "Z123",
+            },
+            "StackId": self.mock_stack_id}
+        self.ses_stubber.add_response('delete_identity', {}, {'Identity': "example.com"})
+        stale_mx = self.record_change("DELETE", "example.com.", "MX", "10 inbound-smtp.mock-region.amazonaws.com.")
+        self.route53_stubber.add_client_error(
+            'change_resource_record_sets', "InvalidChangeBatch", "Tried to delete resource record set but not found",
+            expected_params={'HostedZoneId': "Z123", 'ChangeBatch': {
+                'Comment': "Amazon SES records for example.com", 'Changes': [stale_mx]}})
+        self.route53_stubber.add_client_error(
+            'change_resource_record_sets', "InvalidChangeBatch", "Tried to delete resource record set but not found",
+            expected_params={'HostedZoneId': "Z123", 'ChangeBatch': {
+                'Comment': "Amazon SES records for example.com", 'Changes': [stale_mx]}})
+        with self.assertLogs(level="WARNING"):
+            handle_domain_identity_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=MOCK_ANY)
+        self.assertNotIn("Route53ChangeId", outputs)
+
+    def test_route53_error(self):
+        event = {
+            "RequestType": "Create",
+            "ResourceProperties": {
+                "Domain": "example.com",
+                "EnableSend": "false",
+                "EnableReceive": "true",
+                "HostedZoneId": "Z123",
+            },
+            "StackId": self.mock_stack_id}
+        self.ses_stubber.add_response(
+            'verify_domain_identity', {'VerificationToken': "ID_TOKEN"}, {'Domain': "example.com"})
+        self.ses_stubber.add_response(
+            'set_identity_mail_from_domain', {}, {'Identity': "example.com", 'MailFromDomain': ""})
+        self.route53_stubber.add_client_error(
+            'change_resource_record_sets', "NoSuchHostedZone", "No hosted zone found with ID: Z123")
+        with self.assertLogs(level="ERROR"):
+            handle_domain_identity_request(event, self.mock_context)
+
+        self.assertSentResponse(
+            event, status="FAILED",
+            reason="An error occurred (NoSuchHostedZone) when calling the ChangeResourceRecordSets operation:"
+                   " No hosted zone found with ID: Z123",
+            physical_resource_id=MOCK_ANY)
+
+
+@patch('aws_cfn_ses_domain.ses_domain_identity.RECONCILE', True)
+class TestDomainIdentityHandlerReconcile(HandlerTestCase):
+
+    patch_base = 'aws_cfn_ses_domain.ses_domain_identity'
+
+    def add_state_responses(self, domain, verification=None, dkim=None, mail_from=None):
+        self.ses_stubber.add_response(
+            'get_identity_verification_attributes',
+            {'VerificationAttributes': {domain: verification} if verification else {}},
+            {'Identities': [domain]})
+        self.ses_stubber.add_response(
+            'get_identity_dkim_attributes',
+            {'DkimAttributes': {domain: dkim} if dkim else {}},
+            {'Identities': [domain]})
+        self.ses_stubber.add_response(
+            'get_identity_mail_from_domain_attributes',
+            {'MailFromDomainAttributes': {domain: mail_from} if mail_from else {}},
+            {'Identities': [domain]})
+
+    def test_update_in_sync(self):
+        event = {
+            "RequestType": "Update",
+            "ResourceProperties": {
+                "Domain": "example.com",
+            },
+            "StackId": self.mock_stack_id}
+        self.add_state_responses(
+            "example.com",
+            verification={'VerificationStatus': "Success", 'VerificationToken': "ID_TOKEN"},
+            dkim={'DkimEnabled': True, 'DkimVerificationStatus': "Success",
+                  'DkimTokens': ["DKIM_TOKEN_1", "DKIM_TOKEN_2"]},
+            mail_from={'MailFromDomain': "mail.example.com", 'MailFromDomainStatus': "Success",
+                       'BehaviorOnMXFailure': "UseDefaultValue"})
+        # (no SES updates should occur)
+        handle_domain_identity_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(
+            event, physical_resource_id="arn:aws:ses:mock-region:111111111111:identity/example.com")
+        self.assertEqual(outputs["SESCallsAvoided"], 3)
+        self.assertEqual(outputs["VerificationToken"], "ID_TOKEN")
+        self.assertEqual(outputs["DkimTokens"], ["DKIM_TOKEN_1", "DKIM_TOKEN_2"])
+        self.assertEqual(outputs["MailFromDomain"], "mail.example.com")
+        self.assertEqual(len(outputs["Route53RecordSets"]), 6)
+
+    def test_update_mail_from_changed(self):
+        event = {
+            "RequestType": "Update",
+            "ResourceProperties": {
+                "Domain": "example.com",
+                "MailFromSubdomain": "bounce",
+            },
+            "StackId": self.mock_stack_id}
+        self.add_state_responses(
+            "example.com",
+            verification={'VerificationStatus': "Pending", 'VerificationToken': "ID_TOKEN"},
+            dkim={'DkimEnabled': True, 'DkimVerificationStatus': "Pending",
+                  'DkimTokens': ["DKIM_TOKEN_1", "DKIM_TOKEN_2"]},
+            mail_from={'MailFromDomain': "mail.example.com", 'MailFromDomainStatus': "Success",
+                       'BehaviorOnMXFailure': "UseDefaultValue"})
+        self.ses_stubber.add_response(
+            'set_identity_mail_from_domain',
+            {},
+            {'Identity': "example.com", 'MailFromDomain': "bounce.example.com"})
+        handle_domain_identity_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=MOCK_ANY)
+        self.assertEqual(outputs["SESCallsAvoided"], 2)
+        self.assertEqual(outputs["MailFromDomain"], "bounce.example.com")
+
+    def test_create_new_identity(self):
+        event = {
+            "RequestType": "Create",
+            "ResourceProperties": {
+                "Domain": "example.com",
+                "MailFromSubdomain": "",
+            },
+            "StackId": self.mock_stack_id}
+        self.add_state_responses("example.com")
+        self.ses_stubber.add_response(
+            'verify_domain_identity',
+            {'VerificationToken': "ID_TOKEN"},
+            {'Domain': "example.com"})
+        self.ses_stubber.add_response(
+            'verify_domain_dkim',
+            {'DkimTokens': ["DKIM_TOKEN_1", "DKIM_TOKEN_2"]},
+            {'Domain': "example.com"})
+        # (no set_identity_mail_from_domain: it's already unset)
+        handle_domain_identity_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=MOCK_ANY)
+        self.assertEqual(outputs["SESCallsAvoided"], 1)
+        self.assertEqual(outputs["VerificationToken"], "ID_TOKEN")
+
+    def test_delete_already_deleted(self):
+        event = {
+            "RequestType": "Delete",
+            "PhysicalResourceId": "arn:aws:ses:mock-region:111111111111:identity/example.com",
+            "ResourceProperties": {
+                "Domain": "example.com",
+            },
+            "StackId": self.mock_stack_id}
+        self.add_state_responses("example.com")
+        handle_domain_identity_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=MOCK_ANY)
+        self.assertEqual(outputs["SESCallsAvoided"], 2)
+        self.assertEqual(outputs["Route53RecordSets"], [])
+
+
+@patch('aws_cfn_ses_domain.verification.VERIFICATION_POLL_INITIAL', 0)
+class TestDomainIdentityHandlerWaitForVerification(HandlerTestCase):
+
+    patch_base = 'aws_cfn_ses_domain.ses_domain_identity'
+
+    def setUp(self):
+        super().setUp()
+        self.mock_context = Mock(spec=["invoked_function_arn"],
+                                 invoked_function_arn="arn:aws:lambda:mock-region:111111111111:function:example")
+        ses = self.mock_boto3_client.return_value
+        self.mock_lambda = Mock()
+        self.mock_boto3_client.side_effect = lambda service_name, **kwargs: {
+            'ses': ses, 'lambda': self.mock_lambda}[service_name]
+        self.event = {
+            "RequestType": "Create",
+            "RequestId": "REQ",
+            "ResourceProperties": {
+                "Domain": "example.com",
+                "EnableSend": "false",
+                "EnableReceive": "true",
+                "WaitForVerification": "true",
+            },
+            "StackId": self.mock_stack_id}
+
+    def add_create_responses(self):
+        self.ses_stubber.add_response(
+            'verify_domain_identity', {'VerificationToken': "ID_TOKEN"}, {'Domain': "example.com"})
+        self.ses_stubber.add_response(
+            'set_identity_mail_from_domain', {}, {'Identity': "example.com", 'MailFromDomain': ""})
+
+    def add_status(self, verification):
+        self.ses_stubber.add_response(
+            'get_identity_verification_attributes',
+            {'VerificationAttributes': {"example.com": {'VerificationStatus': verification}}},
+            {'Identities': ["example.com"]})
+        self.ses_stubber.add_response(
+            'get_identity_dkim_attributes',
+            {'DkimAttributes': {"example.com": {'DkimEnabled': False, 'DkimVerificationStatus': "NotStarted"}}},
+            {'Identities': ["example.com"]})
+
+    def test_waits_for_verification(self):
+        self.add_create_responses()
+        self.add_status("Pending")
+        self.add_status("Success")
+        handle_domain_identity_request(self.event, self.mock_context)
+
+        outputs = self.assertSentResponse(self.event, physical_resource_id=MOCK_ANY)
+        self.assertEqual(outputs["VerificationToken"], "ID_TOKEN")
+        self.mock_lambda.invoke.assert_not_called()
+
+    def test_continues_in_new_invocation(self):
+        self.add_create_responses()
+        with patch(f'{self.patch_base}.wait_for_verification', return_value=False):
+            handle_domain_identity_request(self.event, self.mock_context)
+        self.mock_send.assert_not_called()
+        self.mock_lambda.invoke.assert_called_once()
+        continued_event = json.loads(self.mock_lambda.invoke.call_args[1]["Payload"])
+        checkpoint = continued_event[CONTINUATION_FIELD]
+        self.assertEqual(checkpoint["Invocations"], 2)
+        self.assertEqual(checkpoint["Outputs"]["VerificationToken"], "ID_TOKEN")
+
+        # The continuation just resumes waiting (without repeating the SES updates)
+        self.add_status("Success")
+        handle_domain_identity_request(continued_event, self.mock_context)
+        outputs = self.assertSentResponse(continued_event, physical_resource_id=MOCK_ANY)
+        self.assertEqual(outputs, checkpoint["Outputs"])
+
+    def test_timeout(self):
+        self.event["ResourceProperties"]["VerificationTimeout"] = "60"
+        self.event[CONTINUATION_FIELD] = {"Outputs": {}, "Started": time.time() - 60, "Invocations": 5}
+        self.add_status("Pending")
+        handle_domain_identity_request(self.event, self.mock_context)
+        self.assertSentResponse(
+            self.event, status="FAILED",
+            reason="Timed out waiting for Amazon SES to verify example.com (domain verification Pending)",
+            physical_resource_id=MOCK_ANY)
+
+    def test_verification_failed(self):
+        self.add_create_responses()
+        self.add_status("Failed")
+        handle_domain_identity_request(self.event, self.mock_context)
+        self.assertSentResponse(
+            self.event, status="FAILED",
+            reason="Domain verification status is Failed (check the DNS records)",
+            physical_resource_id=MOCK_ANY)
+
+    def test_invalid_timeout(self):
+        self.event["ResourceProperties"]["VerificationTimeout"] = "soon"
+        handle_domain_identity_request(self.event, self.mock_context)
+        self.assertSentResponse(
+            self.event, status="FAILED",
+            reason="The 'VerificationTimeout' property must be a positive number of seconds, not 'soon'.",
+            physical_resource_id=MOCK_ANY)
+
+
+class TestDomainIdentityHandlerMultiRegion(HandlerTestCase):
+
+    patch_base = 'aws_cfn_ses_domain.ses_domain_identity'
+
+    def setUp(self):
+        super().setUp()
+        self.clients = {}
+        self.stubbers = {}
+        for region in ("us-east-1", "eu-west-1"):
+            client = boto3.session.Session().client('ses', region_name=region)  # (boto3.client is mocked)
+            self.clients[region] = client
+            self.stubbers[region] = Stubber(client)
+            self.stubbers[region].activate()
+            self.addCleanup(self.stubbers[region].deactivate)
+        self.mock_boto3_client.side_effect = lambda service_name, region_name, **kwargs: self.clients[region_name]
+        self.physical_id = "arn:aws:ses:us-east-1:111111111111:identity/example.com"
+
+    def tearDown(self):
+        super().tearDown()
+        for stubber in self.stubbers.values():
+            stubber.assert_no_pending_responses()
+
+    def add_create_responses(self, region):
+        stubber = self.stubbers[region]
+        stubber.add_response(
+            'verify_domain_identity', {'VerificationToken': f"ID_{region}"}, {'Domain': "example.com"})
+        stubber.add_response(
+            'verify_domain_dkim', {'DkimTokens': [f"DKIM_{region}"]}, {'Domain': "example.com"})
+        stubber.add_response(
+            'set_identity_mail_from_domain', {},
+            {'Identity': "example.com", 'MailFromDomain': "mail.example.com"})
+
+    def test_create(self):
+        event = {
+            "RequestType": "Create",
+            "ResourceProperties": {
+                "Domain": "example.com",
+                "EnableReceive": "true",
+                "Regions": ["us-east-1", "eu-west-1"],
+            },
+            "StackId": self.mock_stack_id}
+        self.add_create_responses("us-east-1")
+        self.add_create_responses("eu-west-1")
+        handle_domain_identity_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=self.physical_id)
+        self.assertEqual(outputs["Arns"], [
+            "arn:aws:ses:us-east-1:111111111111:identity/example.com",
+            "arn:aws:ses:eu-west-1:111111111111:identity/example.com"])
+        self.assertEqual(outputs["Regions"], ["us-east-1", "eu-west-1"])
+        self.assertCountEqual(outputs["Route53RecordSets"], [
+            {'Type': 'TXT', 'Name': '_amazonses.example.com.', 'TTL': '1800',
+             'ResourceRecords': ['"ID_us-east-1"', '"ID_eu-west-1"']},
+            {'Type': 'CNAME', 'Name': 'DKIM_us-east-1._domainkey.example.com.', 'TTL': '1800',
+             'ResourceRecords': ['DKIM_us-east-1.dkim.amazonses.com.']},
+            {'Type': 'CNAME', 'Name': 'DKIM_eu-west-1._domainkey.example.com.', 'TTL': '1800',
+             'ResourceRecords': ['DKIM_eu-west-1.dkim.amazonses.com.']},
+            {'Type': 'MX', 'Name': 'mail.example.com.', 'TTL': '1800',
+             'ResourceRecords': ['10 feedback-smtp.us-east-1.amazonses.com.',
+                                 '10 feedback-smtp.eu-west-1.amazonses.com.']},
+            {'Type': 'TXT', 'Name': 'mail.example.com.', 'TTL': '1800',
+             'ResourceRecords': ['"v=spf1 include:amazonses.com -all"']},
+            {'Type': 'TXT', 'Name': '_dmarc.example.com.', 'TTL': '1800',
+             'ResourceRecords': ['"v=DMARC1; p=none; pct=100; sp=none; aspf=r;"']},
+            {'Type': 'MX', 'Name': 'example.com.', 'TTL': '1800',
+             'ResourceRecords': ['10 inbound-smtp.us-east-1.amazonaws.com.',
+                                 '10 inbound-smtp.eu-west-1.amazonaws.com.']},
+        ])
+
+    def test_update_removes_region(self):
+        event = {
+            "RequestType": "Update",
+            "PhysicalResourceId": self.physical_id,
+            "ResourceProperties": {
+                "Domain": "example.com",
+                "Regions": ["eu-west-1"],
+            },
+            "OldResourceProperties": {
+                "Domain": "example.com",
+                "Regions": ["us-east-1", "eu-west-1"],
+            },
+            "StackId": self.mock_stack_id}
+        # Unchanged region just reads its existing tokens:
+        self.stubbers["eu-west-1"].add_response(
+            'get_identity_verification_attributes',
+            {'VerificationAttributes': {"example.com": {
+                'VerificationStatus': "Success", 'VerificationToken': "ID_eu-west-1"}}},
+            {'Identities': ["example.com"]})
+        self.stubbers["eu-west-1"].add_response(
+            'get_identity_dkim_attributes',
+            {'DkimAttributes': {"example.com": {
+                'DkimEnabled': True, 'DkimVerificationStatus': "Success", 'DkimTokens': ["DKIM_eu-west-1"]}}},
+            {'Identities': ["example.com"]})
+        # Removed region is deprovisioned:
+        self.stubbers["us-east-1"].add_response(
+            'delete_identity', {}, {'Identity': "example.com"})
+        self.stubbers["us-east-1"].add_response(
+            'set_identity_mail_from_domain', {}, {'Identity': "example.com", 'MailFromDomain': ""})
+        handle_domain_identity_request(event, self.mock_context)
+
+        # (PhysicalResourceId moves to a region still in use; see test_regions_to_region_then_delete)
+        eu_physical_id = "arn:aws:ses:eu-west-1:111111111111:identity/example.com"
+        outputs = self.assertSentResponse(event, physical_resource_id=eu_physical_id)
+        self.assertEqual(outputs["Arns"], [eu_physical_id])
+        self.assertEqual(outputs["SESCallsAvoided"], 3)
+        self.assertEqual(len(outputs["Route53RecordSets"]), 5)
+
+    def test_delete(self):
+        event = {
+            "RequestType": "Delete",
+            "PhysicalResourceId": self.physical_id,
+            "ResourceProperties": {
+                "Domain": "example.com",
+                "Regions": ["us-east-1", "eu-west-1"],
+            },
+            "StackId": self.mock_stack_id}
+        for stubber in self.stubbers.values():
+            stubber.add_response('delete_identity', {}, {'Identity': "example.com"})
+            stubber.add_response(
+                'set_identity_mail_from_domain', {}, {'Identity': "example.com", 'MailFromDomain': ""})
+        handle_domain_identity_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=self.physical_id)
+        self.assertEqual(outputs["Route53RecordSets"], [])
+
+    def test_update_keeps_listed_physical_id(self):
+        # The PhysicalResourceId doesn't change while its region is still listed
+        # (even if it's no longer first), so CloudFormation won't delete the resource
+        event = {
+            "RequestType": "Update",
+            "PhysicalResourceId": self.physical_id,
+            "ResourceProperties": {
+                "Domain": "example.com",
+                "Regions": ["eu-west-1", "us-east-1"],
+            },
+            "OldResourceProperties": {
+                "Domain": "example.com",
+                "Regions": ["us-east-1", "eu-west-1"],
+            },
+            "StackId": self.mock_stack_id}
+        for region, stubber in self.stubbers.items():
+            stubber.add_response(
+                'get_identity_verification_attributes',
+                {'VerificationAttributes': {"example.com": {
+                    'VerificationStatus': "Success", 'VerificationToken': f"ID_{region}"}}},
+                {'Identities': ["example.com"]})
+            stubber.add_response(
+                'get_identity_dkim_attributes',
+                {'DkimAttributes': {"example.com": {
+                    'DkimEnabled': True, 'DkimVerificationStatus': "Success", 'DkimTokens': [f"DKIM_{region}"]}}},
+                {'Identities': ["example.com"]})
+        handle_domain_identity_request(event, self.mock_context)
+
+        self.assertSentResponse(event, physical_resource_id=self.physical_id)
+
+    def test_regions_to_region_then_delete(self):
+        eu_physical_id = "arn:aws:ses:eu-west-1:111111111111:identity/example.com"
+        self.stubbers["eu-west-1"].add_response(
+            'get_identity_verification_attributes',
+            {'VerificationAttributes': {"example.com": {
+                'VerificationStatus': "Success", 'VerificationToken': "ID_eu-west-1"}}},
+            {'Identities': ["example.com"]})
+        self.stubbers["eu-west-1"].add_response(
+            'get_identity_dkim_attributes',
+            {'DkimAttributes': {"example.com": {
+                'DkimEnabled': True, 'DkimVerificationStatus': "Success", 'DkimTokens': ["DKIM_eu-west-1"]}}},
+            {'Identities': ["example.com"]})
+        self.stubbers["us-east-1"].add_response(
+            'delete_identity', {}, {'Identity': "example.com"})
+        self.stubbers["us-east-1"].add_response(
+            'set_identity_mail_from_domain', {}, {'Identity': "example.com", 'MailFromDomain': ""})
+
+        # Dropping Regions (for a single Region that isn't the PhysicalResourceId's)
+        # moves the PhysicalResourceId to the remaining region...
+        event = {
+            "RequestType": "Update",
+            "PhysicalResourceId": self.physical_id,
+            "ResourceProperties": {"Domain": "example.com", "Region": "eu-west-1"},
+            "OldResourceProperties": {"Domain": "example.com", "Regions": ["us-east-1", "eu-west-1"]},
+            "StackId": self.mock_stack_id}
+        handle_domain_identity_request(event, self.mock_context)
+        self.assertSentResponse(event, physical_resource_id=eu_physical_id)
+
+        # ... where the single-region path agrees on it for later Updates...
+        self.mock_send.reset_mock()
+        self.stubbers["eu-west-1"].add_response(
+            'get_identity_verification_attributes',
+            {'VerificationAttributes': {"example.com": {
+                'VerificationStatus': "Success", 'VerificationToken': "ID_eu-west-1"}}},
+            {'Identities': ["example.com"]})
+        event = {
+            "RequestType": "Update",
+            "PhysicalResourceId": eu_physical_id,
+            "ResourceProperties": {"Domain": "example.com", "Region": "eu-west-1", "EnableSend": "false",
+                                   "EnableReceive": "true"},
+            "OldResourceProperties": {"Domain": "example.com", "Region": "eu-west-1", "EnableSend": "false",
+                                      "EnableReceive": "true"},
+            "StackId": self.mock_stack_id}
+        handle_domain_identity_request(event, self.mock_context)
+        self.assertSentResponse(event, physical_resource_id=eu_physical_id)
+
+        # ... and the cleanup Delete CloudFormation issues for the old id leaves the live identity alone
+        self.mock_send.reset_mock()
+        event = {
+            "RequestType": "Delete",
+            "PhysicalResourceId": self.physical_id,
+            "ResourceProperties": {"Domain": "example.com", "Region": "eu-west-1", "EnableSend": "false",
+                                   "EnableReceive": "true"},
+            "StackId": self.mock_stack_id}
+        handle_domain_identity_request(event, self.mock_context)  # (no SES calls stubbed)
+        outputs = self.assertSentResponse(event, physical_resource_id=self.physical_id)
+        self.assertEqual(outputs, {"Domain": "example.com"})
+
+    def test_region_error(self):
+        event = {
+            "RequestType": "Create",
+            "ResourceProperties": {
+                "Domain": "example.com",
+                "Regions": ["us-east-1", "eu-west-1"],
+            },
+            "StackId": self.mock_stack_id}
+        self.add_create_responses("us-east-1")
+        self.stubbers["eu-west-1"].add_client_error('verify_domain_identity', "InvalidParameterValue", "Invalid domain")
+        with self.assertLogs(level="ERROR"):
+            handle_domain_identity_request(event, self.mock_context)
+
+        self.assertSentResponse(
+            event, status="FAILED",
+            reason="Error updating SES in 1 of 2 regions: eu-west-1: An error occurred (InvalidParameterValue)"
+                   " when calling the VerifyDomainIdentity operation: Invalid domain",
+            physical_resource_id=self.physical_id)
+
+    def test_invalid_regions(self):
+        for regions, reason in [
+            ("us-east-1", "The 'Regions' property must be a list of AWS Region names."),
+            (["us-east-1", "us-east-1"], "The 'Regions' property lists a region more than once."),
+        ]:
+            with self.subTest(regions=regions):
+                self.mock_send.reset_mock()
+                event = {
+                    "RequestType": "Create",
+                    "ResourceProperties": {"Domain": "example.com", "Regions": regions},
+                    "StackId": self.mock_stack_id}
+                handle_domain_identity_request(event, self.mock_context)
+                self.assertSentResponse(event, status="FAILED", reason=reason, physical_resource_id=MOCK_ANY)
+
+    def test_not_with_hosted_zone(self):
+        event = {
+            "RequestType": "Create",
+            "ResourceProperties": {"Domain": "example.com", "Regions": ["us-east-1"], "HostedZoneId": "Z123"},
+            "StackId": self.mock_stack_id}
+        handle_domain_identity_request(event, self.mock_context)
+        self.assertSentResponse(
+            event, status="FAILED",
+            reason="The 'Regions' property can't be combined with 'HostedZoneId' or 'WaitForVerification'.",
+            physical_resource_id=MOCK_ANY)
+
+
+class TestDomainIdentityHandlerSESv2(HandlerTestCase):
+
+    patch_base = 'aws_cfn_ses_domain.ses_domain_identity'
+
+    def setUp(self):
+        super().setUp()
+        sesv2 = boto3.session.Session().client('sesv2', region_name='STUBBED')  # (boto3.client is mocked)
+        self.sesv2_stubber = Stubber(sesv2)
+        self.sesv2_stubber.activate()
+        self.addCleanup(self.sesv2_stubber.deactivate)
+        self.mock_boto3_client.side_effect = lambda service_name, **kwargs: {'sesv2': sesv2}[service_name]
+
+    def tearDown(self):
+        super().tearDown()
+        self.sesv2_stubber.assert_no_pending_responses()
+
+    def test_create_receive_only(self):
+        event = {
+            "RequestType": "Create",
+            "ResourceProperties": {
+                "Domain": "example.com",
+                "EnableSend": "false",
+                "EnableReceive": "true",
+                "SESBackend": "sesv2",
+            },
+            "StackId": self.mock_stack_id}
+        self.sesv2_stubber.add_response(
+            'create_email_identity',
+            {'DkimAttributes': {'Tokens': ["DKIM_TOKEN_1"]}}, {'EmailIdentity': "example.com"})
+        self.sesv2_stubber.add_response(
+            'put_email_identity_mail_from_attributes', {}, {'EmailIdentity': "example.com"})
+        handle_domain_identity_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(
+            event, physical_resource_id="arn:aws:ses:mock-region:111111111111:identity/example.com")
+        # SESv2 verifies the domain with its DKIM records (and has no verification TXT record):
+        self.assertCountEqual(outputs["Route53RecordSets"], [
+            {'Type': 'CNAME', 'Name': 'DKIM_TOKEN_1._domainkey.example.com.', 'TTL': '1800',
+             'ResourceRecords': ['DKIM_TOKEN_1.dkim.amazonses.com.']},
+            {'Type': 'MX', 'Name': 'example.com.', 'TTL': '1800',
+             'ResourceRecords': ['10 inbound-smtp.mock-region.amazonaws.com.']},
+        ])
+
+    def test_invalid_backend_properties(self):
+        for properties, reason in [
+            ({"SESBackend": "v3"}, "The 'SESBackend' property must be one of 'ses', 'sesv2', not 'v3'."),
+            ({"DkimKeyLength": "2048"}, "The 'DkimKeyLength' property requires the 'sesv2' SESBackend."),
+            ({"SESBackend": "sesv2", "DkimKeyLength": 4096},
+             "The 'DkimKeyLength' property must be one of '1024', '2048', not '4096'."),
+        ]:
+            with self.subTest(properties=properties):
+                self.mock_send.reset_mock()
+                event = {
+                    "RequestType": "Create",
+                    "ResourceProperties": {"Domain": "example.com", **properties},
+                    "StackId": self.mock_stack_id}
+                handle_domain_identity_request(event, self.mock_context)
+                self.assertSentResponse(event, status="FAILED", reason=reason, physical_resource_id=MOCK_ANY)
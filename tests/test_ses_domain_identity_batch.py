@@ -0,0 +1,304 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from .base import HandlerTestCase, MOCK_ANY
+
+from aws_cfn_ses_domain.dns import expand_records, plan_records
+from aws_cfn_ses_domain.ses_domain_identity_batch import (
+    handle_domain_identity_batch_request, limit_response_data)
+
+
+class TestDomainIdentityBatchHandler(HandlerTestCase):
+
+    patch_base = 'aws_cfn_ses_domain.ses_domain_identity_batch'
+
+    def setUp(self):
+        super().setUp()
+        self.physical_id = f"{self.mock_stack_id}/MySESDomains"
+
+    def make_event(self, request_type="Create", **properties):
+        # (MaxConcurrency 1 keeps the SES calls in the order Stubber expects)
+        properties.setdefault("MaxConcurrency", "1")
+        properties.setdefault("RateLimit", "1000")
+        return {
+            "RequestType": request_type,
+            "ResourceProperties": properties,
+            "StackId": self.mock_stack_id,
+            "LogicalResourceId": "MySESDomains",
+        }
+
+    def add_provision_responses(self, domain, mail_from_domain=None, dkim=True):
+        self.ses_stubber.add_response(
+            'verify_domain_identity',
+            {'VerificationToken': f"ID_TOKEN_{domain}"},
+            {'Domain': domain})
+        if dkim:
+            self.ses_stubber.add_response(
+                'verify_domain_dkim',
+                {'DkimTokens': [f"DKIM_TOKEN_{domain}"]},
+                {'Domain': domain})
+        self.ses_stubber.add_response(
+            'set_identity_mail_from_domain',
+            {},
+            {'Identity': domain, 'MailFromDomain': mail_from_domain or f"mail.{domain}"})
+
+    def add_deprovision_responses(self, domain):
+        self.ses_stubber.add_response('delete_identity', {}, {'Identity': domain})
+        self.ses_stubber.add_response(
+            'set_identity_mail_from_domain', {}, {'Identity': domain, 'MailFromDomain': ""})
+
+    def test_domains_required(self):
+        event = self.make_event()
+        handle_domain_identity_batch_request(event, self.mock_context)
+        self.assertSentResponse(
+            event, status="FAILED",
+            reason="The 'Domains' property must be a non-empty list.",
+            physical_resource_id=self.physical_id)
+
+    def test_conflicting_dmarc(self):
+        event = self.make_event(Domains=[
+            "example.com",
+            {"Domain": "example.com", "Region": "us-test-2", "CustomDMARC": '"v=DMARC1; p=reject;"'},
+        ])
+        handle_domain_identity_batch_request(event, self.mock_context)
+        self.assertSentResponse(
+            event, status="FAILED",
+            reason="Domain 'example.com' has conflicting 'CustomDMARC' values.",
+            physical_resource_id=self.physical_id)
+
+    def test_create(self):
+        event = self.make_event(
+            Domains=[
+                "example.com.",
+                {"Domain": "example.org", "EnableSend": "false", "EnableReceive": "true"},
+            ],
+            TTL="300")
+        self.add_provision_responses("example.com")
+        self.ses_stubber.add_response(
+            'verify_domain_identity', {'VerificationToken': "ID_TOKEN_example.org"}, {'Domain': "example.org"})
+        self.ses_stubber.add_response(
+            'set_identity_mail_from_domain', {}, {'Identity': "example.org", 'MailFromDomain': ""})
+        handle_domain_identity_batch_request(event, self.mock_context)
+
+        self.mock_boto3_client.assert_called_once_with('ses', region_name="mock-region", config=MOCK_ANY)
+        outputs = self.assertSentResponse(event, physical_resource_id=self.physical_id)
+        self.assertEqual(outputs["Domains"], ["example.com", "example.org"])
+        self.assertEqual(outputs["Arns"], [
+            "arn:aws:ses:mock-region:111111111111:identity/example.com",
+            "arn:aws:ses:mock-region:111111111111:identity/example.org",
+        ])
+        self.assertEqual(outputs["ArnPrefix"], "arn:aws:ses:mock-region:111111111111:identity/")
+        self.assertCountEqual(outputs["Route53RecordSets"], [
+            {'Type': 'TXT', 'Name': '_amazonses.example.com.', 'TTL': '300',
+             'ResourceRecords': ['"ID_TOKEN_example.com"']},
+            {'Type': 'CNAME', 'Name': 'DKIM_TOKEN_example.com._domainkey.example.com.', 'TTL': '300',
+             'ResourceRecords': ['DKIM_TOKEN_example.com.dkim.amazonses.com.']},
+            {'Type': 'MX', 'Name': 'mail.example.com.', 'TTL': '300',
+             'ResourceRecords': ['10 feedback-smtp.mock-region.amazonses.com.']},
+            {'Type': 'TXT', 'Name': 'mail.example.com.', 'TTL': '300',
+             'ResourceRecords': ['"v=spf1 include:amazonses.com -all"']},
+            {'Type': 'TXT', 'Name': '_dmarc.example.com.', 'TTL': '300',
+             'ResourceRecords': ['"v=DMARC1; p=none; pct=100; sp=none; aspf=r;"']},
+            {'Type': 'TXT', 'Name': '_amazonses.example.org.', 'TTL': '300',
+             'ResourceRecords': ['"ID_TOKEN_example.org"']},
+            {'Type': 'MX', 'Name': 'example.org.', 'TTL': '300',
+             'ResourceRecords': ['10 inbound-smtp.mock-region.amazonaws.com.']},
+        ])
+        self.assertEqual(len(outputs["ZoneFileEntries"]), 7)
+        self.assertNotIn("OmittedAttributes", outputs)
+
+    def test_mixed_regions(self):
+        event = self.make_event(Domains=["example.com", {"Domain": "example.org", "Region": "us-test-2"}])
+        self.add_provision_responses("example.com")
+        self.add_provision_responses("example.org")
+        handle_domain_identity_batch_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=self.physical_id)
+        self.assertEqual(outputs["Arns"], [
+            "arn:aws:ses:mock-region:111111111111:identity/example.com",
+            "arn:aws:ses:us-test-2:111111111111:identity/example.org",
+        ])
+        self.assertNotIn("ArnPrefix", outputs)  # (no single prefix applies)
+
+    def test_update_removes_domains(self):
+        event = self.make_event(
+            "Update", Domains=["example.com"])
+        event["PhysicalResourceId"] = self.physical_id
+        event["OldResourceProperties"] = {"Domains": ["example.com", "example.net"]}
+        self.add_provision_responses("example.com")
+        self.add_deprovision_responses("example.net")
+        handle_domain_identity_batch_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=self.physical_id)
+        self.assertEqual(outputs["Domains"], ["example.com"])
+
+    def test_update_invalid_old_properties(self):
+        # Domains removed from an (invalid) old list are still deprovisioned, if they can be read
+        event = self.make_event(
+            "Update", Domains=["example.com"])
+        event["PhysicalResourceId"] = self.physical_id
+        event["OldResourceProperties"] = {
+            "Domains": ["example.com", "example.net", {"Domain": "example.org", "Bad": 1}]}
+        self.add_provision_responses("example.com")
+        self.add_deprovision_responses("example.net")
+        with self.assertLogs(level="WARNING"):
+            handle_domain_identity_batch_request(event, self.mock_context)
+
+        self.assertSentResponse(
+            event, physical_resource_id=self.physical_id,
+            reason="Unable to read 1 of the old 'Domains' entries, so any of them removed from the list"
+                   " are still in Amazon SES: {'Domain': 'example.org', 'Bad': 1}")
+
+    def test_large_batch(self):
+        # The DNS attributes for a large batch are replaced by the compact RecordIndex;
+        # only if that still doesn't fit is it left out, with a Reason saying so
+        for count, omitted in [(12, False), (80, True)]:
+            with self.subTest(count=count):
+                self.mock_send.reset_mock()
+                domains = [f"example{n}.com" for n in range(count)]
+                event = self.make_event(Domains=domains)
+                for domain in domains:
+                    self.add_provision_responses(domain)
+                with self.assertLogs(level="INFO"):
+                    handle_domain_identity_batch_request(event, self.mock_context)
+
+                if omitted:
+                    outputs = self.assertSentResponse(
+                        event, physical_resource_id=self.physical_id,
+                        reason="Omitted RecordIndex to fit CloudFormation's response size limit"
+                               " (the complete values are in the function's logs).")
+                    self.assertEqual(outputs["OmittedAttributes"], ["RecordIndex"])
+                else:
+                    outputs = self.assertSentResponse(event, physical_resource_id=self.physical_id)
+                    self.assertEqual(len(expand_records(outputs["Domains"], outputs["RecordIndex"])), count * 5)
+                self.assertEqual(outputs["Domains"], domains)
+                self.assertEqual(outputs["ArnPrefix"], "arn:aws:ses:mock-region:111111111111:identity/")
+                self.assertNotIn("Route53RecordSets", outputs)
+                self.assertNotIn("ZoneFileEntries", outputs)
+                self.assertNotIn("Arns", outputs)
+
+    def test_delete(self):
+        event = self.make_event("Delete", Domains=["example.com", "example.net"])
+        event["PhysicalResourceId"] = self.physical_id
+        self.add_deprovision_responses("example.com")
+        self.add_deprovision_responses("example.net")
+        handle_domain_identity_batch_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=self.physical_id)
+        self.assertEqual(outputs["Domains"], [])
+        self.assertEqual(outputs["Route53RecordSets"], [])
+
+    def test_partial_failure(self):
+        event = self.make_event(Domains=["example.com", "bad domain"], EnableSend="false", EnableReceive="true")
+        self.ses_stubber.add_response(
+            'verify_domain_identity', {'VerificationToken': "ID_TOKEN"}, {'Domain': "example.com"})
+        self.ses_stubber.add_response(
+            'set_identity_mail_from_domain', {}, {'Identity': "example.com", 'MailFromDomain': ""})
+        self.ses_stubber.add_client_error(
+            'verify_domain_identity', "InvalidParameterValue", "Invalid domain name bad domain.",
+            expected_params={'Domain': "bad domain"})
+        with self.assertLogs(level="ERROR"):
+            handle_domain_identity_batch_request(event, self.mock_context)
+
+        self.assertSentResponse(
+            event, status="FAILED",
+            reason="Error updating SES for 1 of 2 domains: bad domain: An error occurred (InvalidParameterValue)"
+                   " when calling the VerifyDomainIdentity operation: Invalid domain name bad domain.",
+            physical_resource_id=self.physical_id)
+
+    def test_invalid_domain_override(self):
+        event = self.make_event(Domains=[{"Domain": "example.com", "EnableSend": "yes"}])
+        handle_domain_identity_batch_request(event, self.mock_context)
+        self.assertSentResponse(
+            event, status="FAILED",
+            reason="The 'EnableSend' property must be 'true' or 'false', not 'yes'.",
+            physical_resource_id=MOCK_ANY)
+
+    def test_duplicate_domain(self):
+        event = self.make_event(Domains=["example.com", "example.com."])
+        handle_domain_identity_batch_request(event, self.mock_context)
+        self.assertSentResponse(
+            event, status="FAILED",
+            reason="Domain 'example.com' is listed more than once.",
+            physical_resource_id=MOCK_ANY)
+
+    @patch('aws_cfn_ses_domain.ses_domain_identity_batch.RECONCILE', True)
+    def test_reconcile(self):
+        event = self.make_event(Domains=["example.com", "example.net"], MailFromSubdomain="")
+        # One batch of reads covers both domains:
+        identities = ["example.com", "example.net"]
+        self.ses_stubber.add_response(
+            'get_identity_verification_attributes',
+            {'VerificationAttributes': {
+                "example.com": {'VerificationStatus': "Success", 'VerificationToken': "ID_TOKEN_example.com"}}},
+            {'Identities': identities})
+        self.ses_stubber.add_response(
+            'get_identity_dkim_attributes',
+            {'DkimAttributes': {
+                "example.com": {'DkimEnabled': True, 'DkimVerificationStatus': "Success",
+                                'DkimTokens': ["DKIM_TOKEN_example.com"]}}},
+            {'Identities': identities})
+        self.ses_stubber.add_response(
+            'get_identity_mail_from_domain_attributes',
+            {'MailFromDomainAttributes': {}},
+            {'Identities': identities})
+        # example.com is already in sync; example.net is new:
+        self.ses_stubber.add_response(
+            'verify_domain_identity', {'VerificationToken': "ID_TOKEN_example.net"}, {'Domain': "example.net"})
+        self.ses_stubber.add_response(
+            'verify_domain_dkim', {'DkimTokens': ["DKIM_TOKEN_example.net"]}, {'Domain': "example.net"})
+        handle_domain_identity_batch_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=self.physical_id)
+        self.assertEqual(outputs["SESCallsAvoided"], 4)
+        self.assertEqual(len(outputs["Route53RecordSets"]), 6)
+
+
+class TestLimitResponseData(TestCase):
+
+    def test_small_outputs_unchanged(self):
+        outputs = {"Domains": ["example.com"], "ZoneFileEntries": ["x"]}
+        self.assertEqual(limit_response_data(outputs, limit=1000), outputs)
+
+    def test_compacts_dns_outputs(self):
+        domain_properties = [
+            {"Domain": domain, "TTL": "1800", "VerificationToken": f"ID_{domain}", "DkimTokens": [f"DKIM_{domain}"],
+             "MailFromDomain": f"mail.{domain}", "MailFromMX": "feedback-smtp.mock-region.amazonses.com"}
+            for domain in ("example.com", "example.org")]
+        route53_records = plan_records(domain_properties)
+        outputs = {
+            "ArnPrefix": "arn:aws:ses:mock-region:111111111111:identity/",
+            "Arns": ["arn:aws:ses:mock-region:111111111111:identity/example.com",
+                     "arn:aws:ses:mock-region:111111111111:identity/example.org"],
+            "Domains": ["example.com", "example.org"],
+            "Route53RecordSets": route53_records,
+            "ZoneFileEntries": ["x" * 200],
+        }
+        limited = limit_response_data(outputs, domain_properties, limit=500)
+        self.assertEqual(limited, {
+            "ArnPrefix": "arn:aws:ses:mock-region:111111111111:identity/",
+            "Domains": ["example.com", "example.org"],
+            "RecordIndex": {
+                "Values": ["1800", "mail", "feedback-smtp.mock-region.amazonses.com"],
+                "Domains": [["ID_example.com", ["DKIM_example.com"], 0, 1, 2, None, None, None],
+                            ["ID_example.org", ["DKIM_example.org"], 0, 1, 2, None, None, None]],
+            },
+        })
+        self.assertEqual(expand_records(limited["Domains"], limited["RecordIndex"]), route53_records)
+
+    def test_omits_optional_outputs_in_order(self):
+        # (Only when even the compact outputs don't fit)
+        outputs = {
+            "Arns": ["arn:aws:ses:mock-region:111111111111:identity/example.com",
+                     "arn:aws:ses:us-test-2:111111111111:identity/example.com"],
+            "Domains": ["example.com", "example.com"],
+            "Route53RecordSets": [{"Name": "x" * 100}],
+            "ZoneFileEntries": ["x" * 100],
+        }
+        domain_properties = [{"Domain": "example.com", "TTL": "1800", "VerificationToken": "x" * 40}] * 2
+        with self.assertLogs(level="WARNING"):
+            limited = limit_response_data(outputs, domain_properties, limit=200)
+        self.assertEqual(limited, {
+            "Domains": ["example.com", "example.com"],
+            "OmittedAttributes": ["RecordIndex", "Arns"],
+        })
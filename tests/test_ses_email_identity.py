@@ -1,5 +1,11 @@
+from unittest.mock import patch
+
+import boto3
+from botocore.stub import Stubber
+
 from .base import HandlerTestCase, MOCK_ANY
 
+from aws_cfn_ses_domain.ratelimit import AdaptiveRateLimiter, ses_rate_limiters
 from aws_cfn_ses_domain.ses_email_identity import handle_email_identity_request
 
 
@@ -45,7 +51,7 @@ class TestEmailIdentityHandler(HandlerTestCase):
         handle_email_identity_request(event, self.mock_context)
 
         # Should default to SES in current region (where stack is running):
-        self.mock_boto3_client.assert_called_once_with('ses', region_name="mock-region")
+        self.mock_boto3_client.assert_called_once_with('ses', region_name="mock-region", config=MOCK_ANY)
 
         outputs = self.assertSentResponse(
             event, physical_resource_id="arn:aws:ses:mock-region:111111111111:identity/sender@example.com")
@@ -68,13 +74,38 @@ class TestEmailIdentityHandler(HandlerTestCase):
         handle_email_identity_request(event, self.mock_context)
 
         # Should override SES region when Region property provided:
-        self.mock_boto3_client.assert_called_once_with('ses', region_name="us-test-2")
+        self.mock_boto3_client.assert_called_once_with('ses', region_name="us-test-2", config=MOCK_ANY)
 
         outputs = self.assertSentResponse(
             event, physical_resource_id="arn:aws:ses:us-test-2:111111111111:identity/sender@example.com")
         self.assertEqual(outputs["Region"], "us-test-2")
         self.assertEqual(outputs["Arn"], "arn:aws:ses:us-test-2:111111111111:identity/sender@example.com")
 
+    def test_throttling_retried(self):
+        event = {
+            "RequestType": "Create",
+            "ResourceProperties": {
+                "EmailAddress": "sender@example.com",
+            },
+            "StackId": self.mock_stack_id}
+        self.ses_stubber.add_client_error(
+            'verify_email_identity', "Throttling", "Rate exceeded", http_status_code=400,
+            expected_params={'EmailAddress': "sender@example.com"})
+        self.ses_stubber.add_response(
+            'verify_email_identity',
+            {},
+            {'EmailAddress': "sender@example.com"})
+        rate_limiter = AdaptiveRateLimiter(4, min_rate=1, sleep=lambda seconds: None)
+        ses_rate_limiters["mock-region"] = rate_limiter
+        with patch('aws_cfn_ses_domain.calls.random.uniform', return_value=0):  # (no retry backoff)
+            with self.assertLogs(level="WARNING") as logs:
+                handle_email_identity_request(event, self.mock_context)
+
+        self.assertSentResponse(event, physical_resource_id=MOCK_ANY)
+        self.assertEqual(rate_limiter.throttled, 1)
+        self.assertEqual(rate_limiter.rate, 2.2)  # halved, then increased after success
+        self.assertRegex(logs.output[0], r"Waited [\d.]+s for rate limit; 1 calls throttled")
+
     def test_update(self):
         # Update is essentially the same as Create on the new address.
         # CloudFormation will automatically Delete the old one once the resource id changes.
@@ -141,3 +172,25 @@ class TestEmailIdentityHandler(HandlerTestCase):
             'ERROR:root:Error updating SES: An error occurred (InvalidParameterValue) when'
             ' calling the VerifyEmailIdentity operation: Invalid email address bad email.',
             cm.output[0])
+
+    def test_sesv2_backend(self):
+        sesv2 = boto3.session.Session().client('sesv2', region_name='STUBBED')  # (boto3.client is mocked)
+        self.mock_boto3_client.side_effect = lambda service_name, **kwargs: {'sesv2': sesv2}[service_name]
+        event = {
+            "RequestType": "Create",
+            "ResourceProperties": {
+                "EmailAddress": "sender@example.com",
+                "SESBackend": "sesv2",
+            },
+            "StackId": self.mock_stack_id}
+        with Stubber(sesv2) as sesv2_stubber:
+            # (An existing identity isn't an error, and doesn't resend the verification email)
+            sesv2_stubber.add_client_error(
+                'create_email_identity', "AlreadyExistsException",
+                expected_params={'EmailIdentity': "sender@example.com"})
+            handle_email_identity_request(event, self.mock_context)
+            sesv2_stubber.assert_no_pending_responses()
+
+        outputs = self.assertSentResponse(
+            event, physical_resource_id="arn:aws:ses:mock-region:111111111111:identity/sender@example.com")
+        self.assertEqual(outputs["EmailAddress"], "sender@example.com")
@@ -0,0 +1,197 @@
+import json
+from unittest.mock import Mock, patch
+
+from .base import HandlerTestCase
+
+from aws_cfn_ses_domain.continuation import CONTINUATION_FIELD
+from aws_cfn_ses_domain.ses_email_identity_batch import handle_email_identity_batch_request
+
+
+class TestEmailIdentityBatchHandler(HandlerTestCase):
+
+    patch_base = 'aws_cfn_ses_domain.ses_email_identity_batch'
+
+    def setUp(self):
+        super().setUp()
+        self.physical_id = f"{self.mock_stack_id}/MySESEmails"
+
+    def make_event(self, request_type="Create", old_properties=None, **properties):
+        properties.setdefault("RateLimit", "1000")
+        event = {
+            "RequestType": request_type,
+            "RequestId": "REQ",
+            "ResourceProperties": properties,
+            "StackId": self.mock_stack_id,
+            "LogicalResourceId": "MySESEmails",
+        }
+        if request_type != "Create":
+            event["PhysicalResourceId"] = self.physical_id
+        if old_properties is not None:
+            event["OldResourceProperties"] = {"RateLimit": "1000", **old_properties}
+        return event
+
+    def add_verify(self, email_address):
+        self.ses_stubber.add_response('verify_email_identity', {}, {'EmailAddress': email_address})
+
+    def add_delete(self, email_address):
+        self.ses_stubber.add_response('delete_identity', {}, {'Identity': email_address})
+
+    def test_email_addresses_required(self):
+        event = self.make_event()
+        handle_email_identity_batch_request(event, self.mock_context)
+        self.assertSentResponse(
+            event, status="FAILED",
+            reason="The 'EmailAddresses' property must be a non-empty list.",
+            physical_resource_id=self.physical_id)
+
+    def test_duplicate_email_address(self):
+        event = self.make_event(EmailAddresses=["a@example.com", " a@example.com "])
+        handle_email_identity_batch_request(event, self.mock_context)
+        self.assertSentResponse(
+            event, status="FAILED",
+            reason="Email address 'a@example.com' is listed more than once.",
+            physical_resource_id=self.physical_id)
+
+    def test_create(self):
+        event = self.make_event(EmailAddresses=[" a@example.com", "b@example.com "], Region="us-test-2")
+        self.add_verify("a@example.com")
+        self.add_verify("b@example.com")
+        handle_email_identity_batch_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=self.physical_id)
+        self.assertEqual(outputs, {
+            "ArnPrefix": "arn:aws:ses:us-test-2:111111111111:identity/",
+            "Arns": ["arn:aws:ses:us-test-2:111111111111:identity/a@example.com",
+                     "arn:aws:ses:us-test-2:111111111111:identity/b@example.com"],
+            "EmailAddresses": ["a@example.com", "b@example.com"],
+            "Region": "us-test-2",
+        })
+
+    def test_update_verifies_only_changes(self):
+        event = self.make_event(
+            "Update",
+            EmailAddresses=["a@example.com", "c@example.com"],
+            old_properties={"EmailAddresses": ["a@example.com", "b@example.com"]})
+        self.add_delete("b@example.com")
+        self.add_verify("c@example.com")
+        handle_email_identity_batch_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(event, physical_resource_id=self.physical_id)
+        self.assertEqual(outputs["EmailAddresses"], ["a@example.com", "c@example.com"])
+        self.assertEqual(outputs["SESCallsAvoided"], 1)
+
+    def test_update_invalid_old_properties(self):
+        # Addresses removed from an (invalid) old list are still deleted, if they can be read
+        event = self.make_event(
+            "Update",
+            EmailAddresses=["a@example.com"],
+            old_properties={"EmailAddresses": ["a@example.com", "b@example.com", " b@example.com", 42]})
+        self.add_delete("b@example.com")
+        with self.assertLogs(level="WARNING"):
+            handle_email_identity_batch_request(event, self.mock_context)
+
+        outputs = self.assertSentResponse(
+            event, physical_resource_id=self.physical_id,
+            reason="Unable to read 1 of the old 'EmailAddresses' entries, so any of them removed from the list"
+                   " are still in Amazon SES: 42")
+        self.assertEqual(outputs["SESCallsAvoided"], 1)
+
+    def test_update_region(self):
+        event = self.make_event(
+            "Update",
+            EmailAddresses=["a@example.com"], Region="us-test-2",
+            old_properties={"EmailAddresses": ["a@example.com"], "Region": "us-test-1"})
+        self.add_delete("a@example.com")
+        self.add_verify("a@example.com")
+        handle_email_identity_batch_request(event, self.mock_context)
+
+        self.assertSentResponse(event, physical_resource_id=self.physical_id)
+        regions = [call[1]["region_name"] for call in self.mock_boto3_client.call_args_list]
+        self.assertEqual(regions, ["us-test-1", "us-test-2"])
+
+    def test_delete(self):
+        event = self.make_event("Delete", EmailAddresses=["a@example.com", "b@example.com"])
+        self.add_delete("a@example.com")
+        self.add_delete("b@example.com")
+        handle_email_identity_batch_request(event, self.mock_context)
+        self.assertSentResponse(event, physical_resource_id=self.physical_id)
+
+    def test_errors(self):
+        event = self.make_event(EmailAddresses=["a@example.com", "b@example.com"])
+        self.ses_stubber.add_client_error(
+            'verify_email_identity', "InvalidParameterValue", "Invalid email address",
+            expected_params={'EmailAddress': "a@example.com"})
+        self.add_verify("b@example.com")  # (continues after an error)
+        handle_email_identity_batch_request(event, self.mock_context)
+        self.assertSentResponse(
+            event, status="FAILED",
+            reason="Error updating SES for 1 of 2 email addresses: a@example.com: An error occurred "
+                   "(InvalidParameterValue) when calling the VerifyEmailIdentity operation: Invalid email address",
+            physical_resource_id=self.physical_id)
+
+    def test_invalid_rate_limit(self):
+        event = self.make_event(EmailAddresses=["a@example.com"], RateLimit="0")
+        handle_email_identity_batch_request(event, self.mock_context)
+        self.assertSentResponse(
+            event, status="FAILED",
+            reason="The 'RateLimit' property must be a positive number.",
+            physical_resource_id=self.physical_id)
+
+
+class TestEmailIdentityBatchHandlerContinuation(HandlerTestCase):
+
+    patch_base = 'aws_cfn_ses_domain.ses_email_identity_batch'
+
+    def setUp(self):
+        super().setUp()
+        ses = self.mock_boto3_client.return_value
+        self.mock_lambda = Mock()
+        self.mock_boto3_client.side_effect = lambda service_name, **kwargs: {
+            'ses': ses, 'lambda': self.mock_lambda}[service_name]
+        self.event = {
+            "RequestType": "Create",
+            "RequestId": "REQ",
+            "ResourceProperties": {
+                "EmailAddresses": ["a@example.com", "b@example.com", "c@example.com"],
+            },
+            "StackId": self.mock_stack_id,
+            "LogicalResourceId": "MySESEmails",
+        }
+
+    def make_context(self, remaining_seconds):
+        return Mock(get_remaining_time_in_millis=Mock(return_value=remaining_seconds * 1000),
+                    invoked_function_arn="arn:aws:lambda:mock-region:111111111111:function:example")
+
+    def test_continues_when_out_of_time(self):
+        # At 1 call/second, only two calls (with the burst token) fit before the continuation reserve
+        # (next_wait is checked by run_paced, and again by the rate-limited client before each call)
+        context = self.make_context(8)
+        self.ses_stubber.add_response('verify_email_identity', {}, {'EmailAddress': "a@example.com"})
+        self.ses_stubber.add_response('verify_email_identity', {}, {'EmailAddress': "b@example.com"})
+        with patch('aws_cfn_ses_domain.ratelimit.time.sleep'), \
+                patch('aws_cfn_ses_domain.ratelimit.RateLimiter.next_wait', side_effect=[0, 0, 1, 1, 3]):
+            handle_email_identity_batch_request(self.event, context)
+
+        self.mock_send.assert_not_called()
+        self.mock_lambda.invoke.assert_called_once()
+        continued_event = json.loads(self.mock_lambda.invoke.call_args[1]["Payload"])
+        checkpoint = continued_event[CONTINUATION_FIELD]
+        self.assertEqual(checkpoint["Invocations"], 2)
+        self.assertEqual(checkpoint["Tasks"], [["verify", "mock-region", "ses", "c@example.com"]])
+
+        # The continuation finishes the remaining tasks, and responds
+        self.ses_stubber.add_response('verify_email_identity', {}, {'EmailAddress': "c@example.com"})
+        handle_email_identity_batch_request(continued_event, self.mock_context)
+        outputs = self.assertSentResponse(continued_event, physical_resource_id=f"{self.mock_stack_id}/MySESEmails")
+        self.assertEqual(outputs["EmailAddresses"], ["a@example.com", "b@example.com", "c@example.com"])
+
+    def test_reports_earlier_errors(self):
+        self.event[CONTINUATION_FIELD] = {
+            "Tasks": [["verify", "mock-region", "ses", "c@example.com"]], "Total": 3, "Verifies": 3,
+            "Errors": [["a@example.com", "Invalid email address"]], "Invocations": 2}
+        self.ses_stubber.add_response('verify_email_identity', {}, {'EmailAddress': "c@example.com"})
+        handle_email_identity_batch_request(self.event, self.mock_context)
+        self.assertSentResponse(
+            self.event, status="FAILED",
+            reason="Error updating SES for 1 of 3 email addresses: a@example.com: Invalid email address",
+            physical_resource_id=f"{self.mock_stack_id}/MySESEmails")
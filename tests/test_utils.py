@@ -1,6 +1,22 @@
+import threading
+import time
 from unittest import TestCase
 
-from aws_cfn_ses_domain.utils import to_bool
+from aws_cfn_ses_domain.utils import format_arn, parse_arn, run_concurrently, to_bool
+
+
+class TestFormatArn(TestCase):
+
+    def test_defaults_from(self):
+        stack_id = "arn:aws-cn:cloudformation:cn-north-1:111111111111:stack/example/deadbeef"
+        self.assertEqual(
+            format_arn(service="ses", resource_type="identity", resource_name="example.com", defaults_from=stack_id),
+            "arn:aws-cn:ses:cn-north-1:111111111111:identity/example.com")
+        self.assertGreater(parse_arn.cache_info().currsize, 0)  # (parsed once per stack)
+
+    def test_invalid_defaults_from(self):
+        with self.assertRaisesRegex(ValueError, "Invalid ARN"):
+            format_arn(service="ses", defaults_from="not-an-arn")
 
 
 class TestToBool(TestCase):
@@ -39,3 +55,33 @@ class TestToBool(TestCase):
             with self.subTest(value=value):
                 with self.assertRaises(ValueError):
                     to_bool(value)
+
+
+class TestRunConcurrently(TestCase):
+
+    def test_results_in_call_order(self):
+        # Later calls finish first, but results still follow calls order
+        calls = [lambda n=n: time.sleep(0.01 * (3 - n)) or n for n in range(3)]
+        self.assertEqual(run_concurrently(calls, max_workers=3), [0, 1, 2])
+
+    def test_runs_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)  # deadlocks (then times out) unless concurrent
+        calls = [lambda: barrier.wait() >= 0] * 3
+        self.assertEqual(run_concurrently(calls, max_workers=3), [True, True, True])
+
+    def test_sequential(self):
+        thread_ids = run_concurrently([threading.get_ident] * 3, max_workers=1)
+        self.assertEqual(thread_ids, [threading.get_ident()] * 3)
+
+    def test_first_exception_in_call_order(self):
+        def fail_slowly():
+            time.sleep(0.02)
+            raise KeyError("slow")
+
+        def fail_quickly():
+            raise ValueError("quick")
+
+        finished = []
+        with self.assertRaises(KeyError):
+            run_concurrently([fail_slowly, fail_quickly, lambda: finished.append(True)], max_workers=3)
+        self.assertEqual(finished, [True])  # other calls still ran to completion
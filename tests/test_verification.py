@@ -0,0 +1,94 @@
+from unittest import TestCase
+
+import boto3
+from botocore.stub import Stubber
+
+from .base import MockClock
+
+from aws_cfn_ses_domain.deadline import Deadline
+from aws_cfn_ses_domain.verification import (
+    PENDING, VERIFIED, VerificationFailed, verification_status, wait_for_verification)
+
+
+class TestVerificationStatus(TestCase):
+
+    def test_verified(self):
+        state = {"VerificationStatus": "Success", "DkimVerificationStatus": "Success"}
+        self.assertEqual(verification_status(state), VERIFIED)
+
+    def test_pending_dkim(self):
+        state = {"VerificationStatus": "Success", "DkimVerificationStatus": "Pending"}
+        self.assertEqual(verification_status(state), PENDING)
+        self.assertEqual(verification_status(state, check_dkim=False), VERIFIED)
+
+    def test_missing(self):
+        self.assertEqual(verification_status({}), PENDING)
+
+    def test_failed(self):
+        state = {"VerificationStatus": "Success", "DkimVerificationStatus": "Failed"}
+        with self.assertRaisesRegex(VerificationFailed, "DKIM verification status is Failed"):
+            verification_status(state)
+
+    def test_temporary_failure(self):
+        # (SES keeps checking the DNS records after a TemporaryFailure)
+        state = {"VerificationStatus": "TemporaryFailure", "DkimVerificationStatus": "Success"}
+        self.assertEqual(verification_status(state), PENDING)
+
+
+class TestWaitForVerification(TestCase):
+
+    def setUp(self):
+        self.clock = MockClock(100.0)
+        self.deadline = Deadline(self.clock() + 60, clock=self.clock)
+        self.ses = boto3.client('ses', region_name='STUBBED')
+        self.ses_stubber = Stubber(self.ses)
+        self.ses_stubber.activate()
+        self.addCleanup(self.ses_stubber.deactivate)
+
+    def tearDown(self):
+        self.ses_stubber.assert_no_pending_responses()
+
+    def add_status(self, verification, dkim="Pending"):
+        self.ses_stubber.add_response(
+            'get_identity_verification_attributes',
+            {'VerificationAttributes': {"example.com": {'VerificationStatus': verification}}},
+            {'Identities': ["example.com"]})
+        self.ses_stubber.add_response(
+            'get_identity_dkim_attributes',
+            {'DkimAttributes': {"example.com": {'DkimEnabled': True, 'DkimVerificationStatus': dkim}}},
+            {'Identities': ["example.com"]})
+
+    def wait(self, **kwargs):
+        return wait_for_verification(
+            self.ses, "example.com", deadline=self.deadline, clock=self.clock, sleep=self.clock.sleep, **kwargs)
+
+    def test_polls_with_backoff(self):
+        self.add_status("Pending")
+        self.add_status("Success", "Pending")
+        self.add_status("Success", "Success")
+        self.assertTrue(self.wait())
+        self.assertEqual(self.clock.sleeps, [5, 7.5])
+
+    def test_returns_false_near_deadline(self):
+        # sleeps 5, 7.5, 11.25, 16.875 (40.625s); the next 25.3125 wouldn't leave the reserve
+        for _ in range(5):
+            self.add_status("Pending")
+        self.assertFalse(self.wait())
+        self.assertEqual(len(self.clock.sleeps), 4)
+
+    def test_timeout(self):
+        self.add_status("Pending")
+        self.add_status("Success", "Pending")
+        with self.assertRaisesRegex(VerificationFailed, r"Timed out .* example.com .*DKIM verification Pending"):
+            self.wait(expires_at=self.clock() + 10)
+
+    def test_keeps_polling_after_temporary_failure(self):
+        self.add_status("TemporaryFailure")
+        self.add_status("Success", "TemporaryFailure")
+        self.add_status("Success", "Success")
+        self.assertTrue(self.wait())
+
+    def test_failed(self):
+        self.add_status("Failed")
+        with self.assertRaisesRegex(VerificationFailed, "Domain verification status is Failed"):
+            self.wait()
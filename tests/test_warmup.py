@@ -0,0 +1,66 @@
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+import boto3
+from botocore.stub import Stubber
+
+from aws_cfn_ses_domain.clients import client_cache
+from aws_cfn_ses_domain.deadline import Deadline
+from aws_cfn_ses_domain.ses_domain_identity import handle_domain_identity_request
+from aws_cfn_ses_domain.warmup import WARMUP_FIELD, handles_warmup, is_warmup_event, prime
+
+
+class TestWarmUpEvents(TestCase):
+
+    def test_is_warmup_event(self):
+        self.assertTrue(is_warmup_event({WARMUP_FIELD: True}))
+        self.assertTrue(is_warmup_event({"source": "aws.events", "detail-type": "Scheduled Event"}))
+        self.assertFalse(is_warmup_event({"RequestType": "Create", "ResourceProperties": {}}))
+        self.assertFalse(is_warmup_event(None))
+
+    def test_handles_warmup(self):
+        handler = Mock()
+        wrapped = handles_warmup(handler)
+        self.assertEqual(wrapped({WARMUP_FIELD: True}, None), {"WarmUp": True})
+        handler.assert_not_called()
+
+        event = {"RequestType": "Create"}
+        wrapped(event, None)
+        handler.assert_called_once_with(event, None)
+
+    @patch('aws_cfn_ses_domain.ses_domain_identity.send')
+    def test_handler_skips_response(self, mock_send):
+        self.assertEqual(handle_domain_identity_request({WARMUP_FIELD: True}, None), {"WarmUp": True})
+        mock_send.assert_not_called()
+
+
+class TestPrime(TestCase):
+
+    def setUp(self):
+        client_cache.clear()
+        self.addCleanup(client_cache.clear)
+        self.ses = boto3.client('ses', region_name='STUBBED')
+        self.stubber = Stubber(self.ses)
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+        boto3_client_patcher = patch('boto3.client', return_value=self.ses)
+        self.mock_boto3_client = boto3_client_patcher.start()
+        self.addCleanup(boto3_client_patcher.stop)
+
+    def test_primes_cached_clients(self):
+        self.stubber.add_response('get_send_quota', {})
+        self.stubber.add_response('get_send_quota', {})
+        primed = prime(regions=["us-test-1", "us-test-2"], service_names=["ses"])
+        self.assertCountEqual(primed, [("ses", "us-test-1"), ("ses", "us-test-2")])
+        self.stubber.assert_no_pending_responses()
+
+        # A handler's client (with time to spare) reuses the primed one
+        self.mock_boto3_client.reset_mock()
+        client_cache.get_client('ses', region_name="us-test-1", config=Deadline().client_config())
+        self.mock_boto3_client.assert_not_called()
+
+    def test_errors_are_skipped(self):
+        self.stubber.add_client_error('get_send_quota', "AccessDenied")
+        with self.assertLogs(level="WARNING") as logs:
+            self.assertEqual(prime(regions=["us-test-1"], service_names=["ses"]), [])
+        self.assertIn("Unable to prime ses in us-test-1", logs.output[0])
@@ -0,0 +1,63 @@
+from io import StringIO
+from unittest import TestCase
+
+from aws_cfn_ses_domain.ses_domain_identity import route53_to_zone_file
+from aws_cfn_ses_domain.zonefile import ZoneFileWriter, zone_file_lines
+
+
+RECORDS = [
+    {'Name': '_amazonses.example.com.', 'Type': 'TXT', 'ResourceRecords': ['"ID_TOKEN"'], 'TTL': '1800'},
+    {'Name': 'DKIM1._domainkey.example.com.', 'Type': 'CNAME',
+     'ResourceRecords': ['DKIM1.dkim.amazonses.com.'], 'TTL': '1800'},
+    {'Name': 'example.com.', 'Type': 'MX',
+     'ResourceRecords': ['10 inbound-smtp.us-east-1.amazonaws.com.'], 'TTL': '300'},
+    {'Name': 'mail.example.org.', 'Type': 'TXT',
+     'ResourceRecords': ['"v=spf1 include:amazonses.com -all"'], 'TTL': '1800'},
+]
+
+
+class TestZoneFileWriter(TestCase):
+
+    def test_matches_zone_file_entries(self):
+        # Configured to match ZoneFileEntries, output is identical (with line endings)
+        expected = route53_to_zone_file(RECORDS)
+        out = StringIO()
+        writer = ZoneFileWriter(out, name_width=max(len(record["Name"]) for record in RECORDS))
+        self.assertEqual(writer.write_records(iter(RECORDS)), 4)
+        self.assertEqual(out.getvalue(), "".join(line + "\n" for line in expected))
+        self.assertEqual(zone_file_lines(RECORDS), expected)
+        self.assertEqual(zone_file_lines([]), [])
+
+    def test_origin_and_default_ttl(self):
+        out = StringIO()
+        writer = ZoneFileWriter(out, origin="Example.com", default_ttl=1800, relative_names=True)
+        for record in RECORDS:
+            writer.write(record)
+        self.assertEqual(out.getvalue().splitlines(), [
+            '$ORIGIN Example.com.',
+            '$TTL 1800',
+            '_amazonses\tIN\tTXT  \t"ID_TOKEN"',
+            'DKIM1._domainkey\tIN\tCNAME\tDKIM1.dkim.amazonses.com.',
+            '@\t300\tIN\tMX   \t10 inbound-smtp.us-east-1.amazonaws.com.',
+            'mail.example.org.\tIN\tTXT  \t"v=spf1 include:amazonses.com -all"',  # (outside origin)
+        ])
+
+    def test_fixed_width(self):
+        out = StringIO()
+        ZoneFileWriter(out, name_width=20).write_records(RECORDS[1:3])
+        self.assertEqual(out.getvalue().splitlines(), [
+            'DKIM1._domainkey.example.com.\t1800\tIN\tCNAME\tDKIM1.dkim.amazonses.com.',  # (not truncated)
+            'example.com.        \t300\tIN\tMX   \t10 inbound-smtp.us-east-1.amazonaws.com.',
+        ])
+
+    def test_header_written_once(self):
+        out = StringIO()
+        writer = ZoneFileWriter(out, default_ttl="300")
+        writer.write_records([])
+        writer.write_records(RECORDS[2:3])
+        self.assertEqual(out.getvalue(),
+                         '$TTL 300\nexample.com.\tIN\tMX   \t10 inbound-smtp.us-east-1.amazonaws.com.\n')
+
+    def test_relative_names_requires_origin(self):
+        with self.assertRaisesRegex(ValueError, "origin"):
+            ZoneFileWriter(StringIO(), relative_names=True)